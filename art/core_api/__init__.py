@@ -9,13 +9,14 @@ logger = logging.getLogger('core_api')
 @contextmanager
 def measure_time(method_name):
     '''
-    Context manager to log request response time
+    Context manager to log request response time, wall clock time, per
+    endpoint metrics are recorded by HTTPProxy in metrics.registry
     '''
     try:
-        st = time.clock()
+        st = time.time()
         yield
     finally:
-        response_time = time.clock() - st
+        response_time = time.time() - st
         logger.debug(
             "Request %s response time: %0.3f", method_name, response_time,
         )
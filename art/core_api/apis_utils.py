@@ -20,11 +20,15 @@
 import sys
 import abc
 import logging
+import re
 from collections import namedtuple
 
 from utilities.utils import generateShortGuid
-from timeout import TimeoutingSampler as _TimeoutingSampler
+from art.core_api.timeout import TimeoutingSampler as _TimeoutingSampler
 from art.core_api.apis_exceptions import APITimeout, EntityNotFound
+from art.core_api.lazy_collection import LazyParser
+from art.core_api.table_parser import TableParser
+from art.core_api import table_parser
 import art.test_handler.settings as settings
 
 DS_PATH = settings.ART_CONFIG.get('RUN').get('data_struct_mod')
@@ -34,7 +38,13 @@ __import__(DS_PATH)
 __import__(DS_VALIDATE)
 data_st = sys.modules[DS_PATH]
 data_st_validate = sys.modules[DS_VALIDATE]
-parse = data_st.parseString
+_parser = TableParser(
+    data_st, settings.ART_CONFIG['RUN'].get('xml_parser') == 'tables'
+)
+parse = _parser.parse if _parser.specs is not None else data_st.parseString
+parse_xml = table_parser.parse_xml
+parse_node = _parser.parse_node
+parse_lazy = LazyParser(data_st, _parser.build).parse_node
 
 DEF_TIMEOUT = 900  # default timeout
 DEF_SLEEP = 10  # default sleep
@@ -45,6 +55,13 @@ POSITIVE_CODES_CREATE = POSITIVE_CODES + [202]
 HEADERS = 'headers'
 CORRELATION_ID = 'Correlation-Id'
 MAX_CORRELATION_ID_LENGTH = 50
+# collections where 'name=' search matches the entity name attribute
+NAME_SEARCHABLE_COLLECTIONS = [
+    'vms', 'templates', 'hosts', 'clusters', 'datacenters', 'storagedomains',
+    'vmpools', 'networks',
+]
+# values which can be safely used in search query or url path
+LOOKUP_VALUE_RE = re.compile(r'^[\w.-]+$')
 logger = logging.getLogger('api_utils')
 flow_logger = logging.getLogger('art.flow')  # CI logger
 
@@ -206,7 +223,7 @@ class APIUtil(object):
         Return: element obj or None if not found
         '''
         if all_content:
-            self.api.headers['All-content'] = True
+            self.api.headers.set_local('All-content', True)
 
         if not collection_name:
             collection_name = self.collection_name
@@ -290,7 +307,21 @@ class APIUtil(object):
 
 
 class TimeoutingSampler(_TimeoutingSampler):
+    """
+    Sampler raising APITimeout, backoff between samples is set by RUN
+    sampler_min_sleep, sampler_max_sleep, sampler_backoff and sampler_jitter
+    """
 
     def __init__(self, *args, **kwargs):
         super(TimeoutingSampler, self).__init__(*args, **kwargs)
         self.timeout_exc_cls = APITimeout
+        self.min_sleep = self._option('sampler_min_sleep')
+        self.max_sleep = self._option('sampler_max_sleep')
+        self.backoff = self._option('sampler_backoff') or self.backoff
+        self.jitter = self._option('sampler_jitter') or self.jitter
+
+    @staticmethod
+    def _option(name):
+        # options of --art-define come as strings, empty one is not set
+        value = settings.ART_CONFIG['RUN'].get(name)
+        return None if value in (None, '') else float(value)
@@ -0,0 +1,689 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2010 Red Hat, Inc.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this software; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA, or see the FSF site: http://www.fsf.org.
+
+"""
+Non-blocking HTTP client running many requests from a single thread.
+
+Requests are spread over a bounded number of keep-alive connections driven
+by one select loop. Idempotent requests (GET, HEAD) are pipelined on a
+connection up to pipeline depth, other requests are sent only over idle
+connections and nothing is pipelined behind them. Idle connections closed
+by server meanwhile are dropped before reuse. Requests not answered because
+the connection was closed are sent again up to MAX_RESENDS times, except
+other than idempotent requests which were already written, the server might
+have processed them.
+"""
+
+import collections
+import errno
+import logging
+import os
+import select
+import socket
+import ssl
+import threading
+import time
+
+from art.core_api import metrics
+from art.core_api.timeout import TimeoutExpiredError, current_deadline
+
+logger = logging.getLogger('async_http')
+
+DEF_MAX_CONNECTIONS = 20  # default number of concurrent connections
+DEF_PIPELINE_DEPTH = 4  # default number of pipelined idempotent requests
+DEF_TIMEOUT = 300  # default seconds without any response data
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+MAX_RESENDS = 3  # times request not answered on closed connection is resent
+RECV_SIZE = 1 << 16
+SELECT_INTERVAL = 1.0  # seconds between timeout checks
+
+
+class AsyncRequest(object):
+    """
+    HTTP request and its response
+    """
+
+    def __init__(self, method, url, body=None, headers=None):
+        """
+        Args:
+            method (str): Request method(GET, POST, PUT, DELETE)
+            url (str): Request url
+            body (str): Request body
+            headers (dict): Request headers
+        """
+        self.method = method
+        self.url = url
+        self.body = body
+        self.headers = headers or {}
+        self.status = None
+        self.reason = None
+        self.response_headers = {}
+        self.response_body = None
+        self.error = None
+        self.resends = 0
+        self.start = None
+        self.written = False
+
+    def getheader(self, name, default=None):
+        """
+        Get response header, same as httplib.HTTPResponse.getheader
+
+        Args:
+            name (str): Header name
+            default (str): Value if header is missing
+
+        Returns:
+            str: Header value
+        """
+        return self.response_headers.get(name.lower(), default)
+
+    def serialize(self, host):
+        """
+        Serialize request
+
+        Args:
+            host (str): Value of Host header
+
+        Returns:
+            str: Request bytes
+        """
+        body = self.body or ''
+        if isinstance(body, unicode):
+            body = body.encode('utf-8')
+        lines = ['%s %s HTTP/1.1' % (self.method, self.url), 'Host: %s' % host]
+        for name, value in self.headers.iteritems():
+            lines.append('%s: %s' % (name, value))
+        if body or self.method not in IDEMPOTENT_METHODS:
+            lines.append('Content-Length: %d' % len(body))
+        return '\r\n'.join(lines) + '\r\n\r\n' + body
+
+    def reset(self):
+        """
+        Forget partial response before sending request again
+        """
+        self.status = None
+        self.reason = None
+        self.response_headers = {}
+        self.response_body = None
+        self.error = None
+        self.written = False
+
+
+class _Connection(object):
+    """
+    Non-blocking keep-alive connection with queue of requests in flight
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.sock = None
+        self.state = None
+        self.out = ''
+        self.inbuf = ''
+        self.inflight = collections.deque()
+        # requests not written completely with offset of their end in out
+        self.unwritten = collections.deque()
+        self.response = None
+        self.reused = False
+        self.want_read = False
+        self.want_write = False
+        self.last_activity = time.time()
+
+    def open(self):
+        """
+        Start connecting to the server
+        """
+        family, socktype, proto, _, address = socket.getaddrinfo(
+            self.client.host, self.client.port, 0, socket.SOCK_STREAM
+        )[0]
+        self.sock = socket.socket(family, socktype, proto)
+        self.sock.setblocking(0)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        err = self.sock.connect_ex(address)
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            raise socket.error(err, os.strerror(err))
+        self.state = 'connecting'
+        self.want_write = True
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def is_dropped(self):
+        """
+        Check whether idle connection was closed by the server, idle
+        keep-alive connection is readable only if the server closed it
+
+        Returns:
+            bool: True if connection can't be used anymore
+        """
+        if self.state != 'ready' or self.sock is None:
+            return True
+        try:
+            return bool(select.select([self.sock], [], [], 0)[0])
+        except (select.error, socket.error, ValueError):
+            return True
+
+    def can_send(self, request):
+        """
+        Check if request can be sent now
+
+        Args:
+            request (AsyncRequest): Request
+
+        Returns:
+            bool: True if connection is idle, or request can be pipelined
+                behind requests in flight
+        """
+        if not self.inflight:
+            return True
+        return (
+            request.method in IDEMPOTENT_METHODS and
+            len(self.inflight) < self.client.pipeline_depth and
+            all(r.method in IDEMPOTENT_METHODS for r in self.inflight)
+        )
+
+    def send(self, request):
+        """
+        Queue request to be sent
+
+        Args:
+            request (AsyncRequest): Request
+        """
+        if not self.inflight:
+            self.last_activity = time.time()
+        request.start = time.time()
+        self.inflight.append(request)
+        self.out += request.serialize(self.client.host_header)
+        self.unwritten.append((request, len(self.out)))
+        self.want_write = True
+        self.want_read = self.state == 'ready'
+
+    def _handshake(self):
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self.want_read, self.want_write = True, False
+            return
+        except ssl.SSLWantWriteError:
+            self.want_read, self.want_write = False, True
+            return
+        self.state = 'ready'
+        self.want_read = True
+        self.want_write = bool(self.out)
+
+    def handle_write(self):
+        """
+        Finish connecting or send queued requests
+
+        Returns:
+            list: Completed requests
+        """
+        if self.state == 'connecting':
+            err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                raise socket.error(err, os.strerror(err))
+            if self.client.context is None:
+                self.state = 'ready'
+                self.want_read = True
+            else:
+                self.sock = self.client.context.wrap_socket(
+                    self.sock, do_handshake_on_connect=False,
+                    server_hostname=self.client.host
+                )
+                self.state = 'handshake'
+                self._handshake()
+                return []
+        elif self.state == 'handshake':
+            self._handshake()
+            return []
+        if self.out:
+            try:
+                sent = self.sock.send(self.out)
+            except ssl.SSLWantWriteError:
+                sent = 0
+            except socket.error as ex:
+                if ex.args[0] in (errno.EPIPE, errno.ECONNRESET):
+                    # server closed the connection, responses it sent
+                    # before are still to be read, first unwritten request
+                    # might have been written partially
+                    if self.unwritten:
+                        self.unwritten[0][0].written = True
+                    self.unwritten.clear()
+                    self.out = ''
+                    self.want_write = False
+                    self.want_read = True
+                    return []
+                if ex.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+                sent = 0
+            self._written(sent)
+        self.want_write = bool(self.out)
+        return []
+
+    def _written(self, sent):
+        """
+        Drop sent bytes from output buffer and mark requests written
+
+        Args:
+            sent (int): Number of bytes sent
+        """
+        self.out = self.out[sent:]
+        unwritten = collections.deque()
+        start = 0
+        for request, end in self.unwritten:
+            if start < sent:
+                request.written = True
+            if end > sent:
+                unwritten.append((request, end - sent))
+            start = end
+        self.unwritten = unwritten
+
+    def handle_read(self):
+        """
+        Read and parse responses
+
+        Returns:
+            list: Completed requests, connection is closed if server closed
+                it, requests left in flight are lost
+        """
+        if self.state == 'handshake':
+            self._handshake()
+            return []
+        chunks = []
+        try:
+            chunks.append(self.sock.recv(RECV_SIZE))
+            # SSL keeps decrypted data select doesn't know about
+            while chunks[-1] and getattr(self.sock, 'pending', int)():
+                chunks.append(self.sock.recv(RECV_SIZE))
+        except ssl.SSLWantReadError:
+            pass
+        except socket.error as ex:
+            if ex.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+        data = ''.join(chunks)
+        if chunks and not chunks[-1]:
+            self.inbuf += data
+            done = self.parse()
+            if self.response is not None and self.response['mode'] == 'close':
+                done.append(self._finish(self.inbuf))
+                self.inbuf = ''
+                self.state = 'closing'
+            else:
+                self.close()
+            return done
+        self.last_activity = time.time()
+        self.inbuf += data
+        return self.parse()
+
+    def parse(self):
+        """
+        Parse buffered responses
+
+        Returns:
+            list: Completed requests
+        """
+        done = []
+        while self.inflight:
+            if self.response is None:
+                end = self.inbuf.find('\r\n\r\n')
+                if end < 0:
+                    break
+                head, self.inbuf = self.inbuf[:end], self.inbuf[end + 4:]
+                if not self._parse_head(head):
+                    continue
+            response = self.response
+            if response['mode'] == 'length':
+                if len(self.inbuf) < response['remaining']:
+                    break
+                body = self.inbuf[:response['remaining']]
+                self.inbuf = self.inbuf[response['remaining']:]
+            elif response['mode'] == 'chunked':
+                body = self._parse_chunks(response)
+                if body is None:
+                    break
+            else:
+                # body ends with connection
+                break
+            done.append(self._finish(body))
+            if response['close']:
+                self.state = 'closing'
+                break
+        return done
+
+    def _parse_head(self, head):
+        """
+        Parse status line and headers of response
+
+        Returns:
+            bool: False for interim 1xx response
+        """
+        lines = head.split('\r\n')
+        parts = lines[0].split(' ', 2)
+        status = int(parts[1])
+        if 100 <= status < 200:
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            value = value.strip()
+            headers[name] = (
+                '%s, %s' % (headers[name], value) if name in headers
+                else value
+            )
+        request = self.inflight[0]
+        request.status = status
+        request.reason = parts[2] if len(parts) > 2 else ''
+        request.response_headers = headers
+        response = {
+            'close': 'close' in headers.get('connection', '').lower(),
+            'chunks': [],
+            'remaining': None,
+        }
+        if request.method == 'HEAD' or status in (204, 304):
+            response['mode'] = 'length'
+            response['remaining'] = 0
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            response['mode'] = 'chunked'
+        elif 'content-length' in headers:
+            response['mode'] = 'length'
+            response['remaining'] = int(headers['content-length'])
+        else:
+            response['mode'] = 'close'
+            response['close'] = True
+        self.response = response
+        return True
+
+    def _parse_chunks(self, response):
+        """
+        Parse chunked body
+
+        Returns:
+            str: Whole body, None if it isn't complete yet
+        """
+        while True:
+            if response['remaining'] is None:
+                end = self.inbuf.find('\r\n')
+                if end < 0:
+                    return None
+                size = int(self.inbuf[:end].split(';', 1)[0], 16)
+                self.inbuf = self.inbuf[end + 2:]
+                response['remaining'] = size if size else -1
+            if response['remaining'] == -1:
+                # last chunk, skip trailers
+                if self.inbuf.startswith('\r\n'):
+                    self.inbuf = self.inbuf[2:]
+                    return ''.join(response['chunks'])
+                end = self.inbuf.find('\r\n\r\n')
+                if end < 0:
+                    return None
+                self.inbuf = self.inbuf[end + 4:]
+                return ''.join(response['chunks'])
+            if len(self.inbuf) < response['remaining'] + 2:
+                return None
+            response['chunks'].append(self.inbuf[:response['remaining']])
+            self.inbuf = self.inbuf[response['remaining'] + 2:]
+            response['remaining'] = None
+
+    def _finish(self, body):
+        request = self.inflight.popleft()
+        request.response_body = body
+        self.response = None
+        self.reused = False
+        self.last_activity = time.time()
+        if not self.inflight:
+            self.want_read = False
+        return request
+
+    def close(self):
+        """
+        Close connection
+        """
+        self.state = 'closed'
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except socket.error:
+                pass
+
+
+class AsyncHTTPClient(object):
+    """
+    Runs batches of HTTP requests concurrently from the calling thread,
+    requests still running when current Deadline expires fail
+    """
+
+    def __init__(
+        self, scheme, host, port, max_connections=DEF_MAX_CONNECTIONS,
+        pipeline_depth=DEF_PIPELINE_DEPTH, timeout=DEF_TIMEOUT
+    ):
+        """
+        Args:
+            scheme (str): http or https
+            host (str): Server host
+            port (int): Server port
+            max_connections (int): Maximum number of concurrent connections
+            pipeline_depth (int): Maximum number of idempotent requests in
+                flight on one connection
+            timeout (int): Seconds to wait for response data
+        """
+        self.host = host
+        self.port = int(port)
+        self.host_header = '%s:%s' % (host, port)
+        self.max_connections = max(max_connections, 1)
+        self.pipeline_depth = max(pipeline_depth, 1)
+        self.timeout = timeout
+        self.context = None
+        if scheme == 'https':
+            # same as HTTPProxy, https://www.python.org/dev/peps/pep-0476/
+            self.context = ssl._create_unverified_context()
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # runs of different threads share idle connections
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn = self._idle.pop()
+            if conn.is_dropped():
+                conn.close()
+                continue
+            conn.reused = True
+            return conn
+        conn = _Connection(self)
+        conn.open()
+        return conn
+
+    def _fail(self, conn, error, pending):
+        """
+        Close failed connection, send its requests again or fail them
+        """
+        conn.close()
+        for request in reversed(conn.inflight):
+            self._resend(
+                request, error, pending,
+                resend=not isinstance(error, socket.timeout)
+            )
+        conn.inflight.clear()
+
+    def _resend(self, request, error, pending, resend=True):
+        """
+        Queue request not answered because its connection was closed to be
+        sent again, or fail it if it was sent too many times or it isn't
+        idempotent and it was written, the server might have processed it
+
+        Args:
+            request (AsyncRequest): Request without response
+            error (Exception): Reason the request wasn't answered
+            pending (deque): Requests to send
+            resend (bool): False to fail the request
+        """
+        resend = resend and request.resends < MAX_RESENDS and (
+            request.method in IDEMPOTENT_METHODS or not request.written
+        )
+        request.reset()
+        if resend:
+            request.resends += 1
+            pending.appendleft(request)
+            logger.debug("Sending %s %s again: %s",
+                         request.method, request.url, error)
+        else:
+            request.error = error
+            self._record(request)
+
+    def _expire(self, deadline, active, pending):
+        """
+        Fail all requests on expiry of deadline
+        """
+        error = TimeoutExpiredError(deadline.error_message)
+        for conn in active:
+            conn.close()
+            for request in conn.inflight:
+                request.reset()
+                request.error = error
+                self._record(request)
+            conn.inflight.clear()
+        for request in pending:
+            request.start = request.start or time.time()
+            request.error = error
+            self._record(request)
+        pending.clear()
+
+    @staticmethod
+    def _record(request):
+        metrics.registry.record(
+            request.method, request.url, time.time() - request.start,
+            request.status, len(request.body or ''),
+            len(request.response_body or ''), request.resends
+        )
+
+    def run(self, requests):
+        """
+        Run requests and wait for all responses
+
+        Args:
+            requests (list): AsyncRequest objects, their response attributes
+                are set, failed requests have error set instead
+
+        Returns:
+            list: The requests
+        """
+        pending = collections.deque(requests)
+        active = []
+        deadline = current_deadline()
+        while pending or active:
+            if deadline is not None and deadline.has_expired():
+                self._expire(deadline, active, pending)
+                break
+            for conn in active:
+                while pending and conn.state != 'closing' and (
+                    conn.can_send(pending[0])
+                ):
+                    conn.send(pending.popleft())
+            while pending and len(active) < self.max_connections:
+                try:
+                    conn = self._connection()
+                except socket.error as ex:
+                    request = pending.popleft()
+                    request.start = time.time()
+                    request.error = ex
+                    self._record(request)
+                    continue
+                active.append(conn)
+                while pending and conn.can_send(pending[0]):
+                    conn.send(pending.popleft())
+
+            now = time.time()
+            for conn in list(active):
+                if not conn.inflight and conn.state in ('ready', 'closing'):
+                    active.remove(conn)
+                    if conn.state == 'ready':
+                        with self._lock:
+                            self._idle.append(conn)
+                    else:
+                        conn.close()
+                elif now - conn.last_activity > self.timeout:
+                    active.remove(conn)
+                    self._fail(conn, socket.timeout(
+                        "No response in %s seconds" % self.timeout
+                    ), pending)
+            if not active:
+                continue
+
+            interval = SELECT_INTERVAL
+            if deadline is not None:
+                interval = min(interval, deadline.remaining())
+            readable, writable, _ = select.select(
+                [c for c in active if c.want_read],
+                [c for c in active if c.want_write],
+                [], interval
+            )
+            for conn in set(writable + readable):
+                try:
+                    done = []
+                    if conn in writable:
+                        done.extend(conn.handle_write())
+                    if conn in readable and conn.state != 'closed':
+                        done.extend(conn.handle_read())
+                except (socket.error, ssl.SSLError, ValueError) as ex:
+                    active.remove(conn)
+                    self._fail(conn, ex, pending)
+                    continue
+                for request in done:
+                    self._record(request)
+                if conn.state == 'closing':
+                    # server answered with Connection: close, requests
+                    # pipelined behind were not processed
+                    active.remove(conn)
+                    conn.close()
+                    if conn.inflight:
+                        self._disable_pipelining()
+                    for request in reversed(conn.inflight):
+                        self._resend(request, EOFError(
+                            "Connection closed by server before response"
+                        ), pending)
+                    conn.inflight.clear()
+                elif conn.state == 'closed':
+                    active.remove(conn)
+                    if conn.inflight:
+                        self._fail(conn, EOFError(
+                            "Connection closed by server"
+                        ), pending)
+        return requests
+
+    def _disable_pipelining(self):
+        with self._lock:
+            if self.pipeline_depth == 1:
+                return
+            self.pipeline_depth = 1
+        logger.debug(
+            "%s closes connections with pipelined requests, pipelining "
+            "disabled", self.host
+        )
+
+    def close(self):
+        """
+        Close idle connections
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2010 Red Hat, Inc.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this software; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA, or see the FSF site: http://www.fsf.org.
+
+"""
+REST API utils running batches of requests concurrently.
+
+AsyncRestUtil is RestUtil (engine 'rest_async') with additional batch
+methods get_many, find_many and action_many. Requests of a batch are sent
+by AsyncHTTPClient from the calling thread over a bounded number of
+keep-alive connections, all other methods behave as in RestUtil.
+"""
+
+import re
+import threading
+
+import art.core_api.apis_utils as api_utils
+from art.core_api import http
+from art.core_api.apis_exceptions import EntityNotFound
+from art.core_api.async_http import (
+    AsyncHTTPClient,
+    AsyncRequest,
+    DEF_MAX_CONNECTIONS,
+    DEF_PIPELINE_DEPTH,
+    DEF_TIMEOUT,
+)
+from art.core_api.rest_utils import RespKey, RestUtil
+
+
+class AsyncRestUtil(RestUtil):
+    """
+    Implements REST APIs methods, with batch methods
+    """
+    client = None
+    client_lock = threading.Lock()
+
+    def login(self):
+        """
+        Login to rest api and create HTTP client shared by all instances
+        """
+        super(AsyncRestUtil, self).login()
+        with AsyncRestUtil.client_lock:
+            if AsyncRestUtil.client is None:
+                conn = self.opts['REST_CONNECTION']
+                run = self.opts['RUN']
+                AsyncRestUtil.client = AsyncHTTPClient(
+                    conn['scheme'], conn['host'], conn['port'],
+                    max_connections=run.get(
+                        'async_max_connections', DEF_MAX_CONNECTIONS
+                    ),
+                    pipeline_depth=run.get(
+                        'async_pipeline_depth', DEF_PIPELINE_DEPTH
+                    ),
+                    timeout=run.get('async_timeout', DEF_TIMEOUT),
+                )
+
+    @classmethod
+    def logout(cls):
+        """
+        Logout from rest api and close connections of HTTP client
+        """
+        with AsyncRestUtil.client_lock:
+            if AsyncRestUtil.client is not None:
+                AsyncRestUtil.client.close()
+            AsyncRestUtil.client = None
+        super(AsyncRestUtil, cls).logout()
+
+    def _request(self, method, url, body=None, headers=None):
+        """
+        Build request with session headers, same as HTTPProxy sends
+        """
+        request_headers = self.api.basic_headers()
+        if body:
+            request_headers['Content-type'] = self.api.type
+        if headers:
+            request_headers.update(headers)
+        return AsyncRequest(method, url, body, request_headers)
+
+    def run_requests(self, requests):
+        """
+        Run requests concurrently, requests failed for expired session are
+        run again after new login
+
+        Args:
+            requests (list): Tuples of method, url, body and headers
+
+        Returns:
+            list: Responses in order of requests, as returned by HTTPProxy,
+                None for requests failed without response
+        """
+        sent = [self._request(*request) for request in requests]
+        self.client.run(sent)
+        expired = [i for i, request in enumerate(sent) if (
+            request.status == 401 and self.api.cookie
+        )]
+        if expired:
+            self.api.connect()
+            repeated = [self._request(*requests[i]) for i in expired]
+            self.client.run(repeated)
+            for i, request in zip(expired, repeated):
+                sent[i] = request
+
+        responses = []
+        for request in sent:
+            if request.error is not None:
+                self.logger.error(
+                    "%s request to %s failed: %s",
+                    request.method, request.url, request.error
+                )
+                responses.append(None)
+                continue
+            charset = http.encoding_from_headers(request) or 'utf-8'
+            body = request.response_body.decode(charset)
+            # W/A lxml issue with unicode strings having declarations
+            body = re.sub(r'^\s*<\?xml\s+.*?\?>', '', body)
+            ret = {RespKey.status: request.status, RespKey.body: body}
+            if request.status >= 300:
+                ret[RespKey.reason] = request.reason
+            responses.append(ret)
+        return responses
+
+    def get_many(
+        self, hrefs, elm=None, list_only=False, validate=True, lazy=None
+    ):
+        """
+        GET many urls concurrently, bypassing entity cache
+
+        Args:
+            hrefs (list): Absolute urls
+            elm (str): element name
+            list_only (bool): True to return only elements of collections
+            validate (bool): True - validate, otherwise - False.
+            lazy (bool): True to build collection entries only on access to
+                other attributes than id, href, name and status, None to use
+                RUN.lazy_collections.
+
+        Returns:
+            list: Parsed responses in order of hrefs, None for failed ones
+        """
+        elm = elm or self.element_name
+        if lazy is None:
+            lazy = self.lazy_collections
+        responses = self.run_requests(
+            [('GET', href, None, None) for href in hrefs]
+        )
+        return [
+            None if ret is None else self.parse_response(
+                href, ret, elm, list_only, validate=validate, lazy=lazy
+            ) for href, ret in zip(hrefs, responses)
+        ]
+
+    def find_many(self, values, attribute='name'):
+        """
+        Find many entities, looked up concurrently on server side, entities
+        which can't be looked up are found in collection fetched once
+
+        Args:
+            values (list): Values of entity attribute to look for
+            attribute (str): Attribute name for searching
+
+        Returns:
+            list: Found entities in order of values
+
+        Raises:
+            EntityNotFound: If any entity not found
+            MoreThanOneEntitiesFound: If any entity occurs more times
+        """
+        href = self.links[self.collection_name]
+        candidates = [None] * len(values)
+        lookups = []
+        if self.server_side_find:
+            for i, val in enumerate(values):
+                url, stat = self.lookup_url(href, val, attribute)
+                if url is not None:
+                    lookups.append((i, url, stat))
+        responses = self.run_requests(
+            [('GET', lookup[1], None, None) for lookup in lookups]
+        )
+        for (i, _, stat), ret in zip(lookups, responses):
+            if ret is not None:
+                candidates[i] = self.lookup_results(
+                    href, attribute, stat, ret
+                )
+
+        collection = None
+        collection_href = href
+        if any(results is None for results in candidates):
+            if self.max_collection is not None:
+                collection_href = '{0};max={1}'.format(
+                    href, self.max_collection
+                )
+            collection = self.get(collection_href, list_only=True)
+            if collection:
+                self._collection_sizes[href] = len(collection)
+            self.update_stats(find_scan=1)
+            if not collection:
+                raise EntityNotFound("Empty collection %s" % collection_href)
+
+        return [
+            self.select_result(
+                val, attribute, collection if results is None else results,
+                href if results is not None else collection_href
+            ) for val, results in zip(values, candidates)
+        ]
+
+    def action_many(self, entities, action, positive=True, **kwargs):
+        """
+        Run action on many entities concurrently
+
+        Args:
+            entities (list): Target entities
+            action (str): Action to run
+            positive (bool): Positive or negative behaviour
+
+        Keyword Args:
+            Same as syncAction
+
+        Returns:
+            list: POST responses in order of entities, None for failed ones
+        """
+        expected_async_pos_status = kwargs.pop(
+            "positive_async_stat", [200, 202]
+        )
+        expected_sync_pos_status = kwargs.pop(
+            "positive_sync_stat", api_utils.POSITIVE_CODES
+        )
+        expected_neg_status = kwargs.pop(
+            "negative_stat", api_utils.NEGATIVE_CODES
+        )
+        async = kwargs.pop("async", False)
+        positive_stat = (
+            expected_async_pos_status if async else expected_sync_pos_status
+        )
+
+        requests = []
+        for entity in entities:
+            action_href, action_body = self.build_action(
+                entity, action, async, **kwargs
+            )
+            self.logger.debug(
+                "Action request content is --  url:%(uri)s body:%(body)s",
+                {"uri": action_href, "body": action_body}
+            )
+            requests.append((
+                'POST', action_href, action_body, self.correlationIdHeaders(
+                    api_utils.ApiOperation.syncAction
+                )
+            ))
+        responses = self.run_requests(requests)
+
+        results = []
+        for entity, request, ret in zip(entities, requests, responses):
+            self.invalidate_cache(request[1])
+            results.append(None if ret is None else self.check_action_response(
+                entity, action, request[1], positive, async, positive_stat,
+                expected_neg_status, ret
+            ))
+        return results
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2010 Red Hat, Inc.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this software; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA, or see the FSF site: http://www.fsf.org.
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+DEF_MAX_ENTRIES = 1000  # default maximum number of cached entries
+
+MISSING = object()
+
+logger = logging.getLogger('cache')
+
+ID_SEGMENT_RE = re.compile(
+    r'/(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-'
+    r'[0-9a-fA-F]{12}|\d+)(?=/|$)'
+)
+
+
+def normalize_href(href):
+    """
+    Strip query and matrix parameters and trailing slash from href
+
+    Args:
+        href (str): Entity or collection href
+
+    Returns:
+        str: Path part of href
+    """
+    return re.split('[?;]', href, 1)[0].rstrip('/')
+
+
+def href_template(href):
+    """
+    Get href template, path of href with ids replaced by placeholder
+
+    Args:
+        href (str): Request href
+
+    Returns:
+        str: Href template
+    """
+    return ID_SEGMENT_RE.sub('/{id}', normalize_href(href))
+
+
+class EntityCache(object):
+    """
+    Read-through cache of parsed entities with short time to live.
+
+    Every entry records hrefs it depends on, an entry is invalidated when
+    a mutating request touches any of its hrefs, a parent or a child of them.
+    Cached objects are copied on store and on hit, so callers can modify
+    them freely.
+    """
+
+    def __init__(self, ttl, max_entries=DEF_MAX_ENTRIES):
+        """
+        Args:
+            ttl (float): Seconds the entry is valid for
+            max_entries (int): Maximum number of cached entries
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get cached value
+
+        Args:
+            key (tuple): Cache key
+
+        Returns:
+            object: Copy of cached value or MISSING
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, _, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                return MISSING
+        return copy.deepcopy(value)
+
+    def set(self, key, value, *hrefs):
+        """
+        Store value in cache
+
+        Args:
+            key (tuple): Cache key
+            value (object): Value to store
+            hrefs (list): Hrefs the value depends on
+        """
+        value = copy.deepcopy(value)
+        deps = [normalize_href(href) for href in hrefs if href]
+        now = time.time()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._purge(now)
+            self._entries[key] = (now + self.ttl, deps, value)
+
+    def invalidate(self, href):
+        """
+        Drop all entries depending on href, its parents or children
+
+        Args:
+            href (str): Href touched by mutating request
+
+        Returns:
+            int: Number of invalidated entries
+        """
+        path = normalize_href(href)
+        with self._lock:
+            stale = [
+                key for key, (_, deps, _) in self._entries.iteritems()
+                if any(
+                    path.startswith(dep) or dep.startswith(path)
+                    for dep in deps
+                )
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        """
+        Drop all entries
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _purge(self, now):
+        """
+        Drop expired entries, or the oldest half if nothing expired
+        """
+        expired = [
+            key for key, entry in self._entries.iteritems() if entry[0] < now
+        ]
+        if not expired:
+            expired = sorted(
+                self._entries, key=lambda k: self._entries[k][0]
+            )[:self.max_entries / 2 or 1]
+        for key in expired:
+            del self._entries[key]
+
+
+def file_digest(path):
+    """
+    Get SHA1 digest of file content
+
+    Args:
+        path (str): Path to file
+
+    Returns:
+        str: Hex digest, or None if the file can't be read
+    """
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 16), b''):
+                digest.update(chunk)
+    except (IOError, OSError, TypeError):
+        return None
+    return digest.hexdigest()
+
+
+class LinksCache(object):
+    """
+    Links matrices of API entry points, kept in memory for the whole
+    session and optionally persisted in JSON file for next sessions.
+
+    Keys should identify the engine and its API version (e.g. entry point
+    url, user and digest of API schema), entries are never expired.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Path to JSON file to persist links in, None to keep
+                them only in memory
+        """
+        self.path = path
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """
+        Load persisted entries, called with lock held
+        """
+        self._entries = {}
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as fh:
+                entries = json.load(fh)
+            # httplib can't mix unicode urls with encoded bodies
+            self._entries = dict(
+                (key, dict(
+                    (str(name), str(href)) for name, href in links.iteritems()
+                ))
+                for key, links in entries.iteritems()
+            )
+        except (IOError, ValueError) as ex:
+            logger.warning("Failed to load links cache %s: %s", self.path, ex)
+
+    def _store(self):
+        """
+        Persist entries, called with lock held
+        """
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            with open(tmp_path, 'w') as fh:
+                json.dump(self._entries, fh)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as ex:
+            logger.warning("Failed to store links cache %s: %s", self.path, ex)
+
+    def get(self, key):
+        """
+        Get links matrix
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            dict: Links matrix, or None if not cached
+        """
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            return self._entries.get(key)
+
+    def set(self, key, links):
+        """
+        Store links matrix
+
+        Args:
+            key (str): Cache key
+            links (dict): Links matrix
+        """
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            self._entries[key] = links
+            if self.path:
+                self._store()
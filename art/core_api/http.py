@@ -19,17 +19,219 @@
 
 import base64
 import cgi
+import collections
 import httplib
 import logging
 import re
+import select
+import socket
 import ssl
-from contextlib import contextmanager
-from multiprocessing import Manager
+import threading
+import time
 
+from art.core_api import metrics, timeout
 from art.core_api.apis_exceptions import APIException
 
 logger = logging.getLogger('http')
 
+DEF_MAX_POOL_SIZE = 10  # default number of idle keep-alive connections
+DEF_POOL_IDLE_TIMEOUT = 60  # default seconds before idle connection eviction
+
+# errors raised when server closed the keep-alive connection meanwhile
+STALE_CONNECTION_ERRORS = (
+    socket.error, httplib.BadStatusLine, httplib.CannotSendRequest,
+    httplib.ResponseNotReady,
+)
+# methods safe to send again when it's unknown whether the server got them
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class HeaderStore(collections.MutableMapping):
+    """
+    In-process store of request headers shared by all threads, with
+    per-thread overrides (e.g. Correlation-Id, All-content) which take
+    precedence over shared headers only in the thread which set them
+    """
+
+    def __init__(self, headers=None):
+        """
+        Args:
+            headers (dict): Initial shared headers
+        """
+        self._shared = dict(headers or {})
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def _overrides(self):
+        overrides = getattr(self._local, 'headers', None)
+        if overrides is None:
+            overrides = self._local.headers = {}
+        return overrides
+
+    def __getitem__(self, key):
+        overrides = self._overrides
+        if key in overrides:
+            return overrides[key]
+        with self._lock:
+            return self._shared[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._shared[key] = value
+
+    def __delitem__(self, key):
+        overrides = self._overrides
+        if key in overrides:
+            del overrides[key]
+            return
+        with self._lock:
+            del self._shared[key]
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __len__(self):
+        return len(self.copy())
+
+    def copy(self):
+        """
+        Get headers as seen by the current thread
+
+        Returns:
+            dict: Shared headers updated with current thread overrides
+        """
+        with self._lock:
+            headers = dict(self._shared)
+        headers.update(self._overrides)
+        return headers
+
+    def set_local(self, key, value):
+        """
+        Set header only for requests sent from the current thread
+
+        Args:
+            key (str): Header name
+            value (str): Header value
+        """
+        self._overrides[key] = value
+
+    def pop_local(self, key, default=None):
+        """
+        Remove header override of the current thread
+
+        Args:
+            key (str): Header name
+            default (str): Value to return if override is not set
+
+        Returns:
+            str: Removed header value
+        """
+        return self._overrides.pop(key, default)
+
+
+class ConnectionPool(object):
+    """
+    Bounded pool of idle keep-alive connections shared by all threads
+    """
+
+    def __init__(self, factory, max_size, idle_timeout):
+        """
+        Args:
+            factory (callable): Function which creates new connection
+            max_size (int): Maximum number of idle connections kept in pool
+            idle_timeout (int): Seconds after idle connection is evicted
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reconnects = 0
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Get idle connection from pool or create new one
+
+        Returns:
+            tuple: connection, True if connection was reused otherwise False
+        """
+        expired = []
+        with self._lock:
+            deadline = time.time() - self.idle_timeout
+            while self._idle and self._idle[0][1] < deadline:
+                expired.append(self._idle.popleft()[0])
+            self.evictions += len(expired)
+            if self._idle:
+                self.hits += 1
+                conn = self._idle.pop()[0]
+            else:
+                self.misses += 1
+                conn = None
+        for old_conn in expired:
+            old_conn.close()
+        if conn is not None:
+            return conn, True
+        return self.factory(), False
+
+    def release(self, conn):
+        """
+        Return connection back to pool, close it if the pool is full or
+        the server asked to close it
+
+        Args:
+            conn (HTTPConnection): Connection to return
+        """
+        if conn.sock is not None:
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append((conn, time.time()))
+                    return
+        conn.close()
+
+    def reconnect(self, conn):
+        """
+        Replace broken connection with new one
+
+        Args:
+            conn (HTTPConnection): Broken connection
+
+        Returns:
+            HTTPConnection: New connection
+        """
+        conn.close()
+        with self._lock:
+            self.reconnects += 1
+        return self.factory()
+
+    def clear(self):
+        """
+        Close all idle connections
+        """
+        with self._lock:
+            idle, self._idle = self._idle, collections.deque()
+        for conn, _ in idle:
+            conn.close()
+
+    def stats(self):
+        """
+        Get pool counters
+
+        Returns:
+            dict: hits, misses, evictions, reconnects and idle connections
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'reconnects': self.reconnects,
+                'idle': len(self._idle),
+            }
+
 
 class HTTPProxy(object):
     """
@@ -41,39 +243,86 @@ class HTTPProxy(object):
         self.cookie = None
         self.last_active_user = None
         self.type = opts['RUN']['media_type']
-        self.process_manager = Manager()
-        self.headers = self.process_manager.dict(
-            self.opts.get('HTTP_HEADERS', {})
+        self.headers = HeaderStore(self.opts.get('HTTP_HEADERS', {}))
+        self.pool = ConnectionPool(
+            self.create_connection,
+            max_size=self.opts['REST_CONNECTION'].get(
+                'max_pool_size', DEF_MAX_POOL_SIZE
+            ),
+            idle_timeout=self.opts['REST_CONNECTION'].get(
+                'pool_idle_timeout', DEF_POOL_IDLE_TIMEOUT
+            ),
         )
 
-    @contextmanager
     def create_connection(self):
         """
         Create new HTTP or HTTPS connection.
         """
-        conn = None
-        try:
-            # Create HTTPS Connection
-            if self.opts['REST_CONNECTION']['scheme'] == 'https':
-                context = None
-                # https://www.python.org/dev/peps/pep-0476/
-                if hasattr(ssl, "_create_unverified_context"):
-                    context = ssl._create_unverified_context()
-                conn = httplib.HTTPSConnection(
-                    self.opts['REST_CONNECTION']['host'],
-                    self.opts['REST_CONNECTION']['port'],
-                    context=context
-                )
-            else:  # Create HTTP Connection
-                conn = httplib.HTTPConnection(
-                    self.opts['REST_CONNECTION']['host'],
-                    self.opts['REST_CONNECTION']['port']
-                )
+        # Create HTTPS Connection
+        if self.opts['REST_CONNECTION']['scheme'] == 'https':
+            context = None
+            # https://www.python.org/dev/peps/pep-0476/
+            if hasattr(ssl, "_create_unverified_context"):
+                context = ssl._create_unverified_context()
+            return httplib.HTTPSConnection(
+                self.opts['REST_CONNECTION']['host'],
+                self.opts['REST_CONNECTION']['port'],
+                context=context
+            )
+        # Create HTTP Connection
+        return httplib.HTTPConnection(
+            self.opts['REST_CONNECTION']['host'],
+            self.opts['REST_CONNECTION']['port']
+        )
 
-            yield conn
-        finally:
-            if conn:
-                conn.close()
+    def __send(self, method, url, body, headers):
+        """
+        Send request over pooled keep-alive connection and read the response.
+        Reused connection which the server closed meanwhile is replaced before
+        sending, idempotent requests are sent once again if it turns out
+        to be closed only while sending, others (POST, PUT, DELETE) may have
+        been processed by the server and fail
+
+        Args:
+            method (str): Request method(GET, POST, PUT, DELETE)
+            url (str): Request url
+            body (str): Request body
+            headers (dict): Request headers
+
+        Returns:
+            tuple: response object, raw response body, number of retries
+        """
+        conn, reused = self.pool.acquire()
+        if reused and _is_dropped(conn):
+            conn = self.pool.reconnect(conn)
+            reused = False
+        retries = 0
+        # connection of the request, aborted if current deadline expires
+        active = [conn]
+        try:
+            with timeout.cancelling(lambda: _abort(active[0])) as deadline:
+                try:
+                    conn.request(method, url, body, headers=headers)
+                    resp = conn.getresponse()
+                except STALE_CONNECTION_ERRORS as ex:
+                    if (
+                        not reused or method not in IDEMPOTENT_METHODS or
+                        deadline is not None and deadline.has_expired()
+                    ):
+                        raise
+                    logger.debug(
+                        "Reconnecting keep-alive connection: %s", ex
+                    )
+                    conn = active[0] = self.pool.reconnect(conn)
+                    retries += 1
+                    conn.request(method, url, body, headers=headers)
+                    resp = conn.getresponse()
+                resp_body = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        self.pool.release(conn)
+        return resp, resp_body, retries
 
     def connect(self):
         """
@@ -88,7 +337,8 @@ class HTTPProxy(object):
         self.last_active_user = self.__get_user()
 
     def __do_request(
-        self, method, url, body=None, get_header=None, repeat=True
+        self, method, url, body=None, get_header=None, repeat=True,
+        headers=None
     ):
         """
         Run HTTP request
@@ -97,74 +347,96 @@ class HTTPProxy(object):
             method (str): Request method(GET, POST, PUT, DELETE)
             url (str): Request url
             body (str): Request body
-            get_header (str): Name of the header to return with the response
+            get_header (str): Name of the header to return with the response,
+                or list of names
             repeat (bool): Repeat request in case of authorization error
+            headers (dict): Headers of this request only (e.g.
+                Correlation-Id), take precedence over stored headers
         """
-        with self.create_connection() as conn:
-            headers = dict(self.basic_headers())
-
-            if body:
-                headers['Content-type'] = self.type
-
-            # run http request
-            conn.request(method, url, body, headers=headers)
-            # get response
-            resp = conn.getresponse()
-
-            charset = encoding_from_headers(resp) or 'utf-8'
-
-            resp_body = resp.read().decode(charset)
-            # W/A lxml issue with unicode strings having declarations
-            resp_body = re.sub(r'^\s*<\?xml\s+.*?\?>', '', resp_body)
-
-            ret = {'status': resp.status, 'body': resp_body}
-
-            if headers.get('Authorization', None):
-                self.cookie = resp.getheader('Set-Cookie')
-                self.last_active_user = self.__get_user()
-
-            if resp.status == 401 and self.cookie:
-                if repeat:  # Update cookie and send request again
-                    self.connect()
-                    return self.__do_request(
-                        method=method,
-                        url=url,
-                        body=body,
-                        get_header=get_header,
-                        repeat=False
-                    )
+        extra_headers = headers
+        headers = self.basic_headers()
+        if extra_headers:
+            headers.update(extra_headers)
+
+        if body:
+            headers['Content-type'] = self.type
+
+        # run http request and get response
+        start = time.time()
+        try:
+            resp, resp_body, retries = self.__send(
+                method, url, body, headers
+            )
+        except Exception:
+            metrics.registry.record(
+                method, url, time.time() - start, None, len(body or '')
+            )
+            raise
+        metrics.registry.record(
+            method, url, time.time() - start, resp.status, len(body or ''),
+            len(resp_body), retries
+        )
 
-            if resp.status >= 300:
-                ret['reason'] = resp.reason
+        charset = encoding_from_headers(resp) or 'utf-8'
+
+        resp_body = resp_body.decode(charset)
+        # W/A lxml issue with unicode strings having declarations
+        resp_body = re.sub(r'^\s*<\?xml\s+.*?\?>', '', resp_body)
+
+        ret = {'status': resp.status, 'body': resp_body}
+
+        if headers.get('Authorization', None):
+            self.cookie = resp.getheader('Set-Cookie')
+            self.last_active_user = self.__get_user()
+
+        if resp.status == 401 and self.cookie:
+            if repeat:  # Update cookie and send request again
+                self.connect()
+                return self.__do_request(
+                    method=method,
+                    url=url,
+                    body=body,
+                    get_header=get_header,
+                    repeat=False,
+                    headers=extra_headers
+                )
 
-            if get_header:
-                ret[get_header] = resp.getheader(get_header)
+        if resp.status >= 300:
+            ret['reason'] = resp.reason
 
-            return ret
+        if isinstance(get_header, basestring):
+            ret[get_header] = resp.getheader(get_header)
+        elif get_header:
+            for name in get_header:
+                ret[name] = resp.getheader(name)
 
-    def GET(self, url):
+        return ret
+
+    def GET(self, url, headers=None, get_header=None):
         '''
         GET HTTP request
         '''
-        return self.__do_request("GET", url)
+        return self.__do_request(
+            "GET", url, headers=headers, get_header=get_header
+        )
 
-    def POST(self, url, body):
+    def POST(self, url, body, headers=None):
         '''
         POST HTTP request
         '''
-        return self.__do_request("POST", url, body)
+        return self.__do_request("POST", url, body, headers=headers)
 
-    def PUT(self, url, body):
+    def PUT(self, url, body, headers=None):
         '''
         PUT HTTP request
         '''
-        return self.__do_request("PUT", url, body)
+        return self.__do_request("PUT", url, body, headers=headers)
 
-    def DELETE(self, url, body=None):
+    def DELETE(self, url, body=None, headers=None):
         '''
         DELETE HTTP request
         '''
-        return self.__do_request("DELETE", url, body)
+        return self.__do_request("DELETE", url, body, headers=headers)
 
     def basic_auth(self):
         '''
@@ -182,10 +454,7 @@ class HTTPProxy(object):
         '''
         Build request headers
         '''
-        if self.headers:
-            headers = self.process_manager.dict(self.headers)
-        else:
-            headers = self.process_manager.dict()
+        headers = self.headers.copy()
 
         if (
                 self.opts['REST_CONNECTION']['user'] and
@@ -248,6 +517,27 @@ class HTTPProxy(object):
         return links
 
 
+def _is_dropped(conn):
+    """
+    Check whether idle connection was closed by the server, idle keep-alive
+    connection is readable only if the server closed it
+    """
+    if conn.sock is None:
+        return True
+    try:
+        return bool(select.select([conn.sock], [], [], 0)[0])
+    except (select.error, socket.error, ValueError):
+        return True
+
+
+def _abort(conn):
+    """
+    Abort request in flight on connection from other thread
+    """
+    if conn.sock is not None:
+        conn.sock.shutdown(socket.SHUT_RDWR)
+
+
 def encoding_from_headers(response):
     content_type = response.getheader('Content-Type')
 
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2010 Red Hat, Inc.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this software; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA, or see the FSF site: http://www.fsf.org.
+
+"""
+Lazy materialization of collection responses.
+
+Entries of a collection are kept as raw lxml elements wrapped in instances
+of a subclass of their generated class. Only the cheap fields (id, href,
+name, status) are filled in up front, the first access to any other
+attribute builds the entry from its element and turns the instance into
+a regular object of the generated class.
+"""
+
+import threading
+
+CHEAP_ATTRIBUTES = ('id', 'href')
+CHEAP_CHILDREN = ('name', 'status')
+
+# entries are shared by threads, only one of them builds an entry
+_materialize_lock = threading.Lock()
+
+
+class LazyEntity(object):
+    """
+    Mixin of lazy collection entries, the generated class follows it in
+    bases
+    """
+
+    def __getattr__(self, name):
+        # called only for attributes missing in instance dict, probing of
+        # attributes the class doesn't have (getattr with default) doesn't
+        # need the entry built, generated classes keep their internals in
+        # names ending with underscore
+        if (
+            name.startswith('__') or '_lazy_node' not in self.__dict__ or
+            name not in self._gds_members and not name.endswith('_')
+        ):
+            raise AttributeError(name)
+        self.materialize()
+        return getattr(self, name)
+
+    def materialize(self):
+        """
+        Build the entry from its element, the element is dropped only after
+        the entry became regular object so other threads never see entry
+        with neither of them
+        """
+        with _materialize_lock:
+            node = self.__dict__.get('_lazy_node')
+            if node is None:
+                return
+            full = self._lazy_build(self._gds_class, node)
+            # keep values set by caller before materialization
+            for key, value in full.__dict__.iteritems():
+                self.__dict__.setdefault(key, value)
+            self.__class__ = full.__class__
+            del self.__dict__['_lazy_node']
+
+
+class LazyCollection(list):
+    """
+    List of lazily built collection entries
+    """
+
+    def materialize(self):
+        """
+        Build all entries not built yet
+        """
+        for entity in self:
+            if isinstance(entity, LazyEntity):
+                entity.materialize()
+
+
+class LazyParser(object):
+    """
+    Parser building collection entries lazily
+    """
+
+    def __init__(self, module, build):
+        """
+        Args:
+            module (module): Module generated by generateDS
+            build (callable): Builds object of given class from element
+        """
+        self.module = module
+        self.build = build
+        self.specs = getattr(module, 'GDSBuildSpecs', None)
+        self._lazy_classes = {}
+        self._members = {}
+        self._cheap_fields = {}
+
+    def _get_class(self, tag):
+        cls = self.module.GDSClassesMapping.get(tag)
+        if cls is None:
+            cls = getattr(self.module, tag, None)
+        return cls
+
+    def _get_members(self, cls):
+        """
+        Get names of all members of generated class
+
+        Args:
+            cls (type): Generated class
+
+        Returns:
+            set: Names of constructor arguments of the class
+        """
+        members = self._members.get(cls)
+        if members is None:
+            code = cls.__init__.__func__.__code__
+            members = set(code.co_varnames[1:code.co_argcount])
+            self._members[cls] = members
+        return members
+
+    def _get_cheap_fields(self, cls):
+        """
+        Get cheap fields the entries of class can be created with
+
+        Args:
+            cls (type): Generated class
+
+        Returns:
+            tuple: Names of cheap attributes and simple children
+        """
+        fields = self._cheap_fields.get(cls)
+        if fields is None:
+            members = self._get_members(cls)
+            attrs = [name for name in CHEAP_ATTRIBUTES if name in members]
+            children = [name for name in CHEAP_CHILDREN if name in members]
+            spec = self.specs.get(cls.__name__) if self.specs else None
+            if spec is not None:
+                if spec[0] is not None:
+                    attrs = [
+                        name for name in attrs
+                        if spec[0].get(name, (None, None))[1] == 'str'
+                    ]
+                if spec[1] is not None:
+                    children = [
+                        name for name in children
+                        if spec[1].get(name) and
+                        spec[1][name][1] == 'str' and not spec[1][name][3]
+                    ]
+            fields = self._cheap_fields[cls] = (attrs, children)
+        return fields
+
+    def _get_entry(self, root_cls, elm):
+        """
+        Get XML tag and class of collection entries
+
+        Args:
+            root_cls (type): Class of collection
+            elm (str): Member of collection class holding the entries
+
+        Returns:
+            tuple: Tag and class of entries, or None if the class isn't
+                collection of elm
+        """
+        if elm not in self._get_members(root_cls):
+            return None
+        if self.specs is not None:
+            spec = self.specs.get(root_cls.__name__)
+            if spec is None or spec[1] is None:
+                return None
+            for tag, child in spec[1].iteritems():
+                if child is not None and child[0] == elm and child[3]:
+                    if child[1] != 'obj':
+                        return None
+                    cls = getattr(self.module, child[2], None)
+                    return (tag, cls) if cls is not None else None
+            return None
+        cls = self._get_class(elm)
+        return (elm, cls) if cls is not None else None
+
+    def _get_lazy_class(self, cls):
+        lazy_cls = self._lazy_classes.get(cls)
+        if lazy_cls is None:
+            lazy_cls = type(cls.__name__, (LazyEntity, cls), {
+                '_gds_class': cls,
+                '_gds_members': self._get_members(cls),
+                '_lazy_build': staticmethod(self.build),
+            })
+            self._lazy_classes[cls] = lazy_cls
+        return lazy_cls
+
+    @staticmethod
+    def _make_entity(lazy_cls, fields, node):
+        entity = lazy_cls.__new__(lazy_cls)
+        values = entity.__dict__
+        values['_lazy_node'] = node
+        attrs, children = fields
+        for name in attrs:
+            values[name] = node.get(name)
+        for name in children:
+            child = node.find(name)
+            if child is None:
+                values[name] = None
+            elif not len(child) and not child.attrib:
+                values[name] = child.text or ''
+        return entity
+
+    def parse_node(self, node, elm):
+        """
+        Build root object of parsed XML document, entries of collection are
+        built lazily
+
+        Args:
+            node (Element): Root element of the document
+            elm (str): Member of collection class holding the entries
+
+        Returns:
+            object: Root object of the document, or None if the root
+                element has no generated class
+        """
+        root_cls = self._get_class(node.tag.rpartition('}')[2])
+        if root_cls is None:
+            return None
+        entry = self._get_entry(root_cls, elm)
+        if entry is None:
+            return self.build(root_cls, node)
+
+        tag, cls = entry
+        lazy_cls = self._get_lazy_class(cls)
+        fields = self._get_cheap_fields(cls)
+        root = root_cls.factory()
+        setattr(root, elm, LazyCollection(
+            self._make_entity(lazy_cls, fields, child)
+            for child in node.iterchildren(tag=tag)
+        ))
+        return root
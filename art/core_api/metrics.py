@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2010 Red Hat, Inc.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this software; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA, or see the FSF site: http://www.fsf.org.
+
+"""
+Registry of REST request and sampler metrics.
+
+Wall clock latency, status codes, request and response sizes and retries
+are recorded per (method, href template) endpoint. Number of samples and
+time to success of TimeoutingSampler are recorded per call site. Values
+are kept in HDR style histograms, buckets grow exponentially and every
+power of two is split into linear sub buckets, so memory is bounded and
+percentiles keep fixed relative precision.
+"""
+
+import json
+import logging
+import threading
+from collections import Counter
+
+from art.core_api.cache import href_template
+
+logger = logging.getLogger('metrics')
+
+DEF_SUB_BUCKET_BITS = 5  # 32 sub buckets per power of two, ~3% precision
+PERCENTILES = (50, 90, 99, 99.9)
+SAMPLER_SUCCESS = 'success'  # caller stopped sampling, condition was met
+SAMPLER_TIMEOUT = 'timeout'
+SAMPLER_ERROR = 'error'  # sampled function raised
+
+
+def _to_ms(value):
+    return None if value is None else value / 1000.0
+
+
+def _format_seconds(ms):
+    return '-' if ms is None else '%.1fs' % (ms / 1000.0)
+
+
+def _histogram_summary(histogram, convert=lambda value: value):
+    """
+    Summarize histogram
+
+    Args:
+        histogram (Histogram): Histogram
+        convert (callable): Conversion of recorded values
+
+    Returns:
+        dict: min, max, mean and percentiles of recorded values
+    """
+    return dict(
+        [
+            ('min', convert(histogram.min)),
+            ('max', convert(histogram.max)),
+            ('mean', convert(histogram.mean())),
+        ] + [
+            ('p%s' % percent, convert(histogram.percentile(percent)))
+            for percent in PERCENTILES
+        ]
+    )
+
+
+class Histogram(object):
+    """
+    Log linear histogram of positive integer values
+    """
+
+    def __init__(self, sub_bucket_bits=DEF_SUB_BUCKET_BITS):
+        """
+        Args:
+            sub_bucket_bits (int): Log2 of number of linear sub buckets of
+                every power of two
+        """
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        shift = max(value.bit_length() - self.sub_bucket_bits - 1, 0)
+        return shift, value >> shift
+
+    def record(self, value):
+        """
+        Record value
+
+        Args:
+            value (int): Value to record, negative values are recorded as 0
+        """
+        value = max(int(value), 0)
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """
+        Get value at percentile, upper bound of its bucket
+
+        Args:
+            percent (float): Percentile, 0 to 100
+
+        Returns:
+            int: Value at percentile, None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        rank = max(percent / 100.0 * self.count, 1)
+        seen = 0
+        for (shift, sub), count in sorted(
+            self.counts.iteritems(), key=lambda item: item[0][1] << item[0][0]
+        ):
+            seen += count
+            if seen >= rank:
+                return min(((sub + 1) << shift) - 1, self.max)
+        return self.max
+
+    def mean(self):
+        """
+        Returns:
+            float: Mean of recorded values, None if nothing was recorded
+        """
+        return float(self.total) / self.count if self.count else None
+
+
+class EndpointMetrics(object):
+    """
+    Metrics of one (method, href template) endpoint
+    """
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = Counter()
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.retries = 0
+
+    def summary(self):
+        """
+        Returns:
+            dict: Counters and latency percentiles in milliseconds
+        """
+        return {
+            'count': self.latency.count,
+            'statuses': dict(
+                (str(status), count)
+                for status, count in self.statuses.iteritems()
+            ),
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'retries': self.retries,
+            'latency_ms': _histogram_summary(self.latency, _to_ms),
+        }
+
+
+class SamplerMetrics(object):
+    """
+    Metrics of one TimeoutingSampler call site
+    """
+
+    def __init__(self):
+        self.samples = Histogram()
+        self.time_to_success = Histogram()
+        self.outcomes = Counter()
+
+    def summary(self):
+        """
+        Returns:
+            dict: Outcomes, samples taken and time to success in milliseconds
+        """
+        return {
+            'count': self.samples.count,
+            'outcomes': dict(self.outcomes),
+            'samples': _histogram_summary(self.samples),
+            'time_to_success_ms': _histogram_summary(
+                self.time_to_success, _to_ms
+            ),
+        }
+
+
+class MetricsRegistry(object):
+    """
+    Thread safe registry of endpoint metrics
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._samplers = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, method, href, latency, status, request_bytes=0,
+        response_bytes=0, retries=0
+    ):
+        """
+        Record finished request
+
+        Args:
+            method (str): Request method
+            href (str): Request href, ids are replaced by placeholder
+            latency (float): Wall clock seconds of the request
+            status (int): Response status, None if request failed
+            request_bytes (int): Size of request body
+            response_bytes (int): Size of response body
+            retries (int): Number of times the request was sent again
+        """
+        key = (method, href_template(href))
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = EndpointMetrics()
+            endpoint.latency.record(latency * 1000000)
+            endpoint.statuses[status] += 1
+            endpoint.request_bytes += request_bytes
+            endpoint.response_bytes += response_bytes
+            endpoint.retries += retries
+
+    def record_sampler(self, site, samples, elapsed, outcome):
+        """
+        Record finished sampling
+
+        Args:
+            site (str): Call site of the sampler
+            samples (int): Number of samples taken
+            elapsed (float): Seconds from start until the last sample
+            outcome (str): SAMPLER_SUCCESS, SAMPLER_TIMEOUT or SAMPLER_ERROR
+        """
+        with self._lock:
+            sampler = self._samplers.get(site)
+            if sampler is None:
+                sampler = self._samplers[site] = SamplerMetrics()
+            sampler.samples.record(samples)
+            sampler.outcomes[outcome] += 1
+            if outcome == SAMPLER_SUCCESS:
+                sampler.time_to_success.record(elapsed * 1000000)
+
+    def summary(self):
+        """
+        Returns:
+            dict: Summary of every endpoint keyed by "METHOD template"
+        """
+        with self._lock:
+            return dict(
+                ('%s %s' % key, endpoint.summary())
+                for key, endpoint in self._endpoints.iteritems()
+            )
+
+    def sampler_summary(self):
+        """
+        Returns:
+            dict: Summary of every sampler keyed by call site
+        """
+        with self._lock:
+            return dict(
+                (site, sampler.summary())
+                for site, sampler in self._samplers.iteritems()
+            )
+
+    def log_summary(self):
+        """
+        Log latency percentiles of every endpoint, slowest first, and
+        samples taken by every sampler call site, most sampling first
+        """
+        summary = self.summary()
+        for name, endpoint in sorted(
+            summary.iteritems(),
+            key=lambda item: -item[1]['latency_ms']['p99']
+        ):
+            latency = endpoint['latency_ms']
+            logger.info(
+                "%s: count %d, p50 %.1fms, p90 %.1fms, p99 %.1fms, "
+                "max %.1fms, retries %d, statuses %s", name,
+                endpoint['count'], latency['p50'], latency['p90'],
+                latency['p99'], latency['max'], endpoint['retries'],
+                endpoint['statuses']
+            )
+        for site, sampler in sorted(
+            self.sampler_summary().iteritems(),
+            key=lambda item: -item[1]['count'] * item[1]['samples']['mean']
+        ):
+            samples = sampler['samples']
+            success = sampler['time_to_success_ms']
+            logger.info(
+                "Sampler %s: count %d, samples p50 %d, p90 %d, max %d, "
+                "time to success p50 %s, p90 %s, outcomes %s", site,
+                sampler['count'], samples['p50'], samples['p90'],
+                samples['max'], _format_seconds(success['p50']),
+                _format_seconds(success['p90']), sampler['outcomes']
+            )
+
+    def dump(self, path):
+        """
+        Dump summary of all endpoints and samplers to JSON file
+
+        Args:
+            path (str): Path to JSON file
+        """
+        with open(path, 'w') as fh:
+            json.dump(
+                {
+                    'endpoints': self.summary(),
+                    'samplers': self.sampler_summary(),
+                },
+                fh, indent=2, sort_keys=True
+            )
+        logger.info("REST metrics dumped to %s", path)
+
+    def clear(self):
+        """
+        Forget all recorded metrics
+        """
+        with self._lock:
+            self._endpoints.clear()
+            self._samplers.clear()
+
+
+registry = MetricsRegistry()
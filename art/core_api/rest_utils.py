@@ -16,19 +16,34 @@
 # License along with this software; if not, write to the Free
 # Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
 # 02110-1301 USA, or see the FSF site: http://www.fsf.org.
+import logging
 import re
 import threading
 import time
-from contextlib import contextmanager
+from collections import Counter
+from urlparse import urlparse
 
 import art.core_api.apis_utils as api_utils
 from art.core_api import http, template_parser, validator, measure_time
+from art.core_api.cache import EntityCache, LinksCache, MISSING, file_digest
+from art.core_api.status_watcher import StatusWatcher
+from art.core_api.xsd_validator import (
+    DEF_QUEUE_SIZE,
+    DEF_SAMPLE_RATE,
+    DEF_WORKERS,
+    XsdValidator,
+)
 from art.core_api.apis_exceptions import EntityNotFound, APIException,\
     APILoginError, MoreThanOneEntitiesFound
 from art.test_handler import settings
 from lxml import etree
 
 
+CREATE_VERIFY_ENTITY = 'entity'
+CREATE_VERIFY_COLLECTION = 'collection'
+CREATE_VERIFY_RESPONSE = 'response'
+
+
 class RespKey(object):
     '''
     Description: Class to represent the Responds Keys (like Enum)
@@ -42,10 +57,16 @@ class RespKey(object):
 
 class RestUtil(api_utils.APIUtil):
 
-    xsd = None
-    xsd_schema_errors = []
+    xsd_validator = None
     _restInit = None
-    context_lock = threading.Lock()
+    stats = Counter()
+    stats_lock = threading.Lock()
+    entity_cache = None
+    links_cache = None
+    links_lock = threading.Lock()
+    _xsd_digest = None
+    _collection_sizes = {}
+    _collection_bytes = {}
 
     '''
     Implements REST APIs methods
@@ -56,6 +77,14 @@ class RestUtil(api_utils.APIUtil):
             'entry_point'
         )
         self.standalone = self.opts['RUN'].get('standalone')
+        self.server_side_find = self.opts['RUN'].get('server_side_find', True)
+        self.lazy_collections = self.opts['RUN'].get('lazy_collections', False)
+        self.create_verify = self.opts['RUN'].get(
+            'create_verify', CREATE_VERIFY_ENTITY
+        )
+        cache_ttl = self.opts['RUN'].get('entity_cache_ttl')
+        if cache_ttl and RestUtil.entity_cache is None:
+            RestUtil.entity_cache = EntityCache(cache_ttl)
         self.login()
 
     def login(self):
@@ -85,7 +114,7 @@ class RestUtil(api_utils.APIUtil):
                     raise APILoginError(e)
 
         try:
-            self.links = self.api.HEAD_for_links()
+            self.links = self.get_links()
         except APIException as ex:
             raise APIException(
                 "Failed to Build links matrix from HEAD request. "
@@ -96,9 +125,14 @@ class RestUtil(api_utils.APIUtil):
                 RestUtil._restInit = self.api
 
         # load xsd schema file
-        if self.xsd is None:
-            xsd_schema = etree.parse(settings.ART_CONFIG['RUN']['api_xsd'])
-            self.xsd = etree.XMLSchema(xsd_schema)
+        if RestUtil.xsd_validator is None:
+            run = settings.ART_CONFIG['RUN']
+            RestUtil.xsd_validator = XsdValidator(
+                run['api_xsd'],
+                workers=run.get('xsd_workers', DEF_WORKERS),
+                queue_size=run.get('xsd_queue_size', DEF_QUEUE_SIZE),
+                sample_rate=run.get('xsd_sample_rate', DEF_SAMPLE_RATE),
+            )
 
         self.max_collection = settings.ART_CONFIG['RUN']['max_collection']
 
@@ -110,48 +144,119 @@ class RestUtil(api_utils.APIUtil):
         Parameters:
         Returns: True if logout succeeded or False otherwise
         """
+        if RestUtil._restInit is not None:
+            RestUtil._restInit.pool.clear()
         RestUtil._restInit = None
+        if RestUtil.entity_cache is not None:
+            RestUtil.entity_cache.clear()
 
-    @contextmanager
-    def correlationIdContext(self, api_operation):
+    def get_links(self):
         """
-        Description: context management for getting correlation id
-        Author: imeerovi
-        Parameters:
-            * api_operation - the api operation performed
-        Returns: correlation-id
+        Get links matrix of API entry point, HEAD request is sent only once
+        per engine, user and API schema, links are shared by all instances
+        and persisted in RUN.links_cache file if set
+
+        Returns:
+            dict: Links matrix
         """
-        with self.__class__.context_lock:
-            try:
-                self.api.headers['Correlation-Id'] = super(
-                    RestUtil, self).getCorrelationId(api_operation)
-                self.logger.info("Using Correlation-Id: %s",
-                                 self.api.headers['Correlation-Id'])
-                yield
-            finally:
-                self.logger.debug("Cleaning Correlation-Id: %s",
-                                  self.api.headers['Correlation-Id'])
-                self.api.headers.pop('Correlation-Id')
-
-    def validateResponseViaXSD(self, href, ret):
+        if self.standalone:
+            return self.api.HEAD_for_links()
+        conn = self.opts['REST_CONNECTION']
+        run = settings.ART_CONFIG['RUN']
+        with RestUtil.links_lock:
+            if RestUtil.links_cache is None:
+                RestUtil.links_cache = LinksCache(run.get('links_cache'))
+                RestUtil._xsd_digest = file_digest(run.get('api_xsd'))
+            key = '|'.join(str(value) for value in (
+                conn['uri'], conn['user'], conn.get('user_domain'),
+                conn.get('filter'), RestUtil._xsd_digest,
+            ))
+            links = RestUtil.links_cache.get(key)
+            if links is not None:
+                self.update_stats(links_cache_hit=1)
+                return links
+            links = self.api.HEAD_for_links()
+            RestUtil.links_cache.set(key, links)
+            self.update_stats(links_cache_miss=1)
+            return links
+
+    @classmethod
+    def update_stats(cls, **counts):
+        """
+        Increase REST statistics counters
+
+        Args:
+            counts (dict): Counter names and increments
+        """
+        with cls.stats_lock:
+            cls.stats.update(counts)
+
+    @classmethod
+    def log_stats(cls):
+        """
+        Log REST statistics counters, connection pool stats and entity
+        cache hit rate
+        """
+        logger = logging.getLogger('rest_stats')
+        with cls.stats_lock:
+            stats = dict(cls.stats)
+        if cls._restInit is not None:
+            logger.info(
+                "Connection pool stats: %s", cls._restInit.pool.stats()
+            )
+        lookups = stats.get('cache_hit', 0) + stats.get('cache_miss', 0)
+        if lookups:
+            logger.info(
+                "Entity cache hit rate: %0.1f%% (%d of %d)",
+                100.0 * stats.get('cache_hit', 0) / lookups,
+                stats.get('cache_hit', 0), lookups
+            )
+        logger.info("REST stats: %s", stats)
+        if cls.xsd_validator is not None:
+            logger.info(
+                "XSD validation stats: %s", dict(cls.xsd_validator.stats)
+            )
+
+    def invalidate_cache(self, href):
+        """
+        Drop cached entities affected by mutating request on href
+
+        Args:
+            href (str): Url of mutating request
+        """
+        if self.entity_cache is not None and href:
+            self.update_stats(
+                cache_invalidation=self.entity_cache.invalidate(href)
+            )
+
+    def correlationIdHeaders(self, api_operation):
+        """
+        Build headers with new correlation id for single request, passed
+        with the request so requests of different threads don't share it
+
+        Args:
+            api_operation (str): The api operation performed
+
+        Returns:
+            dict: Correlation-Id header
+        """
+        correlation_id = self.getCorrelationId(api_operation)
+        self.logger.info("Using Correlation-Id: %s", correlation_id)
+        return {api_utils.CORRELATION_ID: correlation_id}
+
+    def validateResponseViaXSD(self, href, ret, tree=None):
         '''
-        Validate xml response against xsd schema
+        Queue xml response for validation against xsd schema, errors are
+        collected by xsd_validator
         Author: jvorcak
         Parameters:
            * href - url of the request
            * ret - reponse object containing the body
+           * tree - already parsed body, None to parse it in validator
         '''
-        if ret[RespKey.body]:
-            try:
-                doc = etree.fromstring(ret[RespKey.body])
-                self.xsd.assertValid(doc)
-            except etree.DocumentInvalid as err:
-                error_obj = (href, ret, err)
-                self.xsd_schema_errors.append(error_obj)
-            except etree.XMLSyntaxError as err:
-                self.logger.error('Failed parsing response for XSD validations'
-                                  'error: %s. body: %s' %
-                                  (err, ret[RespKey.body]))
+        self.xsd_validator.submit(
+            href, ret[RespKey.status], ret[RespKey.body], tree
+        )
 
     @staticmethod
     def build_url(href, **additional_params):
@@ -177,7 +282,8 @@ class RestUtil(api_utils.APIUtil):
 
     def get(
             self, href=None, elm=None, custom_headers=None, abs_link=True,
-            list_only=False, no_parse=False, validate=True
+            list_only=False, no_parse=False, validate=True, lazy=None,
+            cache=True
     ):
         """
         Implements GET method and verify the response
@@ -197,6 +303,11 @@ class RestUtil(api_utils.APIUtil):
            no_parse (bool): whether to parse the answer or not, False to parse,
                             not to parse - True.
            validate (bool): True - validate, otherwise - False.
+           lazy (bool): True to build collection entries only on access to
+                        other attributes than id, href, name and status,
+                        None to use RUN.lazy_collections.
+           cache (bool): False to always read the server, e.g. when polling
+                         for changes, instead of entity cache
 
         Returns:
            str: parsed GET response
@@ -213,42 +324,94 @@ class RestUtil(api_utils.APIUtil):
         if not elm:
             elm = self.element_name
 
+        if lazy is None:
+            lazy = self.lazy_collections
+
         if custom_headers:
             for header in custom_headers.keys():
                 self.api.headers[header] = custom_headers[header]
 
+        cache_key = None
+        if self.entity_cache is not None and cache and not (
+            custom_headers or no_parse
+        ):
+            cache_key = (
+                'get', href, elm, list_only,
+                self.api.headers.get('All-content')
+            )
+            cached = self.entity_cache.get(cache_key)
+            if cached is not MISSING:
+                self.update_stats(cache_hit=1)
+                return cached
+            self.update_stats(cache_miss=1)
+
         self.logger.debug("GET request content is --  url:%(uri)s ",
                           {'uri': href})
         ret = self.api.GET(href)
 
+        parsed_resp = self.parse_response(
+            href, ret, elm, list_only, no_parse, validate, lazy
+        )
+        if cache_key is not None and parsed_resp is not None:
+            self.entity_cache.set(cache_key, parsed_resp, href)
+        return parsed_resp
+
+    def parse_response(
+        self, href, ret, elm, list_only=False, no_parse=False, validate=True,
+        lazy=False
+    ):
+        """
+        Verify and parse response of GET request
+
+        Args:
+           href (str): url of the request
+           ret (dict): response of the request
+           elm (str): element name
+           list_only (bool): True to return only elements of collection
+           no_parse (bool): True to return response body as is
+           validate (bool): True - validate, otherwise - False.
+           lazy (bool): True to build collection entries only on access to
+                        other attributes than id, href, name and status
+
+        Returns:
+           object: parsed response, None if the request failed
+        """
         if not validator.compareResponseCode(
             ret[RespKey.status], api_utils.POSITIVE_CODES, self.logger
         ):
             return None
 
-        if validate:
-            self.validateResponseViaXSD(href, ret)
-
         self.logger.debug("Response body for GET request is: %s ",
                           ret[RespKey.body])
 
         if no_parse:
+            if validate:
+                self.validateResponseViaXSD(href, ret)
             return ret[RespKey.body]
 
-        parsed_resp = None
         try:
-            parsed_resp = api_utils.parse(ret[RespKey.body], silence=True)
+            node = api_utils.parse_xml(ret[RespKey.body])
         except etree.XMLSyntaxError:
             self.logger.error("Cant parse xml response")
             return None
 
+        if validate:
+            self.validateResponseViaXSD(href, ret, node)
+
+        parsed_resp = None
+        if lazy:
+            parsed_resp = api_utils.parse_lazy(node, elm)
+        if parsed_resp is None:
+            parsed_resp = api_utils.parse_node(node)
+
         if hasattr(parsed_resp, elm):
-            return getattr(parsed_resp, elm)
-        else:
+            parsed_resp = getattr(parsed_resp, elm)
             if list_only:
-                self.logger.error("Element '{0}' not found at {1} \
-                ".format(elm, ret[RespKey.body]))
-            return parsed_resp
+                self._collection_bytes[href] = len(ret[RespKey.body])
+        elif list_only:
+            self.logger.error("Element '{0}' not found at {1} \
+            ".format(elm, ret[RespKey.body]))
+        return parsed_resp
 
     def parse_detail(self, ret):
         '''
@@ -312,6 +475,10 @@ class RestUtil(api_utils.APIUtil):
             current (bool): Current flag
             deploy_hosted_engine (bool): Deploy hosted engine flag
             validate (bool): Validate the new element exist after creation
+            verify (str): How to validate the new element exists, entity to
+                GET the element, collection to look for it in whole
+                collection, response to trust the POST response, default
+                is RUN.create_verify
 
         Returns:
             tuple: POST response and status
@@ -328,6 +495,7 @@ class RestUtil(api_utils.APIUtil):
         href = kwargs.get("collection")
         if not href:
             href = self.links[self.collection_name]
+        collection_href = href
 
         if self.max_collection is not None:
             href = "{0};max={1}".format(href, self.max_collection)
@@ -353,10 +521,10 @@ class RestUtil(api_utils.APIUtil):
             {'uri': post_url, 'body': entity}
         )
 
-        # TODO: fix this nasty nested with when we will move to python 2.7
-        with self.correlationIdContext(api_utils.ApiOperation.create):
-            with measure_time("POST"):
-                ret = self.api.POST(post_url, entity)
+        headers = self.correlationIdHeaders(api_utils.ApiOperation.create)
+        with measure_time("POST"):
+            ret = self.api.POST(post_url, entity, headers)
+        self.invalidate_cache(post_url)
 
         if not self.responseCodesMatch(
             positive, api_utils.ApiOperation.create, expected_pos_status,
@@ -368,8 +536,6 @@ class RestUtil(api_utils.APIUtil):
         if not validate:
             return None, True
 
-        collection = self.get(href, list_only=True, elm=coll_elm_name)
-
         self.logger.debug(
             "Response body for CREATE request is: %s ", ret[RespKey.body]
         )
@@ -396,15 +562,74 @@ class RestUtil(api_utils.APIUtil):
                     return None, False
 
                 if not async:
-                    self.find(
-                        api_utils.parse(actual_entity, silence=True).id, "id",
-                        collection=collection, abs_link=False
+                    self.verify_created(
+                        collection_href,
+                        api_utils.parse(actual_entity, silence=True).id,
+                        kwargs.get("verify", self.create_verify),
+                        coll_elm_name
                     )
             else:
                 return ret[RespKey.body], True
         self.validateResponseViaXSD(href, ret)
         return api_utils.parse(ret[RespKey.body], silence=True), True
 
+    def verify_created(self, href, entity_id, verify, elm):
+        """
+        Verify entity exists after creation
+
+        Args:
+            href (str): Url of collection the entity was created in
+            entity_id (str): Id of created entity
+            verify (str): entity to GET the entity, collection to look for it
+                in whole collection, response to trust the POST response
+            elm (str): Collection element name
+
+        Raises:
+            EntityNotFound: If created entity not found
+        """
+        if self.max_collection is not None:
+            collection_href = "{0};max={1}".format(href, self.max_collection)
+        else:
+            collection_href = href
+
+        if verify == CREATE_VERIFY_RESPONSE and entity_id:
+            self.update_stats(
+                create_verify_response=1,
+                create_verify_bytes_saved=self._collection_bytes.get(
+                    collection_href, 0
+                )
+            )
+            return
+
+        if verify != CREATE_VERIFY_COLLECTION and entity_id:
+            url = '{0}/{1}'.format(href.rstrip('/'), entity_id)
+            self.logger.debug("VERIFY request content is --  url:%(uri)s",
+                              {'uri': url})
+            with measure_time('GET'):
+                ret = self.api.GET(url)
+            if ret[RespKey.status] == 404 and self.is_top_level(href):
+                raise EntityNotFound(
+                    "Entity %s not found on url '%s'." % (entity_id, url)
+                )
+            if ret[RespKey.status] in api_utils.POSITIVE_CODES:
+                saved = self._collection_bytes.get(collection_href, 0) - len(
+                    ret[RespKey.body]
+                )
+                self.update_stats(
+                    create_verify_entity=1,
+                    create_verify_bytes=len(ret[RespKey.body]),
+                    create_verify_bytes_saved=max(saved, 0)
+                )
+                return
+            self.logger.debug(
+                "Verification of created entity failed with status %s, "
+                "falling back to collection scan", ret[RespKey.status]
+            )
+
+        collection = self.get(collection_href, list_only=True, elm=elm)
+        self.update_stats(create_verify_collection=1)
+        self.find(entity_id, "id", collection=collection, abs_link=False)
+
     def update(
         self, origEntity, newEntity, positive,
         expected_pos_status=api_utils.POSITIVE_CODES,
@@ -435,10 +660,10 @@ class RestUtil(api_utils.APIUtil):
             "PUT request content is --  url:%(uri)s body:%(body)s ",
             {'uri': put_url, 'body': entity})
 
-        # TODO: fix this nasty nested with when we will move to python 2.7
-        with self.correlationIdContext(api_utils.ApiOperation.update):
-            with measure_time('PUT'):
-                ret = self.api.PUT(put_url, entity)
+        headers = self.correlationIdHeaders(api_utils.ApiOperation.update)
+        with measure_time('PUT'):
+            ret = self.api.PUT(put_url, entity, headers)
+        self.invalidate_cache(put_url)
 
         if not self.responseCodesMatch(
             positive, api_utils.ApiOperation.update, expected_pos_status,
@@ -488,11 +713,12 @@ class RestUtil(api_utils.APIUtil):
         href = entity.href
         if operations:
             href += ';' + ';'.join(operations)
-        with self.correlationIdContext(api_utils.ApiOperation.delete):
-            self.logger.debug("DELETE request content is --  url:%(uri)s",
-                              {'uri': href})
-            with measure_time('DELETE'):
-                ret = self.api.DELETE(href)
+        headers = self.correlationIdHeaders(api_utils.ApiOperation.delete)
+        self.logger.debug("DELETE request content is --  url:%(uri)s",
+                          {'uri': href})
+        with measure_time('DELETE'):
+            ret = self.api.DELETE(href, headers=headers)
+        self.invalidate_cache(href)
 
         if not self.responseCodesMatch(
             positive, api_utils.ApiOperation.delete,
@@ -533,21 +759,76 @@ class RestUtil(api_utils.APIUtil):
         """
         href = self.collection_name
         if all_content:
-            self.api.headers['All-content'] = all_content
+            self.api.headers.set_local('All-content', all_content)
 
         if abs_link:
             href = self.links[self.collection_name]
 
-        if self.max_collection is not None:
-            href = '{0};max={1}'.format(href, self.max_collection)
+        cache_key = None
+        if self.entity_cache is not None and abs_link and not (
+            collection or kwargs
+        ):
+            cache_key = (
+                'find', self.collection_name, attribute, val,
+                self.api.headers.get('All-content')
+            )
+            cached = self.entity_cache.get(cache_key)
+            if cached is not MISSING:
+                self.update_stats(cache_hit=1)
+                return cached
+            self.update_stats(cache_miss=1)
+
+        results = None
+        if not collection and abs_link and self.server_side_find:
+            results = self.lookup(href, val, attribute)
+
+        if results is None:
+            collection_href = href
+            if self.max_collection is not None:
+                href = '{0};max={1}'.format(href, self.max_collection)
+
+            if not collection:
+                collection = self.get(href, list_only=True)
+                if collection:
+                    self._collection_sizes[collection_href] = len(collection)
+                self.update_stats(find_scan=1)
+
+            if not collection:
+                raise EntityNotFound("Empty collection %s" % href)
+
+        result = self.select_result(
+            val, attribute, collection if results is None else results, href,
+            **kwargs
+        )
+        if cache_key is not None:
+            self.entity_cache.set(
+                cache_key, result, getattr(result, 'href', None),
+                self.links[self.collection_name]
+            )
+        return result
 
-        if not collection:
-            collection = self.get(href, list_only=True)
+    @staticmethod
+    def select_result(val, attribute, candidates, href, **kwargs):
+        """
+        Select the only entity matching val among candidates
 
-        if not collection:
-            raise EntityNotFound("Empty collection %s" % href)
+        Args:
+            val (str): Value of entity attribute to look for
+            attribute (str): Attribute name
+            candidates (list): Candidate entities
+            href (str): Url candidates come from, for error messages
+            kwargs (dict): additional search attribute=val pairs
+
+        Returns:
+            Entity: Found entity
 
-        results = filter(lambda r: getattr(r, attribute) == val, collection)
+        Raises:
+            EntityNotFound: If entity not found
+            MoreThanOneEntitiesFound: If more entities match
+        """
+        results = filter(
+            lambda r: getattr(r, attribute) == val, candidates
+        )
         for attr, value in kwargs.iteritems():
             results = filter(
                 lambda r: reduce(getattr, attr.split('.'), r) == value,
@@ -565,9 +846,126 @@ class RestUtil(api_utils.APIUtil):
             )
         return results[0]
 
+    def lookup(self, href, val, attribute='name'):
+        """
+        Look up entity on server side, GET the entity directly by id or
+        search collection by name, instead of downloading whole collection
+
+        Args:
+            href (str): Collection url
+            val (str): Value of entity attribute to look for
+            attribute (str): Attribute name, 'id' or 'name'
+
+        Returns:
+            list: Candidate entities (superset of entities matching exactly),
+                or None if the lookup can't be done on server side
+        """
+        url, stat = self.lookup_url(href, val, attribute)
+        if url is None:
+            return None
+
+        self.logger.debug("LOOKUP request content is --  url:%(uri)s",
+                          {'uri': url})
+        with measure_time('GET'):
+            ret = self.api.GET(url)
+        return self.lookup_results(href, attribute, stat, ret)
+
+    def lookup_url(self, href, val, attribute='name'):
+        """
+        Build url of server side look up of entity
+
+        Args:
+            href (str): Collection url
+            val (str): Value of entity attribute to look for
+            attribute (str): Attribute name, 'id' or 'name'
+
+        Returns:
+            tuple: Url and name of stats counter, (None, None) if the lookup
+                can't be done on server side
+        """
+        if not val or not api_utils.LOOKUP_VALUE_RE.match(str(val)):
+            return None, None
+
+        if attribute == 'id':
+            return '{0}/{1}'.format(href.rstrip('/'), val), 'find_direct'
+        if (
+            attribute == 'name' and
+            self.collection_name in api_utils.NAME_SEARCHABLE_COLLECTIONS and
+            "%s/search" % self.collection_name in self.links
+        ):
+            query_template = template_parser.URITemplate(
+                self.links["%s/search" % self.collection_name]
+            )
+            url = query_template.sub({"query": "name=%s" % val})
+            return url.replace("from=", ''), 'find_search'
+        return None, None
+
+    def is_top_level(self, href):
+        """
+        Check whether collection is top-level one (e.g. vms), entities of
+        top-level collections are always reachable by GET of their id while
+        sub-collections (e.g. vms/{id}/nics) may not support it, 404 is
+        proof of absence only for top-level collections
+
+        Args:
+            href (str): Collection url
+
+        Returns:
+            bool: True if collection is right under API entry point
+        """
+        root = urlparse(self.opts['REST_CONNECTION']['uri']).path
+        path = urlparse(href).path
+        if not path.startswith(root):
+            return False
+        return '/' not in path[len(root):].strip('/')
+
+    def lookup_results(self, href, attribute, stat, ret):
+        """
+        Parse response of server side look up
+
+        Args:
+            href (str): Collection url
+            attribute (str): Attribute name, 'id' or 'name'
+            stat (str): Name of stats counter of the lookup
+            ret (dict): Response of the lookup
+
+        Returns:
+            list: Candidate entities, or None if the lookup failed
+        """
+        if (
+            ret[RespKey.status] == 404 and attribute == 'id' and
+            self.is_top_level(href)
+        ):
+            results = []
+        elif ret[RespKey.status] not in api_utils.POSITIVE_CODES:
+            self.logger.debug(
+                "Lookup on server side failed with status %s, falling back "
+                "to collection scan", ret[RespKey.status]
+            )
+            return None
+        else:
+            try:
+                parsed = api_utils.parse(ret[RespKey.body], silence=True)
+            except etree.XMLSyntaxError:
+                return None
+            if attribute == 'id':
+                results = [parsed]
+            else:
+                results = getattr(parsed, self.element_name, None)
+                if results is None:
+                    return None
+
+        avoided = self._collection_sizes.get(href, 0) - len(results)
+        self.update_stats(
+            find_lookup_bytes=len(ret[RespKey.body]),
+            find_entities_avoided=max(avoided, 0),
+            **{stat: 1}
+        )
+        return results
+
     def query(
         self, constraint, expected_status=None, href=None,
-        event_id=None, all_content=False, **params
+        event_id=None, all_content=False, lazy=False, **params
     ):
         """
         Run search query
@@ -578,6 +976,8 @@ class RestUtil(api_utils.APIUtil):
             href (str): Base href for search
             event_id (str): Event id
             all_content (bool): All content header
+            lazy (bool): Build results only on access to other attributes
+                than id, href, name and status
             params (dict): Extra keys to send to query
 
         Returns:
@@ -620,14 +1020,14 @@ class RestUtil(api_utils.APIUtil):
             "SEARCH request content is --  url:%(uri)s" % {'uri': query_href})
 
         if all_content:
-            self.api.headers['All-content'] = all_content
+            self.api.headers.set_local('All-content', all_content)
 
         try:
             with measure_time('GET'):
                 ret = self.api.GET(query_href)
         finally:
             if all_content:
-                self.api.headers.pop('All-content')
+                self.api.headers.pop_local('All-content')
 
         self.logger.debug(
             "Response body for QUERY request is: %s " % ret[RespKey.body]
@@ -637,11 +1037,15 @@ class RestUtil(api_utils.APIUtil):
         ):
             return None
 
-        self.validateResponseViaXSD(href, ret)
+        node = api_utils.parse_xml(ret[RespKey.body])
+        self.validateResponseViaXSD(href, ret, node)
 
-        return getattr(
-            api_utils.parse(ret[RespKey.body], silence=True), self.element_name
-        )
+        parsed_resp = None
+        if lazy:
+            parsed_resp = api_utils.parse_lazy(node, self.element_name)
+        if parsed_resp is None:
+            parsed_resp = api_utils.parse_node(node)
+        return getattr(parsed_resp, self.element_name)
 
     def syncAction(self, entity, action, positive, **kwargs):
         """
@@ -674,6 +1078,47 @@ class RestUtil(api_utils.APIUtil):
         )
         async = kwargs.pop("async", False)
 
+        action_href, action_body = self.build_action(
+            entity, action, async, **kwargs
+        )
+
+        self.logger.debug(
+            "Action request content is --  url:%(uri)s body:%(body)s",
+            {"uri": action_href, "body": action_body}
+        )
+
+        headers = self.correlationIdHeaders(
+            api_utils.ApiOperation.syncAction
+        )
+        with measure_time("POST"):
+            ret = self.api.POST(action_href, action_body, headers)
+        self.invalidate_cache(action_href)
+
+        positive_stat = (
+            expected_async_pos_status if async else expected_sync_pos_status
+        )
+        return self.check_action_response(
+            entity, action, action_href, positive, async, positive_stat,
+            expected_neg_status, ret
+        )
+
+    def build_action(self, entity, action, async=False, **kwargs):
+        """
+        Build url and body of action request
+
+        Args:
+            entity (DS object): Target entity
+            action (str): Action to run
+            async (bool): Sync or async action
+
+        Keyword Args:
+            deploy_hosted_engine (bool): Deploy hosted engine flag
+            undeploy_hosted_engine (bool): Undeploy hosted engine flag
+            operations (list): Operations appended to action url
+
+        Returns:
+            tuple: Action url and body
+        """
         action_href = filter(
             lambda x: x.get_rel() == action, entity.actions.get_link()
         )[0].get_href()
@@ -693,23 +1138,31 @@ class RestUtil(api_utils.APIUtil):
         action_body = validator.dump_entity(
             self.makeAction(async, 10, **kwargs), "action"
         )
+        return action_href, action_body
 
-        self.logger.debug(
-            "Action request content is --  url:%(uri)s body:%(body)s",
-            {"uri": action_href, "body": action_body}
-        )
+    def check_action_response(
+        self, entity, action, action_href, positive, async, positive_stat,
+        negative_stat, ret
+    ):
+        """
+        Verify response of action request
 
-        # TODO: fix this nasty nested with when we will move to python 2.7
-        with self.correlationIdContext(api_utils.ApiOperation.syncAction):
-            with measure_time("POST"):
-                ret = self.api.POST(action_href, action_body)
+        Args:
+            entity (DS object): Target entity
+            action (str): Action run
+            action_href (str): Action url
+            positive (bool): Positive or negative behaviour
+            async (bool): Sync or async action
+            positive_stat (list): Expected positive statuses
+            negative_stat (list): Expected negative statuses
+            ret (dict): Response of the action request
 
-        positive_stat = (
-            expected_async_pos_status if async else expected_sync_pos_status
-        )
+        Returns:
+            str: POST response
+        """
         if not self.responseCodesMatch(
             positive, api_utils.ApiOperation.syncAction, positive_stat,
-            expected_neg_status, ret
+            negative_stat, ret
         ):
             return None
 
@@ -790,7 +1243,7 @@ class RestUtil(api_utils.APIUtil):
         no_results = None if get_href else []
 
         if all_content:
-            self.api.headers['All-content'] = all_content
+            self.api.headers.set_local('All-content', all_content)
 
         try:
             for link in elm.get_link():
@@ -815,7 +1268,7 @@ class RestUtil(api_utils.APIUtil):
         finally:
             # Sets up the default 'all_content' header
             if all_content:
-                self.api.headers.pop('All-content')
+                self.api.headers.pop_local('All-content')
         return no_results
 
     def waitForElemStatus(
@@ -837,9 +1290,24 @@ class RestUtil(api_utils.APIUtil):
                         False otherwise)
         '''
 
+        collection_href = self.links.get(self.collection_name)
+        if collection_href and (
+            restElement.href.rsplit('/', 1)[0] == collection_href.rstrip('/')
+        ):
+            stop = None if ignoreFinalStates else (
+                lambda s: s.find("fail") != -1 or s == 'up'
+            )
+            if not self.wait_for_statuses(
+                [restElement.id], status.split(), key='id', timeout=timeout,
+                stop=stop
+            ):
+                return False
+            self.logger.info("%s status is '%s'", self.element_name, status)
+            return True
+
         handleTimeout = 0
         while handleTimeout <= timeout:
-            restElement = self.get(restElement.href)
+            restElement = self.get(restElement.href, cache=False)
 
             elemStat = None
             if hasattr(restElement, 'snapshot_status'):
@@ -877,6 +1345,43 @@ class RestUtil(api_utils.APIUtil):
         )
         return False
 
+    def wait_for_statuses(
+        self, values, statuses, key='name', timeout=api_utils.DEF_TIMEOUT,
+        stop=None, sleep=api_utils.DEF_SLEEP, missing_ok=False, check=None,
+        on_reached=None
+    ):
+        """
+        Wait until all entities of the collection reach one of statuses,
+        waits of all callers on the collection share one poller
+
+        Args:
+            values (list): Values of key attribute of entities to wait for
+            statuses (list): Desired statuses
+            key (str): Entity attribute to identify entities by (name, id)
+            timeout (int): Maximum time to wait in seconds
+            stop (callable or list): Statuses (or predicate on status) which
+                end the wait unsuccessfully
+            sleep (int): Maximum poll interval in seconds
+            missing_ok (bool): Consider entities missing in the collection
+                as entities in desired status
+            check (callable): Returns True for entity in desired status
+                which also meets other conditions, e.g. VM runs on other
+                host after migration
+            on_reached (callable): Called with key value and status of
+                every entity once it reaches desired status
+
+        Returns:
+            bool: True if all entities reached one of statuses, False
+                otherwise
+        """
+        if stop is not None and not callable(stop):
+            stop = set(s.lower() for s in stop).__contains__
+        return StatusWatcher.get(self).wait(
+            values, statuses, key=key, timeout=timeout, stop=stop,
+            max_sleep=sleep, missing_ok=missing_ok, check=check,
+            on_reached=on_reached
+        )
+
     def get_headers(self):
         """
         Retrieve headers dict.
@@ -884,7 +1389,7 @@ class RestUtil(api_utils.APIUtil):
         Returns:
             dict: dictionary with headers names and values.
         """
-        return self.api.headers
+        return self.api.headers.copy()
 
     def set_header(self, header, value):
         """
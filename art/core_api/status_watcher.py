@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2010 Red Hat, Inc.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this software; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA, or see the FSF site: http://www.fsf.org.
+
+"""
+Shared status-watch service.
+
+All outstanding waits on entities of one collection are served by a single
+poller thread, which fetches watched entities once per tick and fans the
+statuses out to the waiters. Few watched entities are fetched by one
+'name=a or id=b' search, or by GET of each entity when the collection can't
+be searched and they are watched by id, whole collection is fetched only
+when neither is possible. Polls always read the server, never the
+entity cache. The poll interval starts at `min_sleep`, grows by `backoff`
+while nothing changes and drops back as soon as any watched status changes
+or a new waiter registers.
+"""
+
+import logging
+import threading
+
+from art.core_api.apis_exceptions import APIException
+from art.core_api.apis_utils import (
+    DEF_SLEEP,
+    DEF_TIMEOUT,
+    LOOKUP_VALUE_RE,
+    NAME_SEARCHABLE_COLLECTIONS,
+)
+
+logger = logging.getLogger('status_watcher')
+
+MIN_SLEEP = 1  # first poll interval in seconds
+BACKOFF = 1.5  # poll interval multiplier when nothing changed
+MAX_SEARCH_TERMS = 20  # max watched names and ids to poll via search query
+MAX_DIRECT_GETS = 5  # max watched ids to poll by GET of each entity
+
+
+def get_status(entity):
+    """
+    Get lower-cased status of the entity
+
+    Args:
+        entity (object): Entity object
+
+    Returns:
+        str: Entity status or None if entity has no status
+    """
+    status = getattr(entity, 'snapshot_status', None)
+    if status is None:
+        status = getattr(entity, 'status', None)
+    return status.lower() if status else None
+
+
+class Waiter(object):
+    """
+    Wait of one caller for set of entities to reach one of statuses
+    """
+
+    def __init__(
+        self, values, statuses, key, stop, max_sleep, missing_ok=False,
+        check=None, on_reached=None
+    ):
+        """
+        Args:
+            values (list): Values of key attribute of watched entities
+            statuses (list): Desired statuses
+            key (str): Entity attribute to identify entities by (name, id)
+            stop (callable): Returns True for status which ends the wait
+                unsuccessfully
+            max_sleep (float): Maximum poll interval acceptable for caller
+            missing_ok (bool): Consider entities missing in the collection
+                as entities in desired status
+            check (callable): Returns True for entity in desired status
+                which also meets other conditions of the caller
+            on_reached (callable): Called with key value and status of
+                every entity once it reaches desired status, from poller
+                thread
+        """
+        self.values = set(values)
+        self.statuses = set(s.lower() for s in statuses)
+        self.key = key
+        self.stop = stop
+        self.max_sleep = max_sleep
+        self.missing_ok = missing_ok
+        self.check = check
+        self.on_reached = on_reached
+        self.current = dict.fromkeys(self.values)
+        self.unchecked = set()
+        self.reached = set()
+        self.result = None
+        self.done = threading.Event()
+
+    def update(self, entities):
+        """
+        Update watched statuses from polled entities
+
+        Args:
+            entities (list): Polled entities
+
+        Returns:
+            bool: True if any watched status changed
+        """
+        changed = False
+        seen = set()
+        for entity in entities:
+            value = getattr(entity, self.key, None)
+            if value not in self.values:
+                continue
+            seen.add(value)
+            status = get_status(entity)
+            if self.current[value] != status:
+                self.current[value] = status
+                changed = True
+            if (
+                self.check and status in self.statuses and
+                not self.check(entity)
+            ):
+                self.unchecked.add(value)
+            else:
+                self.unchecked.discard(value)
+        for value in self.values - seen:
+            self.unchecked.discard(value)
+            if self.current[value] is not None:
+                self.current[value] = None
+                changed = True
+
+        for value, status in self.current.iteritems():
+            if (
+                status is not None and status not in self.statuses and
+                self.stop and self.stop(status)
+            ):
+                logger.error("%s status is '%s'", value, status)
+                self.finish(False)
+                return changed
+        pending = self.pending
+        for value in self.values - set(pending) - self.reached:
+            self.reached.add(value)
+            if self.on_reached:
+                self.on_reached(value, self.current[value])
+        if not pending:
+            self.finish(True)
+        return changed
+
+    def finish(self, result):
+        self.result = result
+        self.done.set()
+
+    @property
+    def pending(self):
+        """
+        Entities which didn't reach desired status yet
+
+        Returns:
+            dict: Entity key value to its current status
+        """
+        return dict(
+            (value, status) for value, status in self.current.iteritems()
+            if value in self.unchecked or (
+                status not in self.statuses and
+                not (status is None and self.missing_ok)
+            )
+        )
+
+
+class StatusWatcher(object):
+    """
+    Poller multiplexing waits on entities of one collection
+    """
+
+    _watchers = {}
+    _watchers_lock = threading.Lock()
+
+    def __init__(self, util, min_sleep=MIN_SLEEP, backoff=BACKOFF):
+        """
+        Args:
+            util (APIUtil): API util of the collection
+            min_sleep (float): First poll interval in seconds
+            backoff (float): Poll interval multiplier when nothing changed
+        """
+        self.util = util
+        self.min_sleep = min_sleep
+        self.backoff = backoff
+        self._waiters = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def get(cls, util):
+        """
+        Get watcher shared by all waits on the collection of the util
+
+        Args:
+            util (APIUtil): API util of the collection
+
+        Returns:
+            StatusWatcher: Collection watcher
+        """
+        with cls._watchers_lock:
+            watcher = cls._watchers.get(util.collection_name)
+            if watcher is None:
+                watcher = cls(util)
+                cls._watchers[util.collection_name] = watcher
+            # poll with the most recently logged in util
+            watcher.util = util
+            return watcher
+
+    def wait(self, values, statuses, key='name', timeout=DEF_TIMEOUT,
+             stop=None, max_sleep=DEF_SLEEP, missing_ok=False, check=None,
+             on_reached=None):
+        """
+        Wait until all entities reach one of statuses
+
+        Args:
+            values (list): Values of key attribute of watched entities
+            statuses (list): Desired statuses
+            key (str): Entity attribute to identify entities by (name, id)
+            timeout (int): Maximum time to wait in seconds
+            stop (callable): Returns True for status which ends the wait
+                unsuccessfully
+            max_sleep (float): Maximum poll interval in seconds
+            missing_ok (bool): Consider entities missing in the collection
+                as entities in desired status
+            check (callable): Returns True for entity in desired status
+                which also meets other conditions of the caller
+            on_reached (callable): Called with key value and status of
+                every entity once it reaches desired status
+
+        Returns:
+            bool: True if all entities reached one of statuses, False on stop
+                status or timeout
+        """
+        waiter = Waiter(
+            values, statuses, key, stop, max_sleep, missing_ok, check,
+            on_reached
+        )
+        with self._lock:
+            self._waiters.append(waiter)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="status_watcher_%s" % self.util.collection_name
+                )
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+        try:
+            waiter.done.wait(timeout)
+        finally:
+            with self._lock:
+                self._waiters.remove(waiter)
+
+        if waiter.result is None:
+            logger.error(
+                "Timeout when waiting for %s %s to reach status %s, "
+                "pending: %s", self.util.collection_name, sorted(values),
+                sorted(waiter.statuses), waiter.pending
+            )
+            return False
+        return waiter.result
+
+    def _poll(self, waiters):
+        """
+        Fetch entities watched by waiters
+
+        Args:
+            waiters (list): Active waiters
+
+        Returns:
+            list: Polled entities
+        """
+        names = set()
+        ids = set()
+        for waiter in waiters:
+            if waiter.key not in ('name', 'id') or not all(
+                LOOKUP_VALUE_RE.match(str(v)) for v in waiter.values
+            ):
+                return self._get_collection()
+            (names if waiter.key == 'name' else ids).update(waiter.values)
+
+        if (
+            len(names) + len(ids) <= MAX_SEARCH_TERMS and
+            self.util.collection_name in NAME_SEARCHABLE_COLLECTIONS
+        ):
+            query = " or ".join(
+                ["name=%s" % name for name in sorted(names)] +
+                ["id=%s" % id_ for id_ in sorted(ids)]
+            )
+            return self.util.query(query, lazy=True)
+        if not names and len(ids) <= MAX_DIRECT_GETS:
+            href = self.util.links.get(self.util.collection_name)
+            if href and self.util.is_top_level(href):
+                return self._get_entities(href, ids)
+        return self._get_collection()
+
+    def _get_collection(self):
+        return self.util.get(abs_link=False, lazy=True, cache=False)
+
+    def _get_entities(self, href, ids):
+        """
+        GET each watched entity, entities which don't exist are skipped
+
+        Args:
+            href (str): Collection url
+            ids (set): Ids of watched entities
+
+        Returns:
+            list: Existing entities
+
+        Raises:
+            APIException: If GET of any entity fails
+        """
+        entities = []
+        for id_ in sorted(ids):
+            url = '{0}/{1}'.format(href.rstrip('/'), id_)
+            ret = self.util.api.GET(url)
+            if ret['status'] == 404:
+                continue
+            entity = self.util.parse_response(
+                url, ret, self.util.element_name
+            )
+            if entity is None:
+                raise APIException(
+                    "GET %s failed with status %s" % (url, ret['status'])
+                )
+            entities.append(entity)
+        return entities
+
+    def _run(self):
+        sleep = self.min_sleep
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                waiters = [w for w in self._waiters if not w.done.is_set()]
+                if not self._waiters:
+                    self._thread = None
+                    return
+
+            entities = None
+            if waiters:
+                try:
+                    entities = self._poll(waiters)
+                except Exception as ex:
+                    logger.warning(
+                        "Failed to poll %s: %s", self.util.collection_name, ex
+                    )
+
+            changed = False
+            for waiter in waiters:
+                if entities is not None and waiter.update(entities):
+                    changed = True
+
+            max_sleep = min([w.max_sleep for w in waiters] or [sleep])
+            if changed:
+                sleep = self.min_sleep
+            else:
+                sleep = min(sleep * self.backoff, max_sleep)
+            if self._wakeup.wait(sleep):
+                # new waiter registered, poll right away with short interval
+                sleep = self.min_sleep
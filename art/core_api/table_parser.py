@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2010 Red Hat, Inc.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this software; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA, or see the FSF site: http://www.fsf.org.
+
+"""
+Table driven builder of generateDS data structures.
+
+Builds the same objects as the generated parseString(), but instead of
+calling build()/buildChildren() of every class, which match each child tag
+against regular expression and long if/elif chains along the class
+hierarchy, it walks the parsed tree once and dispatches children through
+the GDSBuildSpecs tables which generateDS emits next to the classes.
+Elements the tables can't express (mixed content, abstract or xsi:type
+children, restricted simple types) are handed over to the generated
+methods, so the result is identical.
+"""
+
+import logging
+import threading
+
+from lxml import etree
+
+logger = logging.getLogger('table_parser')
+
+
+def _to_bool(value):
+    if value in ('true', '1'):
+        return True
+    elif value in ('false', '0'):
+        return False
+    raise ValueError("requires boolean: %r" % value)
+
+
+def _to_str(value):
+    return value or ''
+
+
+def _to_token(value):
+    return ' '.join(value.split()) if value else ''
+
+
+def _local_name(tag):
+    return tag.rpartition('}')[2]
+
+
+_local = threading.local()
+
+
+def parse_xml(body):
+    """
+    Parse XML document into lxml tree the same way as generated parser
+
+    Args:
+        body (str): XML document
+
+    Returns:
+        Element: Root element, comments and processing instructions are
+            ignored
+    """
+    # lxml parsers can't be shared between threads
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = etree.ETCompatXMLParser()
+    if isinstance(body, unicode):
+        body = body.encode('utf-8')
+    return etree.fromstring(body, parser)
+
+
+class TableParser(object):
+    """
+    Parser of XML documents into generateDS data structures
+    """
+
+    def __init__(self, module, use_tables=True):
+        """
+        Args:
+            module (module): Module generated by generateDS
+            use_tables (bool): False to build objects by generated build()
+                methods only
+        """
+        self.module = module
+        self.specs = None
+        if use_tables:
+            self.specs = getattr(module, 'GDSBuildSpecs', None)
+        self.converters = {
+            'str': _to_str,
+            'int': int,
+            'float': float,
+            'bool': _to_bool,
+            'token': _to_token,
+        }
+        if use_tables and self.specs is None:
+            logger.warning(
+                "%s has no build specs, regenerate it to use table parser, "
+                "falling back to generated parser", module.__name__
+            )
+        else:
+            gds_super = module.GeneratedsSuper
+            self.converters.update(
+                datetime=gds_super.gds_parse_datetime,
+                date=gds_super.gds_parse_date,
+                time=gds_super.gds_parse_time,
+            )
+        self._plans = {}
+
+    def _plan(self, cls):
+        """
+        Compile build spec of the class
+
+        Args:
+            cls (type): Generated class
+
+        Returns:
+            tuple: Attributes plan, children plan and text flag, or None
+                when class has to be built by its build() method
+        """
+        plan = self._plans.get(cls, False)
+        if plan is not False:
+            return plan
+
+        spec = self.specs.get(cls.__name__)
+        plan = None
+        if spec is not None and spec[1] is not None:
+            attrs, children, has_text = spec
+            if attrs is not None:
+                attrs = dict(
+                    (key, (name, self.converters[kind]))
+                    for key, (name, kind) in attrs.iteritems()
+                )
+            compiled = {}
+            for tag, child in children.iteritems():
+                if child is not None:
+                    name, kind, class_name, is_list = child
+                    if kind == 'obj':
+                        child_cls = getattr(self.module, class_name, None)
+                        child = child_cls and (
+                            name, None, child_cls, is_list
+                        )
+                    else:
+                        child = (name, self.converters[kind], None, is_list)
+                compiled[tag] = child
+            plan = (attrs, compiled, has_text)
+        self._plans[cls] = plan
+        return plan
+
+    def _convert(self, elem, value, convert):
+        try:
+            return convert(value)
+        except (TypeError, ValueError) as ex:
+            self.module.raise_parse_error(elem, str(ex))
+
+    def _build(self, obj, node, plan):
+        """
+        Build object from element by its plan
+
+        Args:
+            obj (object): Object to build
+            node (Element): Element of the object
+            plan (tuple): Compiled build spec of the object class
+        """
+        attrs, children, has_text = plan
+        if attrs is None:
+            obj.buildAttributes(node, node.attrib, set())
+        else:
+            for key, value in node.attrib.iteritems():
+                attr = attrs.get(key)
+                if attr is not None:
+                    setattr(obj, attr[0], self._convert(node, value, attr[1]))
+        if has_text:
+            obj.valueOf_ = self.module.get_all_text_(node)
+        for child in node:
+            tag = child.tag
+            if tag[0] == '{':
+                tag = _local_name(tag)
+            spec = children.get(tag, False)
+            if spec is False:
+                # build() ignores unknown children
+                continue
+            if spec is None:
+                obj.buildChildren(child, node, tag)
+                continue
+            name, convert, child_cls, is_list = spec
+            if child_cls is None:
+                value = self._convert(child, child.text, convert)
+            else:
+                value = child_cls.factory()
+                child_plan = self._plan(child_cls)
+                if child_plan is None:
+                    value.build(child)
+                else:
+                    self._build(value, child, child_plan)
+            if is_list:
+                getattr(obj, name).append(value)
+            else:
+                setattr(obj, name, value)
+
+    def parse(self, body, silence=False):
+        """
+        Parse XML document
+
+        Args:
+            body (str): XML document
+            silence (bool): Passed to generated parseString() on fallback
+
+        Returns:
+            object: Root object of the document
+        """
+        if self.specs is None:
+            return self.module.parseString(body, silence=silence)
+        return self.parse_node(parse_xml(body))
+
+    def parse_node(self, node):
+        """
+        Build root object from parsed XML document
+
+        Args:
+            node (Element): Root element of the document
+
+        Returns:
+            object: Root object of the document
+        """
+        tag = _local_name(node.tag)
+        root_cls = self.module.GDSClassesMapping.get(tag)
+        if root_cls is None:
+            root_cls = getattr(self.module, tag, None)
+        if root_cls is None:
+            # generated parser knows the default root class
+            return self.module.parseString(etree.tostring(node), silence=True)
+        return self.build(root_cls, node)
+
+    def build(self, cls, node):
+        """
+        Build object of generated class from element
+
+        Args:
+            cls (type): Generated class
+            node (Element): Element of the object
+
+        Returns:
+            object: Built object
+        """
+        obj = cls.factory()
+        plan = self._plan(cls) if self.specs is not None else None
+        if plan is None:
+            obj.build(node)
+        else:
+            self._build(obj, node, plan)
+        return obj
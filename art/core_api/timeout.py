@@ -18,9 +18,18 @@
 # Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
 # 02110-1301 USA, or see the FSF site: http://www.fsf.org.
 
+import functools
+import heapq
+import os
+import random
 import signal
+import sys
+import threading
 import time
 import logging
+from contextlib import contextmanager
+
+from art.core_api import metrics
 
 
 logger = logging.getLogger(__name__)
@@ -36,15 +45,272 @@ class TimeoutExpiredError(Exception):
         return "%s: %s" % (self.message, repr(self.value))
 
 
+_local = threading.local()
+
+
+class _Watchdog(object):
+    """
+    Single thread expiring deadlines of all threads
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._thread = None
+
+    def add(self, deadline):
+        with self._cond:
+            heapq.heappush(
+                self._heap, (deadline.expires, id(deadline), deadline)
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='DeadlineWatchdog'
+                )
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    # drop deadlines whose blocks already finished
+                    while self._heap and self._heap[0][2].finished:
+                        heapq.heappop(self._heap)
+                    now = time.time()
+                    if self._heap and self._heap[0][0] <= now:
+                        deadline = heapq.heappop(self._heap)[2]
+                        break
+                    self._cond.wait(
+                        self._heap[0][0] - now if self._heap else None
+                    )
+            deadline.expire()
+
+
+_watchdog = _Watchdog()
+
+
+class Deadline(object):
+    """
+    Time by which work of a block must finish, usable from any thread.
+
+    Used as context manager, the deadline is current deadline of the thread
+    within the block. Nested deadline never expires later than the outer
+    one. Work in the block is interrupted at cooperative points: HTTP calls
+    and commands of pooled SSH sessions in flight are cancelled on expiry,
+    other SSH commands have their timeouts clamped, TimeoutingSampler and
+    QueueWithTimeout.join don't wait past it, and check() raises once it
+    expired. Leaving expired block raises TimeoutExpiredError instead of
+    the exception caused by cancellation.
+
+    Threads started by the block don't inherit the deadline, pass functions
+    they run through wrap(), Job does it for JobsSet workers.
+
+    >>> with Deadline(60, 'VMs not started in time'):
+    >>>     with ThreadPoolExecutor(4) as executor:
+    >>>         deadline = current_deadline()
+    >>>         for vm in vms:
+    >>>             executor.submit(deadline.wrap(start_vm), vm)
+    """
+
+    def __init__(self, seconds, error_message='deadline expired', parent=None):
+        """
+        Args:
+            seconds (float): Seconds from now the deadline expires in
+            error_message (str): Message of TimeoutExpiredError
+            parent (Deadline): Outer deadline, current deadline of the thread
+                by default
+        """
+        self.parent = current_deadline() if parent is None else parent
+        self.expires = time.time() + seconds
+        self.error_message = error_message
+        if self.parent is not None and self.parent.expires < self.expires:
+            # the outer deadline is the one to blame
+            self.expires = self.parent.expires
+            self.error_message = self.parent.error_message
+        self.expired = False
+        self.finished = False
+        self._callbacks = {}
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """
+        Returns:
+            float: Seconds left until the deadline, 0 if it expired
+        """
+        return max(self.expires - time.time(), 0)
+
+    def has_expired(self):
+        """
+        Returns:
+            bool: True if the deadline expired
+        """
+        return self.expired or time.time() >= self.expires
+
+    def check(self):
+        """
+        Raises:
+            TimeoutExpiredError: If the deadline expired
+        """
+        if self.has_expired():
+            raise TimeoutExpiredError(self.error_message)
+
+    def expire(self):
+        """
+        Mark the deadline expired and cancel calls in flight
+        """
+        with self._lock:
+            if self.finished or self.expired:
+                return
+            self.expired = True
+            callbacks = self._callbacks.values()
+        logger.debug("Deadline expired: %s", self.error_message)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as ex:
+                logger.debug("Cancellation on deadline failed: %s", ex)
+
+    @contextmanager
+    def cancelling(self, callback=None):
+        """
+        Run block which is cancelled by callback on expiry, errors caused
+        by the cancellation are raised as TimeoutExpiredError
+
+        Args:
+            callback (callable): Function aborting the block from other
+                thread, e.g. closing its socket
+        """
+        self.check()
+        key = object()
+        if callback is not None:
+            with self._lock:
+                self._callbacks[key] = callback
+        try:
+            yield self
+        except TimeoutExpiredError:
+            raise
+        except Exception:
+            if self.has_expired():
+                raise TimeoutExpiredError(self.error_message)
+            raise
+        finally:
+            with self._lock:
+                self._callbacks.pop(key, None)
+
+    def wrap(self, func):
+        """
+        Bind function to run under this deadline in other thread
+
+        Args:
+            func (callable): Function
+
+        Returns:
+            callable: Function running func within nested deadline
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Deadline(self.remaining(), self.error_message, self):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault('deadlines', [])
+        stack.append(self)
+        _watchdog.add(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        _local.deadlines.remove(self)
+        with self._lock:
+            self.finished = True
+        if self.has_expired() and not (
+            exc_type is not None and issubclass(exc_type, TimeoutExpiredError)
+        ):
+            raise TimeoutExpiredError(self.error_message)
+        return False
+
+
+def current_deadline():
+    """
+    Returns:
+        Deadline: Innermost deadline of current thread, None if there is none
+    """
+    stack = getattr(_local, 'deadlines', None)
+    return stack[-1] if stack else None
+
+
+def remaining_time(seconds=None):
+    """
+    Clamp timeout by current deadline
+
+    Args:
+        seconds (float): Timeout, None for no timeout
+
+    Returns:
+        float: Smaller of timeout and seconds left until current deadline
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return seconds
+    if seconds is None:
+        return deadline.remaining()
+    return min(seconds, deadline.remaining())
+
+
+@contextmanager
+def cancelling(callback=None):
+    """
+    Run block which is cancelled by callback when current deadline expires,
+    does nothing without deadline, see Deadline.cancelling
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        yield None
+    else:
+        with deadline.cancelling(callback):
+            yield deadline
+
+
+def _alarm_available():
+    # SIGALRM can interrupt only main thread, and only one timer can be set
+    return (
+        hasattr(signal, 'SIGALRM') and
+        isinstance(threading.current_thread(), threading._MainThread) and
+        signal.getsignal(signal.SIGALRM) in (signal.SIG_DFL, None)
+    )
+
+
+@contextmanager
+def _alarm(deadline):
+    # raise TimeoutExpiredError of deadline from wherever main thread is
+    def _timeout_handler(signum, frame):
+        raise TimeoutExpiredError(deadline.error_message)
+
+    deadline.check()
+    old = signal.signal(signal.SIGALRM, _timeout_handler)
+    signal.setitimer(signal.ITIMER_REAL, max(deadline.remaining(), 0.001))
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old)
+
+
 def timeout(seconds, error_message='signal alarm timeout validation'):
     '''
     Author: atal
-    Timeout decorator use to enforce timeout on a fucntion via signal alaram.
+    Timeout decorator use to enforce timeout on a fucntion.
+    The function runs under Deadline, and in main thread also under signal
+    alarm which interrupts it anywhere, e.g. blocked in call without timeout.
     A very important notes:
-        1. Never use this decortor other than in main thread.
-        2. Support only unix systems.
-        3. Nested time decorator will raise RuntimeError
-    make sure you handle FunctionTimeoutError exception well
+        1. In other threads, and when nested in other timeout of main thread
+           (or SIGALRM handler is set by someone else), there is no alarm,
+           the function is interrupted at cooperative points of Deadline
+           only, code blocked elsewhere runs past the timeout.
+        2. Signal alarm is supported only on unix systems.
+    make sure you handle TimeoutExpiredError exception well
     >>> @timeout(5, 'failed due to timeout')
     >>> foo():
     >>>     import time
@@ -53,24 +319,13 @@ def timeout(seconds, error_message='signal alarm timeout validation'):
     TimeoutExpiredError
     '''
     def decorator(func):
-        def _is_sigalrm_exists():
-            return signal.getsignal(signal.SIGALRM) is not signal.SIG_DFL
-
-        def _timeout_handler(signum, frame):
-            raise TimeoutExpiredError(error_message)
-
+        @functools.wraps(func)
         def new_f(*args, **kwargs):
-            if _is_sigalrm_exists():
-                raise RuntimeError('SIGALRM was already activated.')
-            old = signal.signal(signal.SIGALRM, _timeout_handler)
-            signal.alarm(seconds)
-            try:
-                result = func(*args, **kwargs)
-            finally:
-                signal.signal(signal.SIGALRM, old)
-            signal.alarm(0)
-            return result
-        new_f.func_name = func.func_name
+            with Deadline(seconds, error_message) as deadline:
+                if not _alarm_available():
+                    return func(*args, **kwargs)
+                with _alarm(deadline):
+                    return func(*args, **kwargs)
         return new_f
     return decorator
 
@@ -81,7 +336,19 @@ class TimeoutingSampler(object):
 
     This is a generator object that at first yields the output of function
     `func`. After the yield, it either raises instance of `timeout_exc_cls` or
-    sleeps `sleep` seconds.
+    sleeps until next sample. Sleeps never exceed the deadline, so the last
+    sample is taken at timeout at the latest. Current Deadline of the thread
+    expiring sooner than timeout ends the sampling by TimeoutExpiredError.
+
+    By default it sleeps `sleep` seconds between samples. If `min_sleep` is
+    set, it sleeps `min_sleep` seconds after the first sample and every next
+    sleep is `backoff` times longer, up to `max_sleep` (`sleep` by default),
+    so fast reactions are noticed soon and slow ones don't load the engine.
+    Sleeps are randomly spread by `jitter` (0.1 means +-10%) so samplers
+    started together don't sample in lock step.
+
+    Number of samples and time to success of every call site are recorded
+    in art.core_api.metrics registry.
 
     Yielding the output allows you to handle every value as you wish.
 
@@ -99,6 +366,14 @@ class TimeoutingSampler(object):
         ''' Timeout in seconds. '''
         self.sleep = sleep
         ''' Sleep interval seconds. '''
+        self.min_sleep = None
+        ''' First sleep seconds of backoff, None for constant sleep. '''
+        self.max_sleep = None
+        ''' Maximum sleep seconds of backoff, None for `sleep`. '''
+        self.backoff = 2.0
+        ''' Factor of sleep increase after every sample. '''
+        self.jitter = 0.0
+        ''' Fraction of sleep to randomly add or subtract. '''
 
         self.func = func
         ''' A function to sample. '''
@@ -111,6 +386,10 @@ class TimeoutingSampler(object):
         ''' Time of starting the sampling. '''
         self.last_sample_time = None
         ''' Time of last sample. '''
+        self.samples = 0
+        ''' Number of samples taken. '''
+        self.site = self._call_site()
+        ''' Call site the statistics are recorded for. '''
 
         self.timeout_exc_cls = TimeoutExpiredError
         ''' Class of exception to be raised.  '''
@@ -119,16 +398,72 @@ class TimeoutingSampler(object):
         self.timeout_exc_kwargs = {}
         ''' A kwargs for __init__ of the timeout exception. '''
 
+    def _call_site(self):
+        """
+        Returns:
+            str: file:line of code creating the sampler and sampled function
+        """
+        frame = sys._getframe(1)
+        # skip __init__ of subclasses
+        while frame.f_back is not None and frame.f_locals.get('self') is self:
+            frame = frame.f_back
+        path = frame.f_code.co_filename.split(os.sep)
+        return "%s:%d %s" % (
+            '/'.join(path[-2:]), frame.f_lineno,
+            getattr(self.func, '__name__', type(self.func).__name__)
+        )
+
+    def _sleeps(self):
+        """
+        Generate sleeps between samples
+        """
+        if self.min_sleep is None:
+            delay = max_sleep = self.sleep
+        else:
+            max_sleep = self.sleep if self.max_sleep is None else (
+                self.max_sleep
+            )
+            delay = min(self.min_sleep, max_sleep)
+        while True:
+            yield max(
+                delay * (1 + random.uniform(-self.jitter, self.jitter)), 0
+            )
+            delay = min(delay * self.backoff, max_sleep)
+
     def __iter__(self):
         if self.start_time is None:
             self.start_time = time.time()
-        while True:
-            self.last_sample_time = time.time()
-            yield self.func(*self.func_args, **self.func_kwargs)
-            if self.timeout < (time.time() - self.start_time):
-                raise self.timeout_exc_cls(*self.timeout_exc_args,
-                                           **self.timeout_exc_kwargs)
-            time.sleep(self.sleep)
+        deadline = self.start_time + self.timeout
+        outer = current_deadline()
+        sleeps = self._sleeps()
+        outcome = metrics.SAMPLER_ERROR
+        sample_end = self.start_time
+        try:
+            while True:
+                if outer is not None and outer.has_expired():
+                    outcome = metrics.SAMPLER_TIMEOUT
+                    outer.check()
+                self.last_sample_time = time.time()
+                value = self.func(*self.func_args, **self.func_kwargs)
+                sample_end = time.time()
+                self.samples += 1
+                # caller stops sampling once the value is what it waits for
+                outcome = metrics.SAMPLER_SUCCESS
+                yield value
+                outcome = metrics.SAMPLER_ERROR
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    outcome = metrics.SAMPLER_TIMEOUT
+                    raise self.timeout_exc_cls(*self.timeout_exc_args,
+                                               **self.timeout_exc_kwargs)
+                if outer is not None:
+                    remaining = min(remaining, outer.remaining())
+                time.sleep(min(next(sleeps), remaining))
+        finally:
+            metrics.registry.record_sampler(
+                self.site, self.samples, sample_end - self.start_time,
+                outcome
+            )
 
     def waitForFuncStatus(self, result):
         '''
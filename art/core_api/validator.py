@@ -17,11 +17,17 @@
 # Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
 # 02110-1301 USA, or see the FSF site: http://www.fsf.org.
 
-import sys
-import re
+from collections import namedtuple
 from cStringIO import StringIO
+from lxml import etree
 from art.core_api.apis_utils import data_st_validate as ds
 from art.generateDS.generateds_config import NameTable
+import art.test_handler.settings as settings
+
+# serialize entities by lxml element tree instead of generated export
+ETREE_SERIALIZER = (
+    settings.ART_CONFIG['RUN'].get('xml_serializer') == 'etree'
+)
 
 ATTR_IGNORE_LIST = ['href', 'link', 'rel', 'build_']
 
@@ -45,6 +51,21 @@ DS_CLASS_MAPPER = {
 
 SORT_ATTRS = ["name", "id", "index"]
 
+COMPARE_IGNORE_SET = frozenset([
+    'status', 'role', 'active', 'total', 'required', 'permit',
+    'root_password', 'namespace',
+] + ATTR_IGNORE_LIST)
+
+# original names of attributes renamed by generate DS process
+RENAMED_ATTRS = dict((value, key) for key, value in NameTable.iteritems())
+
+CompareAttr = namedtuple(
+    'CompareAttr',
+    'name orig_name getter data_type container simple boolean'
+)
+
+_compare_plans = {}
+
 primitive = (int, bool, float, long, basestring)
 
 
@@ -54,26 +75,73 @@ def is_primitive(obj):
 
 def dump_entity(ds, root_name):
     '''
-    Dump DS element to xml format
+    Dump DS element to xml format, writes only to local buffer so it is
+    safe to call from multiple threads
     '''
-
-    old_stdout = sys.stdout
-    sys.stdout = mystdout = StringIO()
-    ds.export(mystdout, 0, name_=root_name)
-    sys.stdout = old_stdout
-    return mystdout.getvalue()
+    if ETREE_SERIALIZER and hasattr(ds, 'to_etree'):
+        return etree.tostring(
+            ds.to_etree(None, name_=root_name), pretty_print=True
+        )
+    out = StringIO()
+    ds.export(out, 0, name_=root_name)
+    return out.getvalue()
 
 
-def getObjAttributes(obj, origObj):
+def getObjAttributes(obj, origObj=None):
     '''
     Get object attributes recursively from all superclasses
     '''
-    if obj.superclass:
-        # merge element's and its superclass dict items
-        origObj.member_data_items_.update(obj.superclass.member_data_items_)
-        return getObjAttributes(obj.superclass, origObj)
-    else:
-        return origObj.member_data_items_.keys()
+    return getMemberSpecs(obj.__class__).keys()
+
+
+def getMemberSpecs(cls):
+    '''
+    Description: merge member specs of class and all its superclasses,
+                 the class dicts are left untouched
+    Parameters:
+       * cls - data structure class
+    Return: dict of member name to member spec
+    '''
+    members = dict(cls.member_data_items_)
+    superclass = cls.superclass
+    while superclass:
+        members.update(superclass.member_data_items_)
+        superclass = superclass.superclass
+    return members
+
+
+def get_compare_plan(elm_class):
+    """
+    Get comparison plan of data structure class, plans are compiled once
+    and cached for the whole session
+
+    Args:
+        elm_class (str): Name of data structure class
+
+    Returns:
+        tuple: CompareAttr of every compared attribute of the class
+    """
+    plan = _compare_plans.get(elm_class)
+    if plan is None:
+        plan = []
+        members = getMemberSpecs(getattr(ds, elm_class))
+        for name, spec in members.iteritems():
+            if name in COMPARE_IGNORE_SET:
+                continue
+            # attributes renamed by generate DS process are read by
+            # original name
+            orig_name = RENAMED_ATTRS.get(name)
+            getter = orig_name or name
+            if getter.startswith('type'):
+                getter = getter.rstrip('_')
+            data_type = spec.get_data_type()
+            plan.append(CompareAttr(
+                name, orig_name, 'get_{0}'.format(getter), data_type,
+                spec.get_container(), data_type.startswith('xs:'),
+                'boolean' in data_type,
+            ))
+        plan = _compare_plans[elm_class] = tuple(plan)
+    return plan
 
 
 def compareResponseCode(resp, expected, logger):
@@ -259,13 +327,6 @@ def compareElements(expElm, actElm, logger, root, equal=True,
     Returns:
         bool: True if elements are equal, False otherwise
     """
-    ignore_list = [
-        'status', 'role', 'active', 'total', 'required', 'permit',
-        'root_password', 'namespace',
-    ]
-    ignore_list.extend(ATTR_IGNORE_LIST)
-    ignore_list.extend(ignore)
-
     if not actElm:
         logger.debug(
             "Attribute '{0}' doesn't exist in actual results".format(root)
@@ -277,29 +338,22 @@ def compareElements(expElm, actElm, logger, root, equal=True,
     else:
         elmClass = expElm.__class__.__name__
     elmClass = getClassName(elmClass)
-    elmInstance = getattr(ds, elmClass)()
-
-    attrList = getObjAttributes(elmInstance, elmInstance)
-
-    # the list of changed attributes
-    attr_changed_list = NameTable.values()
 
-    for attr in attrList:
-        if attr in ignore_list:
+    for plan_attr in get_compare_plan(elmClass):
+        attr = plan_attr.name
+        if ignore and attr in ignore:
             continue
 
         # check if we changed this attribute as part of generate DS process
-        attr_changed = False
-        if attr in attr_changed_list:
-            orig_attr = NameTable.keys()[attr_changed_list.index(attr)]
+        if plan_attr.orig_name is not None:
             logger.info('Attribute: {0} changed to: {1}'.format(
-                        attr, orig_attr))
-            attr = orig_attr
-            attr_changed = True
+                        attr, plan_attr.orig_name))
         try:
-            attrExpVal = getAttibuteValue(expElm, attr)
-            attrActVal = getAttibuteValue(actElm, attr)
+            attrExpVal = getattr(expElm, plan_attr.getter)()
+            attrActVal = getattr(actElm, plan_attr.getter)()
         except AttributeError:
+            if plan_attr.orig_name is not None:
+                attr = plan_attr.orig_name
             if java_sdk_mode:
                 # collection case
                 if actElm.java_object.__class__.__name__.endswith('s'):
@@ -324,11 +378,14 @@ def compareElements(expElm, actElm, logger, root, equal=True,
                                  format(actElm, attr))
                     equal = False
             continue
+        # TODO: to find some generic way to handle such conversions for all
+        # string answers from api backends
+        if isinstance(attrExpVal, unicode):
+            attrExpVal = attrExpVal.encode('UTF-8', 'replace')
+        if isinstance(attrActVal, unicode):
+            attrActVal = attrActVal.encode('UTF-8', 'replace')
 
-        if attr_changed:
-            attr = NameTable[attr]
-        attrType = elmInstance.member_data_items_[attr].get_data_type()
-        attrContainer = elmInstance.member_data_items_[attr].get_container()
+        attrContainer = plan_attr.container
 
         if attrExpVal is not None:
             if attrActVal is None:
@@ -336,7 +393,7 @@ def compareElements(expElm, actElm, logger, root, equal=True,
                 logger.debug(MSG.format(root, attr))
                 continue
 
-            if attrType.startswith('xs:') or is_primitive(attrActVal):
+            if plan_attr.simple or is_primitive(attrActVal):
                 if attrContainer and isinstance(attrExpVal, list):
                     if not isinstance(attrActVal, list):
                         attrExpVal = attrExpVal[0]
@@ -351,8 +408,7 @@ def compareElements(expElm, actElm, logger, root, equal=True,
                                               set(ignoreVals))
                             attrActVal.sort()
 
-                if (re.search('boolean', attrType) or
-                        isinstance(attrActVal, bool)):
+                if plan_attr.boolean or isinstance(attrActVal, bool):
                     attrExpVal = str(attrExpVal).lower()
                     attrActVal = str(attrActVal).lower()
 
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2010 Red Hat, Inc.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this software; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA, or see the FSF site: http://www.fsf.org.
+
+"""
+Background validation of responses against XSD schema.
+
+Responses are handed over to a small pool of worker threads through
+a bounded queue, so validation never blocks the request. Responses are
+sampled per href template (ids replaced by placeholder) and errors are
+kept in an index keyed by (href template, error message), so repeated
+errors of long runs don't grow the memory.
+"""
+
+import Queue
+import logging
+import threading
+from collections import Counter, namedtuple
+
+from lxml import etree
+
+from art.core_api.cache import href_template
+
+logger = logging.getLogger('xsd_validator')
+
+DEF_WORKERS = 2  # default number of validating threads
+DEF_QUEUE_SIZE = 100  # default number of responses waiting for validation
+DEF_SAMPLE_RATE = 1  # default rate of validated responses, 1 validates all
+
+XsdError = namedtuple('XsdError', 'template message href status body count')
+
+
+class XsdValidator(object):
+    """
+    Pool of threads validating responses against XSD schema
+    """
+
+    def __init__(
+        self, xsd_path, workers=DEF_WORKERS, queue_size=DEF_QUEUE_SIZE,
+        sample_rate=DEF_SAMPLE_RATE
+    ):
+        """
+        Args:
+            xsd_path (str): Path to XSD schema
+            workers (int): Number of validating threads
+            queue_size (int): Maximum number of responses waiting for
+                validation, responses over it are dropped
+            sample_rate (int): Validate one of sample_rate responses of
+                every href template
+        """
+        self.xsd_doc = etree.parse(xsd_path)
+        self.workers = workers
+        self.sample_rate = max(sample_rate, 1)
+        self.stats = Counter()
+        self._queue = Queue.Queue(queue_size)
+        self._seen = Counter()
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        """
+        Start worker threads, called with lock held
+        """
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for i in range(len(self._threads), self.workers):
+            thread = threading.Thread(
+                target=self._run, name="xsd_validator_%d" % i
+            )
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, href, status, body, tree=None):
+        """
+        Queue response for validation
+
+        Args:
+            href (str): Request href
+            status (int): Response status
+            body (str): Response body
+            tree (Element): Already parsed response body, None to parse
+                body in worker
+        """
+        if not body:
+            return
+        template = href_template(href)
+        with self._lock:
+            seen = self._seen[template]
+            self._seen[template] += 1
+            if seen % self.sample_rate:
+                self.stats['skipped'] += 1
+                return
+            if len(self._threads) < self.workers:
+                self._start()
+        try:
+            self._queue.put_nowait((template, href, status, body, tree))
+        except Queue.Full:
+            with self._lock:
+                self.stats['dropped'] += 1
+
+    def _run(self):
+        # lxml validators keep error log per instance, every worker has
+        # its own
+        xsd = etree.XMLSchema(self.xsd_doc)
+        while True:
+            template, href, status, body, tree = self._queue.get()
+            try:
+                self._validate(xsd, template, href, status, body, tree)
+            except Exception:
+                logger.exception("Failed to validate response of %s", href)
+            finally:
+                self._queue.task_done()
+
+    def _validate(self, xsd, template, href, status, body, tree):
+        if tree is None:
+            try:
+                tree = etree.fromstring(body)
+            except etree.XMLSyntaxError as err:
+                logger.error(
+                    "Failed parsing response for XSD validations error: %s. "
+                    "body: %s", err, body
+                )
+                return
+        valid = xsd.validate(tree)
+        with self._lock:
+            self.stats['validated'] += 1
+            if valid:
+                return
+            self.stats['invalid'] += 1
+            for error in xsd.error_log:
+                key = (template, error.message)
+                known = self._errors.get(key)
+                if known is None:
+                    self._errors[key] = XsdError(
+                        template, error.message, href, status, body, 1
+                    )
+                else:
+                    self._errors[key] = known._replace(count=known.count + 1)
+
+    def wait(self):
+        """
+        Wait until all queued responses are validated
+        """
+        if self._threads:
+            self._queue.join()
+
+    def errors(self):
+        """
+        Get validation errors, waits for queued responses first
+
+        Returns:
+            list: XsdError of every distinct error, with example response
+                and number of occurrences
+        """
+        self.wait()
+        with self._lock:
+            return sorted(self._errors.values())
+
+    def clear(self):
+        """
+        Forget collected errors and sampling counters
+        """
+        with self._lock:
+            self._errors.clear()
+            self._seen.clear()
@@ -188,6 +188,7 @@ DelayedElements = []
 DelayedElements_subclass = []
 AlreadyGenerated = []
 AlreadyGenerated_subclass = []
+BuildSpecs = []
 PostponedExtensions = []
 ElementsForSubclasses = []
 ElementDict = {}
@@ -2199,6 +2200,11 @@ def generateToEtree(wrt, element, Targetnamespace):
             "'{http://www.w3.org/2001/XMLSchema-instance}type', "
             "self.extensiontype_)\n")
     generateToEtreeAttributes(wrt, element)
+    if element.getSimpleContent() and not element.isMixed():
+        # Same value export writes in between the tags.
+        wrt("        if self.valueOf_ is not None:\n")
+        wrt("            element.text = self.valueOf_ if isinstance("
+            "self.valueOf_, basestring) else str(self.valueOf_)\n")
     generateToEtreeChildren(wrt, element, Targetnamespace)
     wrt("        if mapping_ is not None:\n")
     wrt("            mapping_[self] = element\n")
@@ -2317,8 +2323,11 @@ def generateToEtreeAttributes(wrt, element):
     attrDefs = element.getAttributeDefs()
     for key in attrDefs.keys():
         attrDef = attrDefs[key]
-        name = attrDef.getName()
-        cleanName = mapName(cleanupName(name))
+        cleanName = mapName(cleanupName(attrDef.getName()))
+        # XML name of the attribute, as export writes it
+        name = attrDef.getOrig_name()
+        if name is None:
+            name = attrDef.getName()
         attrType = attrDef.getType()
         wrt("        if self.%s is not None:\n" % (cleanName, ))
         if (attrType in StringType or
@@ -3624,6 +3633,186 @@ def generateBuildFn(wrt, prefix, element, delayed):
 # end generateBuildFn
 
 
+#
+# Build specs are declarative copies of the generated build() methods.
+#   They are used by streaming builders which construct the objects
+#   without calling build()/buildChildren() for every element.
+#   A None in place of the attribute or children table means that the
+#   table cannot express what build() does and the generated method
+#   has to be used for that part.
+XsiNamespace = 'http://www.w3.org/2001/XMLSchema-instance'
+
+
+def getSimpleKind(atype):
+    if atype == DateTimeType:
+        return 'datetime'
+    elif atype == DateType:
+        return 'date'
+    elif atype == TimeType:
+        return 'time'
+    elif atype in IntegerType:
+        return 'int'
+    elif atype == BooleanType:
+        return 'bool'
+    elif atype == FloatType or atype == DoubleType or atype == DecimalType:
+        return 'float'
+    elif atype == TokenType:
+        return 'token'
+    elif (atype in (PositiveIntegerType, NonPositiveIntegerType,
+                    NegativeIntegerType, NonNegativeIntegerType)):
+        return None
+    return 'str'
+
+
+def getBuildSpecAttributes(element):
+    if element.getAnyAttribute():
+        return None
+    attrs = {}
+    if element.getExtended():
+        attrs['{%s}type' % XsiNamespace] = ('extensiontype_', 'str')
+    attrDefs = element.getAttributeDefs()
+    for key in attrDefs:
+        attrDef = attrDefs[key]
+        name = attrDef.getName()
+        orig_name = attrDef.getOrig_name()
+        if orig_name is None:
+            orig_name = name
+        mappedName = mapName(cleanupName(name))
+        typeName = attrDef.getType()
+        if (ValidatorBodiesBasePath and typeName and
+                typeName in SimpleTypeDict):
+            return None
+        atype = typeName
+        if atype in SimpleTypeDict:
+            atype = SimpleTypeDict[atype].getBase()
+        kind = getSimpleKind(atype)
+        if kind is None:
+            return None
+        attrs[orig_name] = (mappedName, kind)
+    return attrs
+
+
+def getBuildSpecChild(prefix, child, headChild):
+    origName = child.getName()
+    mappedName = mapName(cleanupName(origName))
+    childType = child.getType()
+    isList = child.getMaxOccurs() > 1
+    simpleType = child.getSimpleType()
+    if (simpleType in SimpleTypeDict and (
+            ValidatorBodiesBasePath or
+            SimpleTypeDict[simpleType].isListType())):
+        return None
+    if (childType in (DateTimeType, DateType, TimeType) or (
+            len(child.getAttributeDefs()) == 0 and (
+            childType in StringType or
+            childType == TokenType or
+            childType in DateTimeGroupType))):
+        return (mappedName, getSimpleKind(childType), None, isList)
+    if child.isListType():
+        return None
+    if (childType in IntegerType or childType == BooleanType or
+            childType in (FloatType, DoubleType, DecimalType)):
+        return (mappedName, getSimpleKind(childType), None, isList)
+    if childType in (Base64Type, PositiveIntegerType, NonPositiveIntegerType,
+                     NegativeIntegerType, NonNegativeIntegerType):
+        return None
+    if simpleType:
+        return None
+    type_name = child.getAttrs().get('type')
+    type_element = ElementDict.get(type_name) if type_name else None
+    if type_element and type_element.isAbstract():
+        return None
+    if type_element:
+        type_name = type_element.getType()
+    elif origName in ElementDict:
+        type_name = ElementDict[origName].getType()
+    else:
+        type_name = childType
+    type_name = cleanupName(mapName(type_name))
+    type_obj = ElementDict.get(type_name)
+    if type_obj is not None and type_obj.getExtended():
+        return None
+    substitutionGroup = child.getAttrs().get('substitutionGroup')
+    if headChild.getMaxOccurs() > 1:
+        name = substitutionGroup or mappedName
+        return (name, 'obj', prefix + type_name, True)
+    return (mappedName, 'obj', prefix + type_name, False)
+
+
+def getBuildSpecChildren(prefix, element):
+    if element.isMixed():
+        return None
+    children = {}
+    for child in element.getChildren():
+        if child.getType() == AnyTypeIdentifier:
+            return None
+        members = [child]
+        childName = child.getName()
+        if childName in SubstitutionGroups:
+            for memberName in transitiveClosure(
+                    SubstitutionGroups, childName):
+                memberName = cleanupName(memberName)
+                if memberName in ElementDict:
+                    members.append(ElementDict[memberName])
+        for member in members:
+            children[member.getName()] = getBuildSpecChild(
+                prefix, member, child)
+    return children
+
+
+def getBuildSpec(prefix, element):
+    attrs = getBuildSpecAttributes(element)
+    children = getBuildSpecChildren(prefix, element)
+    parentName, parent = getParentName(element)
+    if parentName:
+        parentAttrs, parentChildren, _ = getBuildSpec(prefix, parent)
+        if attrs is not None:
+            if parentAttrs is None:
+                attrs = None
+            else:
+                attrs = dict(parentAttrs, **attrs)
+        # buildChildren() of the parent is called for extensions only
+        if element.getBase() and not element.getSimpleContent():
+            if children is not None:
+                if parentChildren is None:
+                    children = None
+                else:
+                    children = dict(parentChildren, **children)
+    return attrs, children, bool(element.getSimpleContent())
+
+
+def generateBuildSpec(prefix, element):
+    attrs, children, hasText = getBuildSpec(prefix, element)
+    s1 = "    '%s%s': (\n" % (prefix, element.getCleanName(), )
+    if attrs is None:
+        s1 += "        None,\n"
+    else:
+        s1 += "        {\n"
+        for key in sorted(attrs):
+            s1 += "            '%s': ('%s', '%s'),\n" % (
+                (key, ) + attrs[key])
+        s1 += "        },\n"
+    if children is None:
+        s1 += "        None,\n"
+    else:
+        s1 += "        {\n"
+        for key in sorted(children):
+            spec = children[key]
+            if spec is None:
+                s1 += "            '%s': None,\n" % (key, )
+            else:
+                attr, kind, className, isList = spec
+                if className is not None:
+                    className = "'%s'" % (className, )
+                s1 += "            '%s': ('%s', '%s', %s, %s),\n" % (
+                    key, attr, kind, className, isList, )
+        s1 += "        },\n"
+    s1 += "        %s,\n" % (hasText, )
+    s1 += "    ),\n"
+    BuildSpecs.append(s1)
+# end generateBuildSpec
+
+
 def countElementChildren(element, count):
     count += len(element.getChildren())
     base = element.getBase()
@@ -4286,6 +4475,7 @@ def generateClasses(wrt, prefix, element, delayed, nameSpacesDef=''):
     if ExportLiteral:
         generateExportLiteralFn(wrt, prefix, element)
     generateBuildFn(wrt, prefix, element, delayed)
+    generateBuildSpec(prefix, element)
     generateUserMethods(wrt, element)
     wrt('# end class %s\n' % name)
     wrt('\n\n')
@@ -5055,6 +5245,8 @@ def generateMain(outfile, prefix, root):
                 cleanupName(mapName(MappingTypes[classType])))
     exportDictLine += "}\n\n\n"
     outfile.write(exportDictLine)
+    outfile.write(
+        "GDSBuildSpecs = {\n%s}\n\n\n" % (''.join(BuildSpecs), ))
     children = root.getChildren()
     if children:
         name = RootElement or children[0].getName()
@@ -5699,6 +5891,7 @@ def generate(outfileName, subclassFilename, behaviorFilename,
     #   subclasses.
     MappingTypes.clear()
     AlreadyGenerated = []
+    del BuildSpecs[:]
     outfile = None
     if outfileName:
         outfile = makeFile(outfileName)
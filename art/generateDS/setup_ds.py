@@ -18,12 +18,21 @@
 # 02110-1301 USA, or see the FSF site: http://www.fsf.org.
 
 import os
+import hashlib
+import json
+import shutil
 from abc import ABCMeta, abstractmethod
 import logging
 from subprocess import Popen, PIPE
 
 logger = logging.getLogger('setup_ds')
 
+# response headers kept to download the schema again only if it changed
+CONDITIONAL_HEADERS = {
+    'ETag': 'If-None-Match',
+    'Last-Modified': 'If-Modified-Since',
+}
+
 
 class GenerateDataStructuresError(Exception):
     """
@@ -48,25 +57,142 @@ class GenerateDataStructures(object):
 
     def __call__(self, conf):
         self._download_xsd(conf)
+        key = self._get_ds_key(conf)
+        if self._reuse_ds(conf, key):
+            return
+        # data structures are going to be overwritten, forget their key
+        if os.path.exists(self._ds_path + '.key'):
+            os.remove(self._ds_path + '.key')
         self._generate_ds(conf)
+        self._store_ds(conf, key)
 
     def _download_xsd(self, conf):
         from art.core_api.http import HTTPProxy
         proxy = HTTPProxy(self._opts)
-        res = proxy.GET(conf['GENERATE_DS']['schema_url'])
+        headers_path = self._xsd_path + '.headers'
+        headers = {}
+        if (
+            conf['GENERATE_DS'].get('conditional_get') and
+            os.path.exists(self._xsd_path) and os.path.exists(headers_path)
+        ):
+            with open(headers_path) as fh:
+                headers = dict(
+                    (CONDITIONAL_HEADERS[name], str(value))
+                    for name, value in json.load(fh).iteritems()
+                    if name in CONDITIONAL_HEADERS and value
+                )
+        res = proxy.GET(
+            conf['GENERATE_DS']['schema_url'], headers=headers,
+            get_header=CONDITIONAL_HEADERS.keys()
+        )
+        if res['status'] == 304:
+            logger.info("XSD scheme not modified: %s", self._xsd_path)
+            return
         if res['status'] > 300:
             raise Exception("Failed to download schema: %s " % res['reason'])
 
         with open(self._xsd_path, 'w') as fh:
             fh.write(res['body'])
+        with open(headers_path, 'w') as fh:
+            json.dump(
+                dict((name, res[name]) for name in CONDITIONAL_HEADERS), fh
+            )
         logger.info("Downloaded XSD scheme: %s", self._xsd_path)
 
-    def _generate_ds(self, conf):
+    def _get_generate_cmd(self, conf):
         ds_exec = os.path.join(self._repo_path, 'generateDS', 'generateDS.py')
         encoding = conf['GENERATE_DS']['encoding']
-        cmd = ['python', ds_exec, '-f', '-o', self._ds_path,
-               '--member-specs=dict', '--external-encoding=%s' % encoding,
-               self._xsd_path]
+        return ['python', ds_exec, '-f', '-o', self._ds_path,
+                '--member-specs=dict', '--export=write etree',
+                '--external-encoding=%s' % encoding,
+                self._xsd_path]
+
+    def _get_ds_key(self, conf):
+        """
+        Get key of data structures, SHA1 of XSD scheme, generator and
+        generator options
+
+        Args:
+            conf (dict): ART configuration
+
+        Returns:
+            str: Hex digest
+        """
+        cmd = self._get_generate_cmd(conf)
+        digest = hashlib.sha1(' '.join(cmd[2:-1]))
+        generator_dir = os.path.dirname(cmd[1])
+        for path in (
+            cmd[1],
+            os.path.join(generator_dir, 'generateds_config.py'),
+            os.path.join(generator_dir, 'process_includes.py'),
+            self._xsd_path,
+        ):
+            with open(path, 'rb') as fh:
+                digest.update(fh.read())
+        return digest.hexdigest()
+
+    def _get_cached_ds_path(self, conf, key):
+        cache_dir = conf['GENERATE_DS'].get('cache_dir')
+        if not cache_dir:
+            return None
+        return os.path.join(cache_dir, 'data_structures_%s.py' % key)
+
+    def _reuse_ds(self, conf, key):
+        """
+        Reuse data structures generated from same XSD scheme, by the same
+        generator, either in place (keeping its compiled module) or from
+        cache directory
+
+        Args:
+            conf (dict): ART configuration
+            key (str): Key of data structures
+
+        Returns:
+            bool: True if data structures were reused
+        """
+        key_path = self._ds_path + '.key'
+        if os.path.exists(self._ds_path) and os.path.exists(key_path):
+            with open(key_path) as fh:
+                if fh.read().strip() == key:
+                    logger.info(
+                        "Reusing data structures: %s", self._ds_path
+                    )
+                    return True
+        cached_path = self._get_cached_ds_path(conf, key)
+        if cached_path and os.path.exists(cached_path):
+            shutil.copy2(cached_path, self._ds_path)
+            with open(key_path, 'w') as fh:
+                fh.write(key)
+            logger.info(
+                "Reusing cached data structures: %s", cached_path
+            )
+            return True
+        return False
+
+    def _store_ds(self, conf, key):
+        """
+        Store key of generated data structures, and copy them to cache
+        directory if configured
+
+        Args:
+            conf (dict): ART configuration
+            key (str): Key of data structures
+        """
+        with open(self._ds_path + '.key', 'w') as fh:
+            fh.write(key)
+        cached_path = self._get_cached_ds_path(conf, key)
+        if cached_path:
+            try:
+                if not os.path.isdir(os.path.dirname(cached_path)):
+                    os.makedirs(os.path.dirname(cached_path))
+                shutil.copy2(self._ds_path, cached_path)
+            except (IOError, OSError) as ex:
+                logger.warning(
+                    "Failed to cache data structures %s: %s", cached_path, ex
+                )
+
+    def _generate_ds(self, conf):
+        cmd = self._get_generate_cmd(conf)
 
         p = Popen(cmd, stdout=PIPE, stderr=PIPE)
         out, err = p.communicate()
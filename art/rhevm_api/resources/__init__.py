@@ -1,4 +1,3 @@
-from rrmngmnt.host import Host
 from rrmngmnt.user import (
     User,
     RootUser,
@@ -7,6 +6,7 @@ from rrmngmnt.user import (
     ADUser,
 )
 from rrmngmnt.db import Database
+from art.rhevm_api.resources.host import Host
 from art.rhevm_api.resources.engine import Engine
 from art.rhevm_api.resources.vds import VDS
 
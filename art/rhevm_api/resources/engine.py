@@ -5,10 +5,11 @@ import urllib2
 import requests
 
 from rrmngmnt.db import Database
-from rrmngmnt.host import Host
 from rrmngmnt.service import Service
 from rrmngmnt.user import User
 
+from art.rhevm_api.resources.host import Host
+
 DATABASE_CONFIG = "/etc/ovirt-engine/engine.conf.d/10-setup-database.conf"
 
 
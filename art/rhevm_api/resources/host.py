@@ -0,0 +1,15 @@
+from rrmngmnt import host
+
+from art.rhevm_api.resources import ssh_pool
+
+
+class Host(host.Host):
+    """
+    Host whose executors run commands in pooled SSH sessions
+    """
+
+    def executor(self, *args, **kwargs):
+        """
+        Get executor of the host, see ssh_pool.PooledExecutor
+        """
+        return ssh_pool.pooled(super(Host, self).executor(*args, **kwargs))
@@ -0,0 +1,413 @@
+"""
+Pool of SSH sessions shared by executors of all hosts
+
+RemoteExecutor opens new SSH connection and authenticates for every run_cmd.
+PooledExecutor runs commands in open sessions of process-wide pool of its
+address, user and authentication. Every session runs up to
+RUN.ssh_pool_channels commands at once in separate channels of its
+connection, at most RUN.ssh_pool_sessions sessions are open to host by one
+user, callers over this limit wait for free channel. Sessions idle for
+RUN.ssh_pool_idle_timeout seconds are closed, dead ones are dropped.
+
+Sessions are paramiko connections opened by SSHSession with the address,
+port and credentials of executor, the same way RemoteExecutor does.
+"""
+
+import hashlib
+import logging
+import os
+import subprocess
+import threading
+import time
+
+import paramiko
+
+from art.core_api.timeout import (
+    cancelling,
+    current_deadline,
+    remaining_time,
+)
+from art.test_handler import settings
+
+logger = logging.getLogger("art.ssh_pool")
+
+DEF_SESSIONS = 4
+DEF_CHANNELS = 8  # sshd allows 10 sessions per connection by default
+DEF_IDLE_TIMEOUT = 300
+KEEPALIVE = 30  # seconds between keepalives of idle connections
+WAIT_POLL = 1  # seconds between deadline checks when waiting for channel
+TCP_TIMEOUT = 10.0
+ID_RSA_PATH = os.path.expanduser('~/.ssh/id_rsa')
+
+
+def _run_option(name, default, convert):
+    # options of --art-define come as strings
+    value = settings.ART_CONFIG.get('RUN', {}).get(name)
+    return default if value is None else convert(value)
+
+
+def _to_bool(value):
+    if isinstance(value, basestring):
+        if value.strip().lower() in ('true', 'yes', 'on', '1'):
+            return True
+        if value.strip().lower() in ('false', 'no', 'off', '0'):
+            return False
+        raise ValueError("requires boolean: %r" % value)
+    return bool(value)
+
+
+def _close(session):
+    try:
+        session.close()
+    except Exception as ex:
+        logger.debug("Failed to close SSH session: %s", ex)
+
+
+class SSHSession(object):
+    """
+    SSH connection to address of executor as its user, every command runs
+    in its own channel, so several commands can run at once
+    """
+
+    def __init__(self, executor, timeout=None):
+        """
+        Args:
+            executor (RemoteExecutor): Executor with address, port and user
+            timeout (float): Timeout of connecting
+        """
+        self.executor = executor
+        self.timeout = timeout or TCP_TIMEOUT
+        self._client = paramiko.SSHClient()
+        self._client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+    @property
+    def transport(self):
+        """
+        paramiko.Transport: Transport of connection, None if not connected
+        """
+        return self._client.get_transport()
+
+    def open(self):
+        """
+        Connect and authenticate by password or by private key of user
+        running ART, see RemoteExecutor.use_pkey
+        """
+        executor = self.executor
+        pkey = None
+        if getattr(executor, 'use_pkey', False):
+            pkey = paramiko.RSAKey.from_private_key_file(ID_RSA_PATH)
+        self._client.connect(
+            executor.address, port=getattr(executor, 'port', None) or 22,
+            username=executor.user.name, password=executor.user.password,
+            pkey=pkey, timeout=self.timeout,
+        )
+
+    def close(self):
+        self._client.close()
+
+    def run_cmd(self, cmd, input_=None, timeout=None):
+        """
+        Run command in new channel, the channel is closed when current
+        deadline expires
+
+        Args:
+            cmd (list): Command and its arguments, joined to command line
+                the same way RemoteExecutor does, so shell syntax passed as
+                separate arguments (pipes, redirections, globs) works
+            input_ (str): Data written to stdin of command
+            timeout (float): Timeout of reading output, socket.timeout is
+                raised when it expires
+
+        Returns:
+            tuple: Return code, stdout and stderr of command
+
+        Raises:
+            TimeoutExpiredError: If current deadline expired
+        """
+        command = subprocess.list2cmdline(cmd)
+        logger.debug("Executing command on %s: %s", self.executor.address,
+                     command)
+        in_, out, err = self._client.exec_command(command, timeout=timeout)
+        # reads of closed channel end, so expiry aborts running command
+        with cancelling(out.channel.close) as deadline:
+            try:
+                if input_:
+                    in_.write(input_)
+                    in_.channel.shutdown_write()
+                # stderr is buffered by transport thread, so reading stdout
+                # first doesn't block command writing to stderr
+                stdout = out.read()
+                stderr = err.read()
+                rc = out.channel.recv_exit_status()
+            finally:
+                out.channel.close()
+            if deadline is not None:
+                deadline.check()
+            return rc, stdout, stderr
+
+
+class PooledSession(object):
+    """
+    Open session of pool with number of commands running in it
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.channels = 0
+        self.last_used = time.time()
+        self.dropped = False
+        transport = session.transport
+        if transport is not None:
+            transport.set_keepalive(KEEPALIVE)
+
+    def is_alive(self):
+        """
+        Returns:
+            bool: False if connection of session is closed
+        """
+        transport = self.session.transport
+        return transport is not None and transport.is_active()
+
+    def close(self):
+        _close(self.session)
+
+
+class SessionPool(object):
+    """
+    Open sessions to one host of one user
+    """
+
+    def __init__(
+        self, executor, max_sessions=DEF_SESSIONS, max_channels=DEF_CHANNELS,
+        idle_timeout=DEF_IDLE_TIMEOUT
+    ):
+        """
+        Args:
+            executor (RemoteExecutor): Executor opening sessions
+            max_sessions (int): Maximum open sessions
+            max_channels (int): Maximum commands running in one session
+            idle_timeout (int): Seconds after which idle session is closed
+        """
+        self.executor = executor
+        self.max_sessions = max_sessions
+        self.max_channels = max_channels
+        self.idle_timeout = idle_timeout
+        self.sessions = []
+        self._opening = 0
+        self._cond = threading.Condition()
+
+    def _drop(self, pooled):
+        # must be called with lock held, closed when its last command ends
+        pooled.dropped = True
+        self.sessions.remove(pooled)
+        self._cond.notify()
+        if not pooled.channels:
+            pooled.close()
+
+    def reap(self):
+        """
+        Close idle sessions which timed out or whose connection is closed
+        """
+        with self._cond:
+            now = time.time()
+            for pooled in list(self.sessions):
+                if not pooled.channels and (
+                    now - pooled.last_used > self.idle_timeout or
+                    not pooled.is_alive()
+                ):
+                    self._drop(pooled)
+
+    def _take(self):
+        # must be called with lock held, session with free channel or None
+        for pooled in list(self.sessions):
+            if not pooled.is_alive():
+                self._drop(pooled)
+            elif pooled.channels < self.max_channels:
+                pooled.channels += 1
+                return pooled
+        return None
+
+    def acquire(self, tcp_timeout=None):
+        """
+        Take channel of open session, new session is opened if all are busy
+        and limit isn't reached, otherwise waits for free channel
+
+        Args:
+            tcp_timeout (float): Timeout of connecting new session
+
+        Returns:
+            PooledSession: Session to run command in, must be released
+        """
+        deadline = current_deadline()
+        with self._cond:
+            while True:
+                pooled = self._take()
+                if pooled is not None:
+                    return pooled
+                if len(self.sessions) + self._opening < self.max_sessions:
+                    self._opening += 1
+                    break
+                if deadline is not None:
+                    deadline.check()
+                self._cond.wait(remaining_time(WAIT_POLL))
+
+        session = None
+        try:
+            session = SSHSession(self.executor, tcp_timeout)
+            session.open()
+            pooled = PooledSession(session)
+        except BaseException:
+            if session is not None:
+                _close(session)
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            pooled.channels = 1
+            self.sessions.append(pooled)
+        return pooled
+
+    def release(self, pooled, broken=False):
+        """
+        Return channel taken by acquire
+
+        Args:
+            pooled (PooledSession): Session of channel
+            broken (bool): True to drop session, e.g. its connection failed
+        """
+        with self._cond:
+            pooled.channels -= 1
+            pooled.last_used = time.time()
+            if broken and not pooled.dropped:
+                self._drop(pooled)
+            elif pooled.dropped:
+                if not pooled.channels:
+                    pooled.close()
+            else:
+                self._cond.notify()
+
+    def close(self):
+        """
+        Close all sessions, running commands are closed when they end
+        """
+        with self._cond:
+            for pooled in list(self.sessions):
+                self._drop(pooled)
+
+
+class PooledExecutor(object):
+    """
+    Remote executor running commands in pooled sessions, other methods
+    (session, is_connective, ...) are of wrapped executor
+    """
+
+    def __init__(self, executor, pool):
+        """
+        Args:
+            executor (RemoteExecutor): Wrapped executor
+            pool (SessionPool): Pool of executor address and user
+        """
+        self._executor = executor
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._executor, name)
+
+    def run_cmd(self, cmd, input_=None, tcp_timeout=None, io_timeout=None):
+        """
+        Run command in pooled session, see RemoteExecutor.run_cmd
+        """
+        pooled = self._pool.acquire(tcp_timeout)
+        broken = False
+        try:
+            return pooled.session.run_cmd(cmd, input_, io_timeout)
+        except Exception:
+            broken = not pooled.is_alive()
+            raise
+        finally:
+            self._pool.release(pooled, broken)
+
+
+class ExecutorRegistry(object):
+    """
+    Session pools by address, user and authentication of executors, keys
+    hold digest of credentials, not credentials themselves
+    """
+
+    def __init__(self):
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(executor):
+        user = executor.user
+        use_pkey = getattr(executor, 'use_pkey', False)
+        secret = getattr(user, 'password', None) or ''
+        if isinstance(secret, unicode):
+            secret = secret.encode('utf-8')
+        return (
+            executor.address, getattr(executor, 'port', None), user.name,
+            use_pkey, hashlib.sha256(secret).hexdigest(),
+        )
+
+    def pool(self, executor):
+        """
+        Get pool of executor, idle sessions of all pools are reaped
+
+        Args:
+            executor (RemoteExecutor): Executor
+
+        Returns:
+            SessionPool: Pool of executor address and user
+        """
+        key = self._key(executor)
+        with self._lock:
+            pools = self._pools.values()
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = SessionPool(
+                    executor,
+                    max_sessions=_run_option(
+                        'ssh_pool_sessions', DEF_SESSIONS, int
+                    ),
+                    max_channels=_run_option(
+                        'ssh_pool_channels', DEF_CHANNELS, int
+                    ),
+                    idle_timeout=_run_option(
+                        'ssh_pool_idle_timeout', DEF_IDLE_TIMEOUT, float
+                    ),
+                )
+                self._pools[key] = pool
+        for idle in pools:
+            idle.reap()
+        return pool
+
+    def close_all(self):
+        """
+        Close sessions of all pools
+        """
+        with self._lock:
+            pools, self._pools = self._pools.values(), {}
+        for pool in pools:
+            pool.close()
+
+
+registry = ExecutorRegistry()
+
+
+def pooled(executor):
+    """
+    Wrap executor to run commands in pooled sessions, unless disabled by
+    RUN.ssh_pool
+
+    Args:
+        executor (RemoteExecutor): Executor
+
+    Returns:
+        PooledExecutor: Executor using pool of its address and user
+    """
+    if not _run_option('ssh_pool', True, _to_bool):
+        return executor
+    return PooledExecutor(executor, registry.pool(executor))
@@ -1,15 +1,217 @@
 import ast
+import base64
+import json
 import os
 import shlex
+import socket
+import threading
 
 import yaml
 from repoze.lru import CacheMaker
-from rrmngmnt.host import Host
 from rrmngmnt.user import RootUser
 
+from art.core_api.timeout import (
+    TimeoutExpiredError,
+    cancelling,
+    remaining_time,
+)
+from art.rhevm_api.resources import ssh_pool
+from art.rhevm_api.resources.host import Host
+
 LIBVIRTD_PID_DIRECTORY = "/var/run/libvirt/qemu/"
 VDSM_API_YAML = "/usr/lib/python2.7/site-packages/vdsm/rpc/vdsm-api.yml"
 
+# Runs on host, keeps one vdsm connection and answers json requests read
+# line by line from stdin with json responses, one per line
+VDSM_CLIENT_HELPER = """
+import json
+import sys
+from vdsm import client
+
+
+def connect():
+    return client.connect('localhost', 54321, use_tls=True)
+
+
+def call(cli, request):
+    namespace, method = request['verb'].split('.', 1)
+    return getattr(getattr(cli, namespace), method)(**request['args'])
+
+
+cli = connect()
+for line in iter(sys.stdin.readline, ''):
+    request = json.loads(line)
+    try:
+        try:
+            response = {'result': call(cli, request)}
+        except client.ConnectionError:
+            # connection lost, e.g. vdsm was restarted
+            cli = connect()
+            response = {'result': call(cli, request)}
+    except Exception as ex:
+        response = {'error': '%s: %s' % (type(ex).__name__, ex)}
+    sys.stdout.write(json.dumps(response, default=str) + '\\n')
+    sys.stdout.flush()
+"""
+VDSM_CLIENT_TIMEOUT = 180  # seconds to wait for response of helper
+VDSM_CLIENT_COMMAND = [
+    "python", "-u", "-c",
+    "import base64;exec(base64.b64decode('%s'))" % base64.b64encode(
+        VDSM_CLIENT_HELPER
+    )
+]
+
+
+class DeadlineExecutor(object):
+    """
+    Remote executor whose commands are bounded by current deadline
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+
+    def __getattr__(self, name):
+        return getattr(self._executor, name)
+
+    def run_cmd(self, cmd, input_=None, tcp_timeout=None, io_timeout=None):
+        """
+        Run command bounded by current deadline, see RemoteExecutor.run_cmd
+
+        Connect timeout is clamped by the deadline. Command of pooled
+        executor is aborted on expiry by closing its channel, see
+        ssh_pool.SSHSession.run_cmd. Without pool running command can't be
+        aborted, its IO timeout is clamped by the deadline instead, so it
+        fails once it doesn't write output for the remaining time. Both
+        raise TimeoutExpiredError.
+        """
+        if not isinstance(self._executor, ssh_pool.PooledExecutor):
+            io_timeout = remaining_time(io_timeout)
+        with cancelling():
+            return self._executor.run_cmd(
+                cmd, input_=input_, tcp_timeout=remaining_time(tcp_timeout),
+                io_timeout=io_timeout
+            )
+
+
+class VdsmClient(object):
+    """
+    Long-lived vdsm client helper on host, requests of all threads are sent
+    one by one over single SSH channel
+    """
+
+    def __init__(self, host, timeout=VDSM_CLIENT_TIMEOUT):
+        """
+        Args:
+            host (VDS): Host to run helper on
+            timeout (float): Seconds to wait for response, helper which
+                doesn't answer in time is stopped
+        """
+        self.host = host
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._session = None
+        self._execution = None
+        self._stdin = None
+        self._stdout = None
+
+    def _start(self):
+        """
+        Open SSH session and start helper in it, its execution context is
+        left in close()
+        """
+        session = self.host.executor().session()
+        session.open()
+        try:
+            execution = session.command(VDSM_CLIENT_COMMAND).execute()
+            self._stdin, self._stdout, stderr = execution.__enter__()
+        except Exception:
+            session.close()
+            raise
+        self._session = session
+        self._execution = execution
+        drain = threading.Thread(
+            target=self._drain, args=(stderr,), name="VdsmClientStderr"
+        )
+        drain.daemon = True
+        drain.start()
+        self.host.logger.debug("Started vdsm client helper on %s", self.host)
+
+    def _drain(self, stderr):
+        # unread stderr would fill window of SSH channel and stall stdout
+        try:
+            for line in iter(stderr.readline, ''):
+                self.host.logger.debug(
+                    "vdsm client helper on %s: %s", self.host, line.rstrip()
+                )
+        except Exception:
+            pass  # session closed
+
+    def _send(self, request):
+        self._stdin.write(request)
+        self._stdin.flush()
+
+    def close(self):
+        """
+        Stop helper by closing its SSH session, safe to call from any thread
+        """
+        session, self._session = self._session, None
+        execution, self._execution = self._execution, None
+        if session is None:
+            return
+        try:
+            # closed session ends the helper, so leaving its execution
+            # doesn't wait for exit status of helper stuck in a call
+            session.close()
+            execution.__exit__(None, None, None)
+        except Exception as ex:
+            self.host.logger.debug(
+                "Failed to close vdsm client session on %s: %s", self.host, ex
+            )
+
+    def call(self, verb, args):
+        """
+        Send request to helper and read its response, helper which exited
+        since previous request is started again. Requests of all threads wait
+        for the response, so helper stuck in verb is stopped after timeout
+        or when current deadline expires
+
+        Args:
+            verb (str): vdsm API verb, e.g. Host.getVMList
+            args (dict): Verb parameters
+
+        Returns:
+            dict: Response with result of verb or error
+
+        Raises:
+            EOFError: If helper exited without response
+            socket.timeout: If there is no response in timeout
+        """
+        request = json.dumps({'verb': verb, 'args': args}) + '\n'
+        with self._lock:
+            with cancelling(self.close):
+                if self._session is None:
+                    self._start()
+                try:
+                    self._send(request)
+                except Exception:
+                    # request wasn't sent, helper is safe to start again
+                    self.close()
+                    self._start()
+                    self._send(request)
+                self._stdout.channel.settimeout(remaining_time(self.timeout))
+                try:
+                    line = self._stdout.readline()
+                except socket.timeout:
+                    # late response would answer next request
+                    self.close()
+                    raise
+                if not line:
+                    self.close()
+                    raise EOFError(
+                        "vdsm client helper on %s exited" % self.host
+                    )
+                return json.loads(line)
+
 
 class VDS(Host):
     """
@@ -26,6 +228,14 @@ class VDS(Host):
         """
         super(VDS, self).__init__(ip)
         self.users.append(RootUser(root_password))
+        self._vdsm_client = None
+        self._vdsm_client_lock = threading.Lock()
+
+    def executor(self, *args, **kwargs):
+        """
+        Get executor of the host, its run_cmd respects current deadline
+        """
+        return DeadlineExecutor(super(VDS, self).executor(*args, **kwargs))
 
     @property
     def nics(self):
@@ -86,6 +296,35 @@ class VDS(Host):
         )[1]
         return vdsm_client_content
 
+    @property
+    def vdsm_verbs(self):
+        """
+        Verbs of vdsm API supported by host
+        """
+        return self._get_vdsm_verbs()
+
+    @cache.lrucache(name='vdsm_verbs')
+    def _get_vdsm_verbs(self):
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        return frozenset(yaml.load(self.vdsm_client_content, Loader=loader))
+
+    @property
+    def vdsm_client(self):
+        """
+        Long-lived vdsm client helper of host
+        """
+        with self._vdsm_client_lock:
+            if self._vdsm_client is None:
+                self._vdsm_client = VdsmClient(self)
+            return self._vdsm_client
+
+    def close_vdsm_client(self):
+        """
+        Stop vdsm client helper of host, next vds_client call starts new one
+        """
+        if self._vdsm_client is not None:
+            self._vdsm_client.close()
+
     @property
     def hosted_engine_host(self):
         return self.is_hosted_engined_deployed()
@@ -96,7 +335,8 @@ class VDS(Host):
         All commands can be found under:
         https://github.com/oVirt/vdsm/blob/master/lib/vdsm/api/vdsm-api.yml
 
-        Json code:
+        Commands are sent to long-lived helper on host (see VdsmClient),
+        which keeps one connection to vdsm:
             from vdsm import client
             cli = client.connect(localhost, 54321, use_tls=True)
 
@@ -116,24 +356,25 @@ class VDS(Host):
             getVdsCaps
             out = config.VDS_HOSTS[0].vds_client("Host.getCapabilities")
         """
-        supported_actions = yaml.load(self.vdsm_client_content)
-        action = filter(lambda x: cmd == x, supported_actions.keys())
-        if not action:
+        if cmd not in self.vdsm_verbs:
             self.logger.error("Command %s is not supported", cmd)
             return None
-        action = action[0]
-
-        args = args if args else dict()
-        command = (
-            'python -c "from vdsm import client;'
-            'cli = client.connect(\'localhost\', 54321, use_tls=True);'
-            'print cli.{action}(**{args})"'.format(action=action, args=args)
-        )
 
-        rc, out, err = self.run_command(shlex.split(command))
-        if rc:
+        try:
+            response = self.vdsm_client.call(cmd, args if args else dict())
+        except TimeoutExpiredError:
+            raise
+        except Exception as ex:
+            self.logger.error(
+                "Failed to run %s on %s with vdsm client: %s", cmd, self, ex
+            )
             return None
-        return ast.literal_eval(out)
+        if 'error' in response:
+            self.logger.error(
+                "Command %s failed on %s: %s", cmd, self, response['error']
+            )
+            return None
+        return response['result']
 
     def get_vm_process_pid(self, vm_name):
         """
@@ -78,9 +78,11 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
         image_path=image_path
     ):
         """
-        Returns the md5sum of a specific disk before transfer(download/upload)
-        Download direction- ms5sum before transfer will be on the VDSM host
-        Upload direction - ms5sum before transfer will be on the local host
+        Returns the checksum of a specific disk before transfer
+        (download/upload), see image_transfer.TreeHash
+        Download direction- checksum before transfer will be on the VDSM host
+        Upload direction - checksum is computed while the image is uploaded,
+            so None is returned unless the image was uploaded already
 
         Args:
             host (host): Host resource object
@@ -90,23 +92,24 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
             image_path (str): Path of the transferred image on the local host
 
         Returns:
-            str: The md5sum of a specific disk image before transfer
+            str: The checksum of a specific disk image before transfer, None
+                for image not uploaded yet
 
         """
         if self.direction == DOWNLOAD:
             logger.info(
-                "Checking md5sum on disk name %s before download",
+                "Checking checksum on disk name %s before download",
                 disk_object.get_alias()
             )
-            out = self.md5sum_on_vdsm_host(
+            out = self.checksum_on_vdsm_host(
                 host=host, storage_type=storage_type, disk_object=disk_object,
                 sp_id=sp_id
             )
         else:
             logger.info(
-                "Checking md5sum on disk name %s before upload", image_path
+                "Checksum of %s is taken while it is uploaded", image_path
             )
-            out = self.md5sum_on_localhost(image_path)
+            out = self.checksums.get(image_path)
 
         return out
 
@@ -115,9 +118,10 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
         image_path=None
     ):
         """
-        Returns the md5sum output of a specific disk after image transfer
-        Download direction- ms5sum after transfer will be on localhost
-        Upload direction - ms5sum before transfer will be on VDSM host
+        Returns the checksum of a specific disk after image transfer
+        Download direction- checksum after transfer will be on localhost,
+            the one computed while the image was downloaded is used if any
+        Upload direction - checksum after transfer will be on VDSM host
 
         Args:
             host (host): Host resource object
@@ -127,18 +131,21 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
             image_path (str): Path of the transferred image on the local host
 
         Returns:
-            str: The md5sum of the image after transfer
+            str: The checksum of the image after transfer
 
         """
-        info = "Checking md5sum on disk name %s after %s"
+        info = "Checking checksum on disk name %s after %s"
         if self.direction == UPLOAD:
             logger.info(info, disk_object.get_alias(), self.direction)
-            out = self.md5sum_on_vdsm_host(
+            out = self.checksum_on_vdsm_host(
                 host, storage_type, disk_object, sp_id
             )
         else:
             logger.info(info, image_path, self.direction)
-            out = self.md5sum_on_localhost(image_path)
+            out = (
+                self.checksums.pop(image_path, None) or
+                self.checksum_on_localhost(image_path)
+            )
 
         return out
 
@@ -148,7 +155,8 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
         sdisks_objects=None, extend=False
     ):
         """
-        Returns the md5sums and sizes of selected disks before image transfer
+        Returns the checksums and sizes of selected disks before image
+        transfer
 
         Args:
             host (host): Host resource object
@@ -161,7 +169,8 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
             extend (bool): True if disk was extended,False otherwise
 
         Returns:
-            list: lists of md5sums and sizes of selected disks before download
+            list: lists of checksums and sizes of selected disks before
+                download
 
         """
         info = "Checking %s before %s on %s:\n %s"
@@ -169,7 +178,7 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
             # As disk names and snapshot disk names are the same , only needed
             # snapshots disks are checked
             logger.info(
-                info, "md5sums", self.direction, "disks snapshot", disk_names
+                info, "checksums", self.direction, "disks snapshot", disk_names
             )
             md5sums_before = [
                 self.md5sum_before_transfer(
@@ -188,7 +197,7 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
             ]
 
         elif self.direction == DOWNLOAD:
-            logger.info(info, "md5sums", self.direction, "disks", disk_names)
+            logger.info(info, "checksums", self.direction, "disks", disk_names)
 
             md5sums_before = [
                 self.md5sum_before_transfer(
@@ -205,7 +214,9 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
             ]
 
         else:
-            logger.info(info, "md5sums", self.direction, "disks", image_paths)
+            logger.info(
+                info, "checksums", self.direction, "disks", image_paths
+            )
             md5sums_before = [
                 self.md5sum_before_transfer(image_path=path)
                 for path in image_paths
@@ -223,10 +234,11 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
         disk_object=None, sp_id=None
     ):
         """
-        Compare md5sum before and after image transfer
+        Compare checksum before and after image transfer, checksum of image
+        computed while it was uploaded to the disk is used if any
 
         Args:
-            md5sum_before (str): The md5sum value fo the disk before download
+            md5sum_before (str): The checksum value of the disk before transfer
             output (str): Output path of the downloaded file
             host (host): Host resource object
             storage_type (str): Specific the storage type
@@ -235,22 +247,27 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
 
 
         Raises:
-            AssertionError: if md5sum is not the same before and after the
-                download
+            AssertionError: if checksum is not the same before and after the
+                transfer
         """
         if self.direction == DOWNLOAD:
             md5sum_after = self.md5sum_after_transfer(image_path=output)
         else:
+            md5sum_before = (
+                self.checksums.pop(disk_object.get_id(), None) or
+                md5sum_before
+            )
             md5sum_after = self.md5sum_after_transfer(
                 host, storage_type, disk_object, sp_id
             )
-        logger.info("Comparing md5sum before and after transfer")
+        logger.info("Comparing checksum before and after transfer")
         assert md5sum_before == md5sum_after, (
-            "Md5sum not the same before transfer is: %s and after its: %s" % (
-                md5sum_before, md5sum_after
-            )
+            "Checksum not the same before transfer is: %s and after its: %s"
+            % (md5sum_before, md5sum_after)
+        )
+        logger.info(
+            "Checksum comparison before and after transfer successful"
         )
-        logger.info("Md5sum comparison before and after transfer successful")
 
     def transfer_image(
         self, image_id, image_path=image_path, transfer_size=image_size,
@@ -311,7 +328,7 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
                 assert self.upload_disk(
                     connection, transfer_service, proxy_url,
                     proxy_connection, transfer, image_path=image_path,
-                    transfer_size=transfer_size, pause=pause
+                    transfer_size=transfer_size, pause=pause, image_id=image_id
                 ), "Upload disk %s failed" % image_path
             else:
                 logger.info(
@@ -320,7 +337,7 @@ class StreamingApiHl(ll_streaming_api.StreamingApi):
                 assert not self.upload_disk(
                     connection, transfer_service, proxy_url,
                     proxy_connection, transfer, image_path=image_path,
-                    transfer_size=transfer_size, pause=pause
+                    transfer_size=transfer_size, pause=pause, image_id=image_id
                 ), "Upload disk %s succeeded" % image_path
 
         logger.info("Waiting for disk %s to go back to 'OK' state", image_id)
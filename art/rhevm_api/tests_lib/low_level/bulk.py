@@ -0,0 +1,299 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Bulk actions on many VMs, hosts or disks
+
+Actions are submitted from bounded number of threads, at most rate
+submissions per second, final states of all entities are then waited for by
+shared status watcher of the collection, which polls them by one request per
+sample instead of one request per entity.
+
+Example:
+    results = ll_bulk.run_bulk_action(
+        ll_bulk.VMS, vm_names, ll_bulk.REMOVE, max_workers=8, rate=5
+    )
+    failed = [r.name for r in results.values() if not r.ok]
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from concurrent.futures import ThreadPoolExecutor
+
+from art.core_api.apis_exceptions import EntityNotFound
+from art.rhevm_api.utils.test_utils import get_api
+from art.test_handler.settings import ART_CONFIG
+
+ENUMS = ART_CONFIG['elements_conf']['RHEVM Enums']
+logger = logging.getLogger("art.ll_lib.bulk")
+
+VMS = 'vms'
+HOSTS = 'hosts'
+DISKS = 'disks'
+REMOVE = 'remove'
+MIGRATE = 'migrate'
+
+APIS = {
+    VMS: get_api('vm', 'vms'),
+    HOSTS: get_api('host', 'hosts'),
+    DISKS: get_api('disk', 'disks'),
+}
+
+# final states of entities after action, None for removed entities
+FINAL_STATES = {
+    VMS: {
+        'start': [ENUMS['vm_state_up']],
+        'stop': [ENUMS['vm_state_down']],
+        'shutdown': [ENUMS['vm_state_down']],
+        # up on other host than before, see FINAL_CHECKS
+        MIGRATE: [ENUMS['vm_state_up']],
+        REMOVE: None,
+    },
+    HOSTS: {
+        'activate': [ENUMS['host_state_up']],
+        'deactivate': [ENUMS['host_state_maintenance']],
+        REMOVE: None,
+    },
+    DISKS: {
+        REMOVE: None,
+    },
+}
+
+
+def _host_changed(results):
+    """
+    Check of VMs in final state of migration
+
+    Args:
+        results (dict): BulkResult by VM name
+
+    Returns:
+        callable: Returns True for VM running on other host than before
+    """
+    def check(vm):
+        host = vm.get_host()
+        return host is not None and (
+            host.get_id() != results[vm.get_name()].source_host
+        )
+    return check
+
+
+# checks of entities in final state, made for results of bulk action, VM is
+# up both before and after migration
+FINAL_CHECKS = {
+    VMS: {
+        MIGRATE: _host_changed,
+    },
+}
+
+DEF_MAX_WORKERS = 4
+DEF_RATE = None  # submissions per second, None for no limit
+BULK_TIMEOUT = 600
+BULK_POLL = 10
+QUERY_CHUNK = 50  # names in one search request
+
+
+class BulkResult(object):
+    """
+    Result of bulk action on single entity
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.submitted = False
+        self.done = False
+        self.state = None
+        self.error = None
+        self.submit_time = None
+        self.total_time = None
+        self.source_host = None
+
+    @property
+    def ok(self):
+        """
+        Returns:
+            bool: True if action was submitted and entity reached final state
+        """
+        return self.submitted and self.done
+
+    def __repr__(self):
+        return "<BulkResult %s ok=%s state=%s error=%s time=%s>" % (
+            self.name, self.ok, self.state, self.error, self.total_time
+        )
+
+
+class RateLimiter(object):
+    """
+    Spaces calls of wait, shared by threads
+    """
+
+    def __init__(self, rate=None):
+        """
+        Args:
+            rate (float): Calls per second, None for no limit
+        """
+        self.interval = 1.0 / rate if rate else 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Sleep until next call is allowed
+        """
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def _submit(api, action, result, limiter, action_kwargs):
+    """
+    Run action on entity, worker of run_bulk_action
+    """
+    limiter.wait()
+    start = time.time()
+    try:
+        entity = api.find(result.name)
+        if action == MIGRATE and entity.get_host() is not None:
+            result.source_host = entity.get_host().get_id()
+        if action == REMOVE:
+            status = api.delete(entity, True, **action_kwargs)
+        else:
+            status = api.syncAction(entity, action, True, **action_kwargs)
+    except EntityNotFound as ex:
+        # already removed entity is what remove wants
+        status = action == REMOVE
+        if not status:
+            result.error = ex
+    except Exception as ex:
+        logger.error("Failed to %s %s: %s", action, result.name, ex)
+        status = False
+        result.error = ex
+    result.submit_time = time.time() - start
+    result.submitted = bool(status)
+    if not status and result.error is None:
+        result.error = "Failed to %s %s" % (action, result.name)
+
+
+def _query(api, names):
+    """
+    Search entities by names, QUERY_CHUNK names per request
+
+    Returns:
+        dict: Found entities by name, None if any search failed
+    """
+    found = {}
+    for i in xrange(0, len(names), QUERY_CHUNK):
+        query = ' or '.join(
+            'name="%s"' % name for name in names[i:i + QUERY_CHUNK]
+        )
+        entities = api.query(query, lazy=True)
+        if entities is None:
+            return None
+        for entity in entities:
+            found[entity.get_name()] = entity
+    return found
+
+
+def wait_for_final_states(
+    api, results, states, start, timeout=BULK_TIMEOUT, sleep=BULK_POLL,
+    check=None
+):
+    """
+    Wait until all submitted entities reach final state
+
+    Args:
+        api (GetApi): API of entities collection
+        results (dict): BulkResult by entity name
+        states (list): Final states, None to wait until entities are gone
+        start (float): Time bulk action started at
+        timeout (int): Seconds to wait
+        sleep (int): Maximum seconds between samples
+        check (callable): Returns True for entity in final state which
+            also meets other conditions of the action
+    """
+    pending = [r.name for r in results.itervalues() if r.submitted]
+    if not pending:
+        return
+
+    def reached(name, state):
+        result = results[name]
+        result.state = state
+        result.done = True
+        result.total_time = time.time() - start
+
+    if api.wait_for_statuses(
+        pending, states or [], timeout=timeout, sleep=sleep,
+        missing_ok=states is None, check=check, on_reached=reached
+    ):
+        return
+    failed = [name for name in pending if not results[name].done]
+    found = _query(api, failed) or {}
+    for name in failed:
+        entity = found.get(name)
+        results[name].state = entity.get_status() if entity else None
+
+
+def run_bulk_action(
+    collection, names, action, states=None, max_workers=DEF_MAX_WORKERS,
+    rate=DEF_RATE, timeout=BULK_TIMEOUT, sleep=BULK_POLL, **action_kwargs
+):
+    """
+    Run action on many entities and wait for their final states
+
+    Args:
+        collection (str): VMS, HOSTS or DISKS
+        names (list): Names of entities
+        action (str): REMOVE or action of entity, e.g. start, stop,
+            migrate, deactivate
+        states (list): Final states to wait for, by default from FINAL_STATES
+        max_workers (int): Number of actions submitted concurrently
+        rate (float): Maximum submissions per second, None for no limit
+        timeout (int): Seconds to wait for final states
+        sleep (int): Seconds between samples of states
+        action_kwargs (dict): Parameters of syncAction or delete, actions
+            are asynchronous unless async=False is passed
+
+    Returns:
+        OrderedDict: BulkResult by entity name, in order of names
+
+    Raises:
+        ValueError: If final states of action are not known
+    """
+    api = APIS[collection]
+    if states is None:
+        if action not in FINAL_STATES[collection]:
+            raise ValueError(
+                "Final states of %s %s are unknown" % (collection, action)
+            )
+        states = FINAL_STATES[collection][action]
+    check = FINAL_CHECKS.get(collection, {}).get(action)
+    if action != REMOVE:
+        action_kwargs.setdefault('async', True)
+
+    results = OrderedDict((name, BulkResult(name)) for name in names)
+    limiter = RateLimiter(rate)
+    start = time.time()
+    logger.info("Running %s on %d %s", action, len(results), collection)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for result in results.itervalues():
+            executor.submit(
+                _submit, api, action, result, limiter, action_kwargs
+            )
+    wait_for_final_states(
+        api, results, states, start, timeout, sleep,
+        check=check(results) if check else None
+    )
+
+    failed = [r.name for r in results.itervalues() if not r.ok]
+    logger.info(
+        "%s of %d %s done in %.1f seconds, failed: %s",
+        action, len(results), collection, time.time() - start, failed
+    )
+    return results
@@ -19,16 +19,17 @@
 import logging
 import random
 import shlex
-from art.core_api.apis_exceptions import EntityNotFound, APITimeout
+from art.core_api.apis_exceptions import EntityNotFound
 from art.core_api.apis_utils import data_st, TimeoutingSampler
 from art.rhevm_api.data_struct.data_structures import Disk, Fault
 from art.rhevm_api.tests_lib.low_level.datacenters import get_sd_datacenter
 from art.rhevm_api.tests_lib.low_level.general import (
     prepare_ds_object, generate_logs
 )
+from art.rhevm_api.utils import image_transfer
 from art.rhevm_api.utils.test_utils import get_api, waitUntilGone
 from art.test_handler.settings import ART_CONFIG
-from rrmngmnt.host import Host as HostResource
+from art.rhevm_api.resources.host import Host as HostResource
 from rrmngmnt.user import User
 
 
@@ -39,6 +40,9 @@ ID_ATTR = 'id'
 DEFAULT_DISK_TIMEOUT = 180
 COPY_MOVE_DISK_TIMEOUT = 300
 DEFAULT_SLEEP = 5
+TRANSFER_CHECKSUM = ART_CONFIG['RUN'].get(
+    'transfer_checksum', image_transfer.DEF_CHECKSUM
+)
 
 VM_API = get_api('vm', 'vms')
 CLUSTER_API = get_api('cluster', 'clusters')
@@ -515,43 +519,21 @@ def wait_for_disks_status(disks, key='name', status=ENUMS['disk_state_ok'],
         disks_list = disks
 
     logger.info("Waiting for status %s on disks %s", status, disks_list)
-    sampler = TimeoutingSampler(timeout, sleep, DISKS_API.get, abs_link=False)
-    is_incorrect_state = lambda d, s: (d.get_status() != s)  # flake8: noqa
-    try:
-        for sample in sampler:
-            disks_in_wrong_status = []
-            for disk_obj in sample:
-                if key == 'name':
-                    disk_to_poll = disk_obj.get_name()
-                elif key == 'id':
-                    disk_to_poll = disk_obj.get_id()
-                else:
-                    logger.error("Can't poll with key: {0}".format(key))
-                    break
-
-                if disk_to_poll not in disks_list:
-                    continue
-
-                logger.debug(
-                    "polling on disk: {0} for state: {1}".format(
-                        disk_to_poll, status
-                    )
-                )
-                if is_incorrect_state(disk_obj, status):
-                    disks_in_wrong_status.append(disk_obj)
-
-            if not disks_in_wrong_status:
-                return True
+    if key not in ('name', 'id'):
+        logger.error("Can't poll with key: {0}".format(key))
+        return False
 
-    except APITimeout:
+    if not DISKS_API.wait_for_statuses(
+        disks_list, [status], key=key, timeout=timeout, sleep=sleep,
+        missing_ok=True
+    ):
         logger.error(
             "Timeout when waiting for all the disks {0} in {1} state".format(
                 disks, status
             )
         )
         return False
-
-    return False
+    return True
 
 
 def waitForDisksGone(positive, disksNames, timeout=DEFAULT_DISK_TIMEOUT,
@@ -697,17 +679,16 @@ def checksum_disk(hostname, user, password, disk_object, dc_obj):
     if block:
         host_resource.lvm.lvchange(sd_id, vol_id, activate=True)
 
-    vol_path = host_resource.executor().run_cmd(
-        shlex.split("lvs -o path | grep %s" % vol_id)
-    )[1]
-    checksum = host_resource.executor().run_cmd(
-        shlex.split("md5sum %s" % vol_path)
-    )[1]
-
-    if block:
-        host_resource.lvm.lvchange(sd_id, vol_id, activate=False)
-
-    return checksum
+    try:
+        vol_path = host_resource.executor().run_cmd(
+            shlex.split("lvs -o path | grep %s" % vol_id)
+        )[1]
+        return image_transfer.remote_checksum(
+            host_resource, vol_path.strip(), TRANSFER_CHECKSUM
+        )
+    finally:
+        if block:
+            host_resource.lvm.lvchange(sd_id, vol_id, activate=False)
 
 
 def get_all_disk_permutation(
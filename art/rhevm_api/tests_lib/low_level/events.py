@@ -18,6 +18,7 @@
 # 02110-1301 USA, or see the FSF site: http://www.fsf.org.
 
 import logging
+import threading
 import time
 
 import art.rhevm_api.tests_lib.low_level.hosts as ll_hosts
@@ -36,6 +37,15 @@ DEF_TIMEOUT = 120
 DEF_SLEEP = 5
 SAMPLER_TIMEOUT = 210
 MAX_EVENTS = 100
+TAIL_SLEEP = 1
+
+# event codes which mark that vm reached the state
+VM_STATE_EVENT_CODES = {
+    'up': [32],  # USER_RUN_VM
+    'down': [33, 61],  # USER_STOP_VM, VM_DOWN
+}
+# event codes which mark that snapshot creation finished
+SNAPSHOT_EVENT_CODES = [68, 69]
 
 
 def get_max_event_id(query="", max_events=MAX_EVENTS):
@@ -311,3 +321,191 @@ def get_all_events_by_event_code(code, max_events=MAX_EVENTS):
     query = "type={0}".format(code)
     logger.info("Get all events with code %s", code)
     return ll_hosts.EVENT_API.query(constraint=query, max=max_events)
+
+
+class EventWaiter(object):
+    """
+    Predicate registered in EventsTail, set when matching event arrives
+    """
+
+    def __init__(self, predicate):
+        """
+        Args:
+            predicate (callable): Returns True for event the waiter waits for
+        """
+        self.predicate = predicate
+        self.matched = threading.Event()
+        self.event = None
+
+    def check(self, event):
+        """
+        Set the waiter if event matches its predicate
+
+        Args:
+            event (Event): New event
+        """
+        try:
+            matches = self.predicate(event)
+        except (AttributeError, TypeError, ValueError):
+            matches = False
+        if matches:
+            self.event = event
+            self.matched.set()
+
+    def wait(self, timeout):
+        """
+        Wait for matching event
+
+        Args:
+            timeout (float): Maximum time to wait in seconds
+
+        Returns:
+            bool: True if matching event arrived, False otherwise
+        """
+        matched = self.matched.wait(timeout)
+        self.matched.clear()
+        return matched
+
+
+class EventsTail(object):
+    """
+    One background reader which tails new engine events via 'from=<id>'
+    queries while there are registered waiters, and wakes up every waiter
+    whose predicate matches a new event
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, sleep=TAIL_SLEEP, max_events=MAX_EVENTS):
+        """
+        Args:
+            sleep (float): Interval between the poll requests in seconds
+            max_events (int): Max number of events to get from query
+        """
+        self.sleep = sleep
+        self.max_events = max_events
+        self.last_id = None
+        self._waiters = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def get(cls):
+        """
+        Get events tail shared by all waiters
+
+        Returns:
+            EventsTail: Shared events tail
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def register(self, predicate):
+        """
+        Register predicate for events newer than the last event at time
+        of registration
+
+        Args:
+            predicate (callable): Returns True for event to wait for
+
+        Returns:
+            EventWaiter: Waiter to wait on
+        """
+        waiter = EventWaiter(predicate)
+        with self._lock:
+            if self._thread is None:
+                if self.last_id is None:
+                    self.last_id = get_max_event_id(max_events=1) or 0
+                self._thread = threading.Thread(
+                    target=self._run, name="events_tail"
+                )
+                self._thread.daemon = True
+                self._thread.start()
+            self._waiters.append(waiter)
+        return waiter
+
+    def unregister(self, waiter):
+        """
+        Remove waiter
+
+        Args:
+            waiter (EventWaiter): Registered waiter
+        """
+        with self._lock:
+            self._waiters.remove(waiter)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._waiters:
+                    self._thread = None
+                    return
+                waiters = list(self._waiters)
+
+            try:
+                events = util.query(
+                    "", event_id=str(self.last_id), max=self.max_events
+                ) or []
+            except Exception as ex:
+                logger.warning("Failed to read new events: %s", ex)
+                events = []
+
+            for event in sorted(events, key=lambda e: int(e.get_id())):
+                self.last_id = max(self.last_id, int(event.get_id()))
+                for waiter in waiters:
+                    waiter.check(event)
+            time.sleep(self.sleep)
+
+
+def wait_with_events(check, predicate, timeout=DEF_TIMEOUT, sleep=DEF_SLEEP):
+    """
+    Wait until check passes, check right after an event matching predicate
+    arrives, otherwise every sleep seconds
+
+    Args:
+        check (callable): Returns True when the awaited state is reached
+        predicate (callable): Returns True for event signalling the state
+            change
+        timeout (int): Maximum time to wait in seconds
+        sleep (int): Maximum interval between checks in seconds
+
+    Returns:
+        bool: True if check passed in given timeout, False otherwise
+    """
+    tail = EventsTail.get()
+    # register first, so event arriving during the check is not missed
+    waiter = tail.register(predicate)
+    deadline = time.time() + timeout
+    try:
+        while not check():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            if waiter.wait(min(sleep, remaining)):
+                logger.info(
+                    "Event [%s] %s arrived", waiter.event.get_id(),
+                    waiter.event.get_description()
+                )
+        return True
+    finally:
+        tail.unregister(waiter)
+
+
+def event_predicate(codes, content):
+    """
+    Build predicate matching events by code and description content
+
+    Args:
+        codes (list): Event codes
+        content (str): Content of event description
+
+    Returns:
+        callable: Predicate on Event object
+    """
+    return lambda event: (
+        int(event.get_code()) in codes and
+        content in (event.get_description() or '')
+    )
@@ -218,17 +218,18 @@ def checkResponsesAreXsdValid():
             False otherwise
     '''
     ret = True
-    try:
-        for error in util.xsd_schema_errors:
-            href, ret, ex = error
-            util.logger.error(
-                "Response href: %s, status %d is not valid against xsd schema"
-                % (href, ret['status']))
-            util.logger.error("Response body: %s" % ret['body'])
-            util.logger.error("Exception is: %s" % ex)
-            ret = False
-    except AttributeError:
-        pass
+    xsd_validator = getattr(util, 'xsd_validator', None)
+    if xsd_validator is None:
+        return ret
+    for error in xsd_validator.errors():
+        util.logger.error(
+            "Responses of %s are not valid against xsd schema (%d times), "
+            "example href: %s, status %d", error.template, error.count,
+            error.href, error.status
+        )
+        util.logger.error("Response body: %s", error.body)
+        util.logger.error("Exception is: %s", error.message)
+        ret = False
 
     return ret
 
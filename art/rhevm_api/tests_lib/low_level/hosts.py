@@ -213,41 +213,17 @@ def wait_for_hosts_states(
         list_names = names[:]
 
     [get_host_object(host_name=host) for host in list_names]
-    number_of_hosts = len(list_names)
+    if isinstance(states, basestring):
+        states = states.replace(',', ' ').split()
 
-    sampler = TimeoutingSampler(timeout, sleep_, HOST_API.get, abs_link=False)
-
-    try:
-        for sample in sampler:
-            ok = 0
-            for host in sample:
-                if host.name in names:
-                    logger.info(
-                        "Check if host %s has state %s", host.name, states
-                    )
-                    if host.get_status() in stop_states:
-                        logger.error(
-                            "Host %s state: %s", host.name, host.get_status()
-                        )
-                        return False
-
-                    elif host.get_status() in states:
-                        logger.info(
-                            "Host %s has state %s", host.name, states
-                        )
-                        ok += 1
-
-                    if ok == number_of_hosts:
-                        return True
-
-                    else:
-                        logger.warning("Host status is: %s", host.get_status())
-
-    except APITimeout:
+    if not HOST_API.wait_for_statuses(
+        list_names, states, timeout=timeout, stop=stop_states, sleep=sleep_
+    ):
         logger.error(
             "Timeout waiting for hosts (%s) in state %s", names, states
         )
         return False
+    return True
 
 
 @ll_general.generate_logs()
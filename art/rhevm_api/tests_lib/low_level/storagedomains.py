@@ -17,7 +17,7 @@
 # Software Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
 # 02110-1301 USA, or see the FSF site: http://www.fsf.org.
 
-from rrmngmnt.host import Host as HostResource
+from art.rhevm_api.resources.host import Host as HostResource
 from rrmngmnt.user import User
 from utilities import sshConnection, machine
 from utilities.utils import getIpAddressByHostName
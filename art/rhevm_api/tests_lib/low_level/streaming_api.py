@@ -19,6 +19,7 @@
 from art.rhevm_api.tests_lib.low_level import (
     disks as ll_disks,
 )
+from art.rhevm_api.utils import image_transfer
 from art.test_handler.settings import ART_CONFIG, GE
 import ovirtsdk4 as sdk
 import ovirtsdk4.types as types
@@ -55,8 +56,8 @@ UPLOAD_FILES_LOCALHOST = [
     os.path.expanduser(UPLOAD_DIR_PATH + 'test_raw_to_delete')
 
 ]
-MD5SUM_BLOCK_IMAGE_PATH = 'md5sum /dev/%s/%s'
-MD5SUM_FILE_IMAGE_PATH = 'md5sum /rhev/data-center/%s/%s/images/%s/%s'
+BLOCK_IMAGE_PATH = '/dev/%s/%s'
+FILE_IMAGE_PATH = '/rhev/data-center/%s/%s/images/%s/%s'
 DISK_SPACE_CMD = 'df -B1 %s'
 LV_CHANGE_CMD = 'lvchange -a %s %s/%s'
 HOST_IMAGE_FILE_SIZE_CMD = 'ls -l /rhev/data-center/%s/%s/images/%s/%s'
@@ -68,6 +69,10 @@ COW_FORMAT = 'cow'
 STATE_TIMEOUT = 60
 PAUSE_SLEEP = 60
 PAUSE_TRANSFER_PER = 50.00
+TRANSFER_CONNECTIONS = image_transfer.DEF_CONNECTIONS
+TRANSFER_CHECKSUM = ART_CONFIG['RUN'].get(
+    'transfer_checksum', image_transfer.DEF_CHECKSUM
+)
 PAUSED_USER = types.ImageTransferPhase.PAUSED_USER
 RESUMING = types.ImageTransferPhase.RESUMING
 
@@ -92,6 +97,10 @@ class StreamingApi(object):
         self._image_path = image_path
         self._image_size = image_size
         self._direction = direction
+        # checksums of transferred images computed while they streamed, by
+        # path of downloaded image or by id of disk the image was uploaded to
+        # (by path of uploaded image if id is not known)
+        self.checksums = {}
 
     @property
     def image_path(self):
@@ -240,40 +249,31 @@ class StreamingApi(object):
         )
 
     @staticmethod
-    def md5sum_on_localhost(image_path=image_path):
+    def checksum_on_localhost(image_path=image_path):
         """
-        Returns the md5sum of a specific disk before/after transfer
+        Returns the checksum of a specific disk before/after transfer, see
+        image_transfer.TreeHash
 
         Args:
             image_path (str): The path of image on the local host before
                 upload/ after download
 
         Returns:
-            str: The md5sum of a specific disk image before upload/ after
+            str: The checksum of a specific disk image before upload/ after
                 download
-
-        Raises:
-            AssertionError: If md5sum command on local host fails
         """
-        cmd = shlex.split('md5sum ' + image_path)
-        out, err = Popen(
-            cmd, stdout=PIPE, stderr=PIPE
-        ).communicate()
-        assert not err, (
-            "Error %s occurred when trying to execute the command %s" % (
-                err, cmd
-            )
-        )
-        logger.info("Md5sum is: %s", shlex.split(out)[0])
+        checksum = image_transfer.file_checksum(image_path, TRANSFER_CHECKSUM)
+        logger.info("Checksum is: %s", checksum)
 
-        return shlex.split(out)[0]
+        return checksum
 
     @staticmethod
-    def md5sum_on_vdsm_host(
+    def checksum_on_vdsm_host(
         host, storage_type=None, disk_object=None, sp_id=None
     ):
         """
-        Returns the md5sum of a specific disk image on VDSM host
+        Returns the checksum of a specific disk image on VDSM host, see
+        image_transfer.remote_checksum
 
         Args:
             host (host): Host resource object
@@ -282,10 +282,11 @@ class StreamingApi(object):
             sp_id (str): Storage pool id (only needed for File)
 
         Returns:
-            str: The md5sum of a specific disk image before download
+            str: The checksum of a specific disk image before download
 
         Raises:
             AssertionError: If any of the commands fails
+            TransferError: If checksum of the image fails
         """
         image_id = disk_object.get_image_id()
         sd_id = (
@@ -294,7 +295,7 @@ class StreamingApi(object):
 
         if storage_type in [STORAGE_TYPE_ISCSI, STORAGE_TYPE_FCP]:
             logger.info(
-                "Activating the disk image before md5sum"
+                "Activating the disk image before checksum"
             )
             assert host.lvm.pvscan(), (
                 "Unable to refresh the physical volumes on host '%s'" % (
@@ -304,26 +305,60 @@ class StreamingApi(object):
             assert host.lvm.lvchange(sd_id, image_id, activate=True), (
                 "Unable to activate the disk LV"
             )
-            rc, output, error = host.run_command(
-                shlex.split(MD5SUM_BLOCK_IMAGE_PATH % (sd_id, image_id))
-            )
-            assert not rc, "Md5sum command failed %s" % error
-            assert host.lvm.lvchange(sd_id, image_id, activate=False), (
-                "Unable to deactivate the disk LV %s" % image_id
-            )
+            path = BLOCK_IMAGE_PATH % (sd_id, image_id)
+            try:
+                checksum = image_transfer.remote_checksum(
+                    host, path, TRANSFER_CHECKSUM
+                )
+            finally:
+                assert host.lvm.lvchange(sd_id, image_id, activate=False), (
+                    "Unable to deactivate the disk LV %s" % image_id
+                )
 
         else:
-            cmd = shlex.split(
-                MD5SUM_FILE_IMAGE_PATH % (
-                    sp_id, sd_id, disk_object.get_id(), image_id
-                )
+            path = FILE_IMAGE_PATH % (
+                sp_id, sd_id, disk_object.get_id(), image_id
             )
-            rc, output, error = host.run_command(cmd)
-            assert not rc, "Md5sum command %s failed %s" % (cmd, error)
+            checksum = image_transfer.remote_checksum(
+                host, path, TRANSFER_CHECKSUM
+            )
+
+        logger.info("Checksum is: %s", checksum)
+
+        return checksum
+
+    @staticmethod
+    def get_proxy_connection(proxy_url):
+        """
+        Returns the proxy_connection connection object which create a new
+            HTTPS connection to the proxy server
+
+        At this stage, the SDK granted the permission to start
+        transferring the disk, and the user should choose its preferred
+        tool for doing it - regardless of the SDK.
+        In this example, we will use Python's httplib.HTTPSConnection
+        for transferring the data.
 
-        logger.info("Md5sum is: %s", shlex.split(output)[0])
+        Args:
+            proxy_url (str): The address of a proxy server to the image
+
+         Returns:
+            HTTPConnection: returns a new HTTPS connection object
+              to the proxy server
+        """
+
+        context = ssl.create_default_context()
 
-        return shlex.split(output)[0]
+        # Note that ovirt-imageio-proxy by default checks the certificates,
+        #  so if you don't have your CA certificate of the engine in the
+        # system, you need to pass it to HTTPSConnection.
+        context.load_verify_locations(cafile=CA_FILE_PATH)
+
+        return HTTPSConnection(
+            proxy_url.hostname,
+            proxy_url.port,
+            context=context,
+        )
 
     def prepare_for_transfer(self, image_id=None, snapshot=False):
         """
@@ -461,38 +496,6 @@ class StreamingApi(object):
 
             return transfer_service
 
-        def get_proxy_connection(proxy_url):
-            """
-            Returns the proxy_connection connection object which create a new
-                HTTPS connection to the proxy server
-
-            At this stage, the SDK granted the permission to start
-            transferring the disk, and the user should choose its preferred
-            tool for doing it - regardless of the SDK.
-            In this example, we will use Python's httplib.HTTPSConnection
-            for transferring the data.
-
-            Args:
-                proxy_url (str): The address of a proxy server to the image
-
-             Returns:
-                HTTPConnection: returns a new HTTPS connection object
-                  to the proxy server
-            """
-
-            context = ssl.create_default_context()
-
-            # Note that ovirt-imageio-proxy by default checks the certificates,
-            #  so if you don't have your CA certificate of the engine in the
-            # system, you need to pass it to HTTPSConnection.
-            context.load_verify_locations(cafile=CA_FILE_PATH)
-
-            return HTTPSConnection(
-                proxy_url.hostname,
-                proxy_url.port,
-                context=context,
-            )
-
         # Create a connection to the server:
         connection = get_connection()
         prepare_transfer_args.append(connection)
@@ -528,7 +531,7 @@ class StreamingApi(object):
         prepare_transfer_args.append(transfer_headers)
         proxy_url = urlparse(transfer.proxy_url)
         prepare_transfer_args.append(proxy_url)
-        proxy_connection = get_proxy_connection(proxy_url)
+        proxy_connection = self.get_proxy_connection(proxy_url)
         prepare_transfer_args.append(proxy_connection)
         prepare_transfer_args.append(transfer)
 
@@ -618,6 +621,19 @@ class StreamingApi(object):
         logger.info("Sleeping for 1min on image %s", image_indicator)
         sleep(PAUSE_SLEEP)
 
+    def pause_and_resume(self, transfer_service, image_indicator=None):
+        """
+        Pause transfer, sleep and resume it
+
+        Args:
+            transfer_service (Service): Get a reference to the service that
+                manages the image transfer that was added in the previous
+            image_indicator (str): For download its the id of the disk image,
+                for upload its the image location on the local host
+        """
+        self.pause(transfer_service, image_indicator=image_indicator)
+        self.resume(transfer_service, image_indicator=image_indicator)
+
     def download_disk(
         self, connection=None, transfer_service=None, transfer_headers=None,
         proxy_url=None, proxy_connection=None, image_path=None,
@@ -625,7 +641,8 @@ class StreamingApi(object):
         vm_name=None, disk_name=None
     ):
         """
-        Download disk from VDSM host to localhost running the test
+        Download disk from VDSM host to localhost running the test, ranges of
+        the image are downloaded concurrently, see image_transfer
 
         Args:
 
@@ -636,7 +653,7 @@ class StreamingApi(object):
             transfer_headers(dict): Set needed headers for transfer disk image
             proxy_url (str): The address of a proxy server to the image
             proxy_connection(HTTPConnection): Create new HTTPS connection to
-                the proxy server
+                the proxy server, closed, the transfer opens its own
             image_path (str): Image location before transfer on localhost
             transfer_size (int): Actual size of the transferred image in bytes
             image_id (str): Id of the disk image
@@ -649,72 +666,41 @@ class StreamingApi(object):
          Returns:
             bool: True if download succeeded False if failed
         """
-        status = True
-
         try:
-            path = image_path
-
-            with open(path, "wb") as mydisk:
-                size = transfer_size
-                logger.info("Provisioned size: %s", size)
-                chunk_size = 64 * 1024 * 1024
-                pos = 0
-                while pos < size:
-                    completed_transfer_per = pos / float(size) * 100
-                    # Extend the transfer session.
-                    transfer_service.extend()
-                    # Set the range, according to the downloaded chunk .
-                    transfer_headers['Range'] = 'bytes=%d-%d' % (
-                        pos, min(size, pos + chunk_size) - 1
+            # Ranges are downloaded over connections of the transfer
+            proxy_connection.close()
+            logger.info("Provisioned size: %s", transfer_size)
+            transfer = image_transfer.ImageTransfer(
+                lambda: self.get_proxy_connection(proxy_url), proxy_url.path,
+                transfer_headers, DOWNLOAD, image_path, transfer_size,
+                connections=TRANSFER_CONNECTIONS,
+                extend=transfer_service.extend, checksum=TRANSFER_CHECKSUM
+            )
+            if pause:
+                transfer.at_percent(
+                    PAUSE_TRANSFER_PER, lambda: self.pause_and_resume(
+                        transfer_service, image_indicator=image_id
                     )
-                    # Perform the request.
-                    proxy_connection.request(
-                        'GET',
-                        proxy_url.path,
-                        headers=transfer_headers,
+                )
+            if interrupt:
+                def attach_disk():
+                    logger.info(
+                        "Start additonal action during transfer on disk %s",
+                        disk_name
                     )
-                    # Get response
-                    r = proxy_connection.getresponse()
-
-                    # Check the response status:
-                    if r.status >= 300:
-                        logger.info("Error: %s", r.read())
-                        status = False
-                        break
-
-                    # Write the content to file:
-                    mydisk.write(r.read())
-                    logger.info("Completed: %s%% on disk id %s", int(
-                        completed_transfer_per), image_id)
-
-                    if pause and completed_transfer_per == PAUSE_TRANSFER_PER:
-                        self.pause(
-                            transfer_service, pos=pos, size=size,
-                            image_indicator=image_id
-                        )
-                        self.resume(transfer_service, image_indicator=image_id)
-
-                    if interrupt:
-                        if int(completed_transfer_per) == 50:
-                            logger.info(
-                                "Start additonal action during transfer on "
-                                "disk %s", disk_name
-                            )
-                            logger.info(
-                                "Attaching disk %s to vm %s", disk_name,
-                                vm_name
-                            )
-                            assert ll_disks.attachDisk(
-                                positive=False, alias=disk_name,
-                                vm_name=vm_name
-                            ), (
-                                "Succeeded to attach disk %s to vm %s during "
-                                "download , attach should fail"
-                                % (disk_name, vm_name)
-                            )
-
-                    # Continue to next chunk.
-                    pos += chunk_size
+                    logger.info(
+                        "Attaching disk %s to vm %s", disk_name, vm_name
+                    )
+                    assert ll_disks.attachDisk(
+                        positive=False, alias=disk_name, vm_name=vm_name
+                    ), (
+                        "Succeeded to attach disk %s to vm %s during "
+                        "download , attach should fail" % (disk_name, vm_name)
+                    )
+                transfer.at_percent(50, attach_disk)
+            status = transfer.run()
+            if status:
+                self.checksums[image_path] = transfer.checksum
 
         finally:
             # Finalize the session.
@@ -820,10 +806,11 @@ class StreamingApi(object):
     def upload_disk(
         self, connection=None, transfer_service=None, proxy_url=None,
         proxy_connection=None, transfer=None, image_path=None,
-        transfer_size=None, pause=False
+        transfer_size=None, pause=False, image_id=None
     ):
         """
-        Upload disk from localhost to a VDSM host
+        Upload disk from localhost to a VDSM host, ranges of the image are
+        uploaded concurrently, see image_transfer
 
         Args:
 
@@ -833,7 +820,7 @@ class StreamingApi(object):
                 manages the image transfer that was added in the previous
             proxy_url (str): The address of a proxy server to the image
             proxy_connection (HTTPConnection): Create new HTTPS connection to
-                the proxy server
+                the proxy server, closed, the transfer opens its own
             transfer (Service) : Create a transfer by using
                 <<services/image_transfers/methods/add, add>> of the
                 <<services/image_transfers>> service, stating the image
@@ -841,93 +828,35 @@ class StreamingApi(object):
             image_path (str): Image location before transfer on localhost
             transfer_size (int): Actual size of the transferred image in bytes
             pause (bool): True performing pause during transfer,False otherwise
+            image_id (str): Id of the disk, checksum of uploaded image is
+                kept in checksums under it
 
          Returns:
             bool: True if upload succeeded False if failed
 
         """
-        size = transfer_size
-        path = image_path
-        start = last_progress = last_extend = time.time()
-        status = True
-
-        # This seems to give the best throughput when uploading
-        # SSD to a server that drop the data.
-        # You may need to tune this on your setup.
-        buf_size = 128 * 1024
-
-        # Send the request head. Note the following:
-        # - We must send the Authorzation header with the signed
-        # ticket received from the transfer service.
-        # - the server requires Content-Range header even when
-        # sending the entire file.
-        # - the server requires also Content-Length.
-
-        proxy_connection.putrequest("PUT", proxy_url.path)
-        proxy_connection.putheader(
-            'Authorization', transfer.signed_ticket
+        # Ranges are uploaded over connections of the transfer
+        proxy_connection.close()
+        upload = image_transfer.ImageTransfer(
+            lambda: self.get_proxy_connection(proxy_url), proxy_url.path,
+            {'Authorization': transfer.signed_ticket}, UPLOAD, image_path,
+            transfer_size, connections=TRANSFER_CONNECTIONS,
+            extend=transfer_service.extend, checksum=TRANSFER_CHECKSUM
         )
-        proxy_connection.putheader(
-            'Content-Range', "bytes %d-%d/%d" % (
-                0, size - 1, size)
-        )
-        proxy_connection.putheader('Content-Length',
-                                   "%d" % (size,))
-        proxy_connection.endheaders()
-
-        with open(path, "rb") as disk:
-            pos = 0
-
-            while pos < size:
-                completed_transfer_per = pos / float(size) * 100
-                # Extend the transfer session once per minute.
-                now = time.time()
-
-                # Report progress every 10 seconds
-                if now - last_progress > 10:
-                    logger.info(
-                        "Uploaded %.2f%%" % completed_transfer_per
-                    )
-                    last_progress = now
-
-                # Extend the transfer session once per minute.
-                if now - last_extend > 60:
-                    transfer_service.extend()
-                    last_extend = now
-
-                to_read = min(size - pos, buf_size)
-                chunk = disk.read(to_read)
-                if not chunk:
-                    transfer_service.pause()
-                    logger.error("Unexpected end of file at pos=%d" % pos)
-                    return False
-
-                proxy_connection.send(chunk)
-                pos += len(chunk)
-
-                if pause and completed_transfer_per == PAUSE_TRANSFER_PER:
-                    self.pause(
-                        transfer_service, pos=pos, size=size,
-                        image_indicator=image_path
-                    )
-                    self.resume(transfer_service, image_indicator=image_path)
-
-        # Get the response
-        response = proxy_connection.getresponse()
-        if response.status != 200:
-            status = False
-            transfer_service.pause()
-            logger.error(
-                "Upload failed: %s %s" % (response.status, response.reason)
+        if pause:
+            upload.at_percent(
+                PAUSE_TRANSFER_PER, lambda: self.pause_and_resume(
+                    transfer_service, image_indicator=image_path
+                )
             )
+        status = upload.run()
+        if status:
+            self.checksums[image_id or image_path] = upload.checksum
+        else:
+            transfer_service.pause()
+            logger.error("Upload failed: %s", upload.error)
 
         # Successful cleanup
         transfer_service.finalize()
         connection.close()
-
-        elapsed = time.time() - start
-        logger.info(
-            "Uploaded %.2fg in %.2f seconds %.2fm/s",
-            size / float(1024 ** 3), elapsed, size / 1024 ** 2 / elapsed
-        )
         return status
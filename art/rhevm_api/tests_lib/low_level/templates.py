@@ -1056,29 +1056,18 @@ def waitForTemplatesStates(names, state=ENUMS['template_state_ok'],
         * states - Desired state for all given templates
     Author: jlibosva
     """
-    def get_pending_templates(template_names, state):
-        """
-        Gets templates that doesn't fit the desired state
-        Parameters:
-        * template_names - list of templates' names
-        * state - desired state
-        """
-        templates = [TEMPLATE_API.find(name) for name in template_names]
-        return [templ for templ in templates if
-                (templ.get_status() != state)]
-
     if not isinstance(names, list):
         names = names.replace(',', ' ').split()
-    else:
-        names = names
-    sampler = TimeoutingSampler(
-        timeout, sleep, get_pending_templates, names, state)
-    for bad_templates in sampler:
-        if not bad_templates:
-            return True
+    for name in names:
+        TEMPLATE_API.find(name)
+
+    if TEMPLATE_API.wait_for_statuses(
+        names, [state], timeout=timeout, sleep=sleep
+    ):
+        return True
     raise exceptions.TemplateException(
         "Timeout: Templates %s haven't reached state %s after %s seconds" %
-        (bad_templates, state, timeout))
+        (names, state, timeout))
 
 
 def wait_for_template_disks_state(template, state=ENUMS['disk_state_ok'],
@@ -19,16 +19,17 @@
 import logging
 import os
 import re
-from Queue import Queue
-from threading import Thread
 
 from concurrent.futures import ThreadPoolExecutor
 from art.rhevm_api.utils.jobs import Job, JobsSet
 from utilities.machine import Machine, LINUX
 
+import art.rhevm_api.tests_lib.low_level.bulk as ll_bulk
 import art.rhevm_api.tests_lib.low_level.general as ll_general
 from art.core_api.apis_exceptions import (APITimeout, EntityNotFound)
-from art.core_api.apis_utils import data_st, TimeoutingSampler, getDS
+from art.core_api.apis_utils import (
+    data_st, getDS, DEF_TIMEOUT, TimeoutingSampler,
+)
 from art.rhevm_api import resources
 from art.rhevm_api.tests_lib.low_level.disks import (
     _prepareDiskObject, getVmDisk, getObjDisks, get_other_storage_domain,
@@ -851,34 +852,6 @@ def removeVm(positive, vm, **kwargs):
     return status
 
 
-def removeVmAsynch(positive, tasksQ, resultsQ, stopVmBool=False):
-    '''
-    Removes the cluster. It's supposed to be a worker of Thread.
-    Author: jhenner
-    Parameters:
-        * tasksQ - A input Queue of VM names to remove
-        * resultsQ - A output Queue of tuples tuple(VM name, VM removal status)
-        * stopVm - if True will attempt to stop VM before actually remove it
-                   (False by default)
-    '''
-    vm = tasksQ.get(True)
-    status = False
-    try:
-        vmObj = VM_API.find(vm)
-        if stopVmBool and vmObj.get_status() != 'down':
-            if not stopVm(positive, vm):
-                logger.error("failed to stop vm %s before async removal", vm)
-                return
-
-        status = VM_API.delete(vmObj, positive)
-    except EntityNotFound as e:
-        logger.warn(str(e))
-        status = True
-    finally:
-        resultsQ.put((vm, status))
-        tasksQ.task_done()
-
-
 def removeVms(positive, vms, stop='false', timeout=180):
     '''
     Removes the VMs specified by `vms` commas separated list of VM names.
@@ -886,12 +859,9 @@ def removeVms(positive, vms, stop='false', timeout=180):
     Parameters:
         * vms - a list or a string list separated by comma of vms
         * stop - will attempt to stop VMs if 'true' ('false' by default)
-        * timeout -in secs, used for waitForVmsGone
+        * timeout -in secs, to wait for VMs to be gone
     '''
     assert positive
-    tasksQ = Queue()
-    resultsQ = Queue()
-    threads = set()
     if isinstance(vms, basestring):
         # 'vm1, vm2' -> [vm1, vm2]
         vmsList = vms.replace(',', ' ').split()
@@ -903,30 +873,17 @@ def removeVms(positive, vms, stop='false', timeout=180):
     if str(stop).lower() == 'true':
         stop_vms(vmsList)
 
-    for i in vmsList:
-        t = Thread(target=removeVmAsynch, name='VM removing',
-                   args=(positive, tasksQ, resultsQ))
-        threads.add(t)
-        t.daemon = False
-        t.start()
-
-    for vm in vmsList:
-        tasksQ.put(vm)
-
-    tasksQ.join()  # block until all tasks are done
-    logger.info(threads)
-    for t in threads:
-        t.join()
-
+    results = ll_bulk.run_bulk_action(
+        ll_bulk.VMS, vmsList, ll_bulk.REMOVE, timeout=timeout
+    )
     status = True
-    while not resultsQ.empty():
-        vm, removalOK = resultsQ.get()
-        if removalOK:
+    for vm, result in results.iteritems():
+        if result.ok:
             logger.info("VM '%s' deleted asynchronously." % vm)
         else:
             logger.error("Failed to asynchronously remove VM '%s'." % vm)
-        status = status and removalOK
-    return waitForVmsGone(positive, vmsList, timeout=timeout) and status
+        status = status and result.ok
+    return status
 
 
 def waitForVmsGone(positive, vms, timeout=60, samplingPeriod=10):
@@ -953,6 +910,8 @@ def waitForVmsStates(positive, names, states=ENUMS['vm_state_up'], *args,
         * names - List or comma separated string of VM's names with
                   status to wait for.
         * states - A state of the vms to wait for.
+        * timeout - Maximal number of seconds to wait.
+        * sleep - Maximal sampling period.
     Author: jhenner
     Return True if all events passed, otherwise False
     '''
@@ -961,10 +920,10 @@ def waitForVmsStates(positive, names, states=ENUMS['vm_state_up'], *args,
     for vm in names:
         VM_API.find(vm)
 
-    for vm in names:
-        if not waitForVMState(vm, states):
-            return False
-    return True
+    return VM_API.wait_for_statuses(
+        names, states.split(), timeout=kwargs.get('timeout', DEF_TIMEOUT),
+        sleep=kwargs.get('sleep', DEF_SLEEP)
+    )
 
 
 def waitForVMState(vm, state='up', **kwargs):
@@ -985,7 +944,18 @@ def waitForVMState(vm, state='up', **kwargs):
     query = "name={0} and status={1}".format(
         vm, state.lower().replace('_', ''))
 
-    return VM_API.waitForQuery(query, **kwargs)
+    import art.rhevm_api.tests_lib.low_level.events as ll_events
+    codes = ll_events.VM_STATE_EVENT_CODES.get(state.lower())
+    if not codes or set(kwargs) - set(['timeout', 'sleep']):
+        return VM_API.waitForQuery(query, **kwargs)
+
+    # wake up right when the engine reports the vm reached the state
+    return ll_events.wait_with_events(
+        check=lambda: bool(VM_API.query(query)),
+        predicate=ll_events.event_predicate(codes, vm),
+        timeout=kwargs.get('timeout', DEF_TIMEOUT),
+        sleep=kwargs.get('sleep', DEF_SLEEP)
+    )
 
 
 @ll_general.generate_logs()
@@ -3502,12 +3472,29 @@ def wait_for_vm_snapshots(
         "states: %s", snapshots, vm_name, states
     )
 
-    for sample in TimeoutingSampler(
-        timeout, sleep, _get_unsatisfying_snapshots, states,
-        snapshots_description
+    if ENUMS['snapshot_state_ok'] not in states:
+        for sample in TimeoutingSampler(
+            timeout, sleep, _get_unsatisfying_snapshots, states,
+            snapshots_description
+        ):
+            if not sample:
+                return
+
+    # wake up right when the engine reports the snapshot creation finished
+    import art.rhevm_api.tests_lib.low_level.events as ll_events
+    if not ll_events.wait_with_events(
+        check=lambda: not _get_unsatisfying_snapshots(
+            states, snapshots_description
+        ),
+        predicate=ll_events.event_predicate(
+            ll_events.SNAPSHOT_EVENT_CODES, vm_name
+        ),
+        timeout=timeout, sleep=sleep
     ):
-        if not sample:
-            return
+        raise APITimeout(
+            "Timeout when waiting for snapshots %s of vm %s to be in one of "
+            "states: %s" % (snapshots, vm_name, states)
+        )
 
 
 def collect_vm_logs(vm_name, root_passwd='qum5net'):
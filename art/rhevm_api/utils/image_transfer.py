@@ -0,0 +1,929 @@
+"""
+Image transfer through ovirt-imageio proxy over concurrent connections
+
+Image is split to ranges of range_size bytes transferred by workers, each
+over its own keep-alive connection to the proxy and with buffer of buf_size
+bytes, downloaded data is written to local image at offset of its range.
+Completed ranges are recorded in state file next to local image, so run()
+repeated after failure transfers only the missing ranges of the same ticket.
+
+Transfers are sparse: holes of local image (SEEK_DATA/SEEK_HOLE) are
+uploaded as zero requests and zero extents of remote image are not
+downloaded, if the proxy supports them, downloaded blocks of zeros are not
+written, so local image stays sparse. Zero requests don't flush if the
+proxy can flush separately, the upload is flushed once all ranges are sent.
+
+Transferred data is checksummed while it streams: every block of
+checksum_block_size bytes is hashed by the worker transferring it and the
+checksum is the hash of block digests in order of blocks (TreeHash).
+remote_checksum hashes image on host by the same block tree, so transfer is
+verified by comparing digests without reading the local image again.
+
+Example:
+    transfer = ImageTransfer(
+        connect, proxy_url.path, {'Authorization': ticket}, DOWNLOAD,
+        '/var/tmp/disk.img', size, extend=transfer_service.extend
+    )
+    transfer.at_percent(50, pause_and_resume)
+    if not transfer.run():
+        logger.error("Transfer failed: %s", transfer.error)
+"""
+
+import bisect
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import httplib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("art.image_transfer")
+
+DOWNLOAD = 'download'
+UPLOAD = 'upload'
+MiB = 1024 ** 2
+DEF_CONNECTIONS = 4
+DEF_RANGE_SIZE = 16 * MiB
+DEF_BUF_SIZE = 128 * 1024
+RANGE_RETRIES = 2  # attempts to transfer range again after connection error
+PROGRESS_INTERVAL = 10
+EXTEND_INTERVAL = 60
+WAIT_POLL = 1
+STATE_SUFFIX = '.transfer'
+SEEK_DATA = 3
+SEEK_HOLE = 4
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+ZERO_FEATURE = 'zero'
+EXTENTS_FEATURE = 'extents'
+FLUSH_FEATURE = 'flush'
+DEF_CHECKSUM = 'sha1'
+CHECKSUM_BLOCK_SIZE = 4 * MiB
+# interpreters tried in turn to run REMOTE_CHECKSUM on host, RHEL 8 hosts
+# have no python but platform-python
+REMOTE_PYTHONS = ('python3', '/usr/libexec/platform-python', 'python')
+COMMAND_NOT_FOUND = 127
+
+# Runs on host, prints checksum of image by the same block tree as TreeHash
+REMOTE_CHECKSUM = """
+import hashlib
+import sys
+algorithm, block_size, path = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+tree = hashlib.new(algorithm)
+with open(path, 'rb') as image:
+    for block in iter(lambda: image.read(block_size), b''):
+        tree.update(hashlib.new(algorithm, block).digest())
+print(tree.hexdigest())
+"""
+
+_libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+
+class TransferError(Exception):
+    """
+    Proxy refused request, transfer can't continue
+    """
+
+
+def merge_extents(extents):
+    """
+    Join adjacent extents of same kind
+
+    Args:
+        extents (list): Tuples of start, end and zero flag
+
+    Returns:
+        list: Merged extents
+    """
+    merged = []
+    for start, end, zero in extents:
+        if start >= end:
+            continue
+        if merged and merged[-1][1] == start and merged[-1][2] == zero:
+            merged[-1] = (merged[-1][0], end, zero)
+        else:
+            merged.append((start, end, zero))
+    return merged
+
+
+def file_extents(path, size):
+    """
+    Data and hole extents of local file
+
+    Args:
+        path (str): File path
+        size (int): Size of image in the file
+
+    Returns:
+        list: Tuples of start, end and zero flag, holes have zero flag set,
+            one data extent if the file system can't tell holes
+    """
+    extents = []
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        pos = 0
+        while pos < size:
+            try:
+                data = min(os.lseek(fd, pos, SEEK_DATA), size)
+            except OSError as ex:
+                if ex.errno == errno.ENXIO:
+                    data = size  # hole up to end of file
+                elif ex.errno == errno.EINVAL:
+                    return [(0, size, False)]
+                else:
+                    raise
+            extents.append((pos, data, True))
+            if data == size:
+                break
+            pos = min(os.lseek(fd, data, SEEK_HOLE), size)
+            extents.append((data, pos, False))
+    finally:
+        os.close(fd)
+    return merge_extents(extents)
+
+
+def punch_hole(image, start, length):
+    """
+    Deallocate range of file, zeros are written if file system can't
+
+    Args:
+        image (file): File open for writing
+        start (int): Offset of range
+        length (int): Length of range
+    """
+    image.flush()
+    if _libc.fallocate(
+        image.fileno(), FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE,
+        ctypes.c_int64(start), ctypes.c_int64(length)
+    ):
+        image.seek(start)
+        zeros = '\0' * min(length, DEF_BUF_SIZE)
+        for pos in xrange(start, start + length, len(zeros)):
+            image.write(zeros[:start + length - pos])
+
+
+class TreeHash(object):
+    """
+    Checksum of image computed from digests of its blocks
+
+    Blocks are hashed separately, in any order and by any thread, checksum
+    is hash of block digests in order of blocks. Blocks of holes get digest
+    of zeros without hashing them.
+    """
+
+    def __init__(
+        self, size, algorithm=DEF_CHECKSUM, block_size=CHECKSUM_BLOCK_SIZE
+    ):
+        """
+        Args:
+            size (int): Image size in bytes
+            algorithm (str): Name of hashlib algorithm, e.g. md5, sha1
+            block_size (int): Bytes of one block
+
+        Raises:
+            ValueError: If algorithm is not supported
+        """
+        hashlib.new(algorithm)
+        self.size = size
+        self.algorithm = algorithm
+        self.block_size = block_size
+        self.digests = [None] * ((size + block_size - 1) // block_size)
+        self._zero_digest = None
+
+    @property
+    def zero_digest(self):
+        """
+        Digest of block of zeros
+        """
+        if self._zero_digest is None:
+            self._zero_digest = hashlib.new(
+                self.algorithm, '\0' * self.block_size
+            ).digest()
+        return self._zero_digest
+
+    def feeder(self, start):
+        """
+        Args:
+            start (int): Offset of first block to hash
+
+        Returns:
+            BlockFeeder: Hasher of blocks fed sequentially from start
+        """
+        return BlockFeeder(self, start)
+
+    def fill(self, path, buf_size=DEF_BUF_SIZE):
+        """
+        Hash blocks which weren't hashed yet by reading them from file
+
+        Args:
+            path (str): Image file path
+            buf_size (int): Bytes read at once
+        """
+        missing = [i for i, digest in enumerate(self.digests) if not digest]
+        if not missing:
+            return
+        extents = file_extents(path, self.size)
+        with open(path, 'rb') as image:
+            for index in missing:
+                start = index * self.block_size
+                end = min(self.size, start + self.block_size)
+                feeder = self.feeder(start)
+                for ext_start, ext_end, zero in extents:
+                    seg_start, seg_end = max(start, ext_start), min(
+                        end, ext_end
+                    )
+                    if seg_start >= seg_end:
+                        continue
+                    if zero:
+                        feeder.zeros(seg_end - seg_start)
+                        continue
+                    image.seek(seg_start)
+                    for pos in xrange(seg_start, seg_end, buf_size):
+                        feeder.update(image.read(min(buf_size, seg_end - pos)))
+                feeder.close()
+
+    def hexdigest(self):
+        """
+        Returns:
+            str: Checksum of image
+
+        Raises:
+            ValueError: If some blocks weren't hashed
+        """
+        if not all(self.digests):
+            raise ValueError("Not all blocks of image were hashed")
+        return hashlib.new(self.algorithm, ''.join(self.digests)).hexdigest()
+
+
+class BlockFeeder(object):
+    """
+    Hashes blocks of tree from data fed in order of offsets
+    """
+
+    def __init__(self, tree, start):
+        """
+        Args:
+            tree (TreeHash): Tree of blocks
+            start (int): Offset of first block, must be at block boundary
+        """
+        if start % tree.block_size:
+            raise ValueError(
+                "Offset %d is not at block boundary of %d bytes" % (
+                    start, tree.block_size
+                )
+            )
+        self.tree = tree
+        self.pos = start
+        self._hash = None
+
+    def _block_end(self):
+        block_size = self.tree.block_size
+        return min(self.tree.size, (self.pos // block_size + 1) * block_size)
+
+    def update(self, data):
+        """
+        Hash next data
+        """
+        view = memoryview(data)
+        offset = 0
+        while offset < len(data):
+            if self._hash is None:
+                self._hash = hashlib.new(self.tree.algorithm)
+            block_end = self._block_end()
+            count = min(len(data) - offset, block_end - self.pos)
+            self._hash.update(view[offset:offset + count])
+            offset += count
+            self.pos += count
+            if self.pos == block_end:
+                self._finish()
+
+    def zeros(self, length):
+        """
+        Hash next length bytes of zeros, whole blocks without hashing
+        """
+        block_size = self.tree.block_size
+        while length:
+            if (
+                self._hash is None and not self.pos % block_size and
+                length >= block_size and
+                self._block_end() - self.pos == block_size
+            ):
+                self.tree.digests[self.pos // block_size] = (
+                    self.tree.zero_digest
+                )
+                self.pos += block_size
+                length -= block_size
+                continue
+            count = min(length, self._block_end() - self.pos)
+            self.update('\0' * count)
+            length -= count
+
+    def _finish(self):
+        index = (self.pos - 1) // self.tree.block_size
+        self.tree.digests[index] = self._hash.digest()
+        self._hash = None
+
+    def close(self):
+        """
+        Check that fed data ended at block boundary or end of image
+
+        Raises:
+            ValueError: If last block was fed partially
+        """
+        if self._hash is not None:
+            raise ValueError("Block at %d was hashed partially" % self.pos)
+
+
+def file_checksum(path, algorithm=DEF_CHECKSUM):
+    """
+    Checksum of local image file, its holes are not read
+
+    Args:
+        path (str): Image file path
+        algorithm (str): Name of hashlib algorithm
+
+    Returns:
+        str: Checksum by the same block tree as of transfer
+    """
+    tree = TreeHash(os.path.getsize(path), algorithm)
+    tree.fill(path)
+    return tree.hexdigest()
+
+
+def remote_checksum(host, path, algorithm=DEF_CHECKSUM):
+    """
+    Checksum of image on remote host
+
+    Args:
+        host (Host): Host resource
+        path (str): Path of image file or device on host
+        algorithm (str): Name of hashlib algorithm
+
+    Returns:
+        str: Checksum by the same block tree as of transfer
+
+    Raises:
+        TransferError: If checksum fails or host has no python
+    """
+    for python in REMOTE_PYTHONS:
+        rc, out, err = host.run_command([
+            python, '-c', REMOTE_CHECKSUM, algorithm,
+            str(CHECKSUM_BLOCK_SIZE), path
+        ])
+        if rc != COMMAND_NOT_FOUND:
+            break
+    if rc:
+        raise TransferError(
+            "Failed to checksum %s on %s: %s" % (path, host, err)
+        )
+    return out.strip()
+
+
+class TransferState(object):
+    """
+    Completion bitmap of ranges, saved to file to resume transfer
+    """
+
+    def __init__(self, path, url_path, size, range_size):
+        """
+        Args:
+            path (str): State file path
+            url_path (str): Path of image on proxy, identifies the ticket
+            size (int): Image size in bytes
+            range_size (int): Range size in bytes
+        """
+        self.path = path
+        self.key = {
+            'url_path': url_path, 'size': size, 'range_size': range_size
+        }
+        self.size = size
+        self.range_size = range_size
+        self.done = [False] * ((size + range_size - 1) // range_size)
+        self._lock = threading.Lock()
+
+    def ranges(self):
+        """
+        Returns:
+            list: Tuples of index, start and end (exclusive) of not completed
+                ranges
+        """
+        return [
+            (i, i * self.range_size, min(self.size, (i + 1) * self.range_size))
+            for i, done in enumerate(self.done) if not done
+        ]
+
+    def load(self):
+        """
+        Load bitmap saved by previous run of same transfer
+
+        Returns:
+            bool: True if bitmap was loaded
+        """
+        try:
+            with open(self.path) as state_file:
+                saved = json.load(state_file)
+        except (IOError, ValueError):
+            return False
+        done = saved.pop('done', '')
+        if saved != self.key or len(done) != len(self.done):
+            return False
+        self.done = [c == '1' for c in done]
+        return True
+
+    def mark_done(self, index):
+        """
+        Record completed range, failure to save it only disables resume
+        """
+        with self._lock:
+            self.done[index] = True
+            saved = dict(
+                self.key, done=''.join('1' if d else '0' for d in self.done)
+            )
+            tmp = '%s.%x' % (self.path, id(self))
+            try:
+                with open(tmp, 'w') as state_file:
+                    json.dump(saved, state_file)
+                os.rename(tmp, self.path)
+            except EnvironmentError as ex:
+                logger.debug("Failed to save state %s: %s", self.path, ex)
+
+    def remove(self):
+        """
+        Remove state file of completed transfer
+        """
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class ImageTransfer(object):
+    """
+    Download or upload of image by ranges over concurrent connections
+    """
+
+    def __init__(
+        self, connect, url_path, headers, direction, path, size,
+        connections=DEF_CONNECTIONS, range_size=DEF_RANGE_SIZE,
+        buf_size=DEF_BUF_SIZE, extend=None, sparse=True,
+        checksum=DEF_CHECKSUM
+    ):
+        """
+        Args:
+            connect (callable): Returns new HTTP(S)Connection to proxy
+            url_path (str): Path of image on proxy
+            headers (dict): Headers of every request, e.g. Authorization
+            direction (str): DOWNLOAD or UPLOAD
+            path (str): Local image path
+            size (int): Image size in bytes
+            connections (int): Number of concurrent connections
+            range_size (int): Bytes transferred by one request
+            buf_size (int): Bytes read and written at once
+            extend (callable): Extends transfer session, called every
+                EXTEND_INTERVAL seconds
+            sparse (bool): False to transfer holes and zeros as data
+            checksum (str): Name of hashlib algorithm of checksum of
+                transferred data, None to not compute it
+
+        Raises:
+            ValueError: If range_size is not multiple of CHECKSUM_BLOCK_SIZE
+                or checksum algorithm is not supported
+        """
+        if checksum and range_size % CHECKSUM_BLOCK_SIZE:
+            raise ValueError(
+                "Range size %d is not multiple of checksum block size %d" % (
+                    range_size, CHECKSUM_BLOCK_SIZE
+                )
+            )
+        self.connect = connect
+        self.url_path = url_path
+        self.headers = headers or {}
+        self.direction = direction
+        self.path = path
+        self.size = size
+        self.connections = connections
+        self.range_size = range_size
+        self.buf_size = buf_size
+        self.extend = extend
+        self.sparse = sparse
+        self.tree = TreeHash(size, checksum) if checksum else None
+        self.checksum = None
+        self.state = TransferState(
+            path + STATE_SUFFIX, url_path, size, range_size
+        )
+        self.transferred = 0
+        self.wire_bytes = 0
+        self.zero_bytes = 0
+        self.elapsed = 0
+        self.error = None
+        self.features = set()
+        self._extents = [(0, size, False)]
+        self._starts = [0]
+        self._fresh = False
+        self._zeros = '\0' * buf_size
+        self._milestones = []
+        self._pending = deque()
+        self._active = 0
+        self._completed = 0
+        self._cond = threading.Condition()
+        self._gate = threading.Event()
+        self._stop = threading.Event()
+
+    @property
+    def rate(self):
+        """
+        Returns:
+            float: MiB transferred per second by last run
+        """
+        return self.transferred / float(MiB) / self.elapsed if (
+            self.elapsed
+        ) else 0.0
+
+    def at_percent(self, percent, callback):
+        """
+        Run callback once transfer completes percent of image, no range is
+        transferred while it runs
+
+        Args:
+            percent (float): Percent of image
+            callback (callable): Callable without arguments
+        """
+        self._milestones.append((percent, callback))
+        self._milestones.sort(key=lambda milestone: milestone[0])
+
+    def _fail(self, ex):
+        with self._cond:
+            if self.error is None:
+                self.error = ex
+            self._stop.set()
+            self._gate.set()
+            self._cond.notify_all()
+
+    def _get(self, conn, image, start, end, feeder):
+        headers = dict(self.headers, Range='bytes=%d-%d' % (start, end - 1))
+        conn.request('GET', self.url_path, headers=headers)
+        response = conn.getresponse()
+        if response.status >= 300 or (
+            response.status != 206 and (start, end) != (0, self.size)
+        ):
+            raise TransferError(
+                "GET of bytes %d-%d failed: %s %s %s" % (
+                    start, end - 1, response.status, response.reason,
+                    response.read()
+                )
+            )
+        pos = start
+        zeros = 0
+        while pos < end:
+            chunk = response.read(min(self.buf_size, end - pos))
+            if not chunk:
+                raise httplib.IncompleteRead('', end - pos)
+            if feeder is not None:
+                feeder.update(chunk)
+            if self.sparse and self._is_zero(chunk):
+                zeros += len(chunk)
+                if not self._fresh:
+                    punch_hole(image, pos, len(chunk))
+            else:
+                image.seek(pos)
+                image.write(chunk)
+            pos += len(chunk)
+        image.flush()
+        return end - start, zeros
+
+    def _put(self, conn, image, start, end, feeder):
+        conn.putrequest('PUT', self.url_path)
+        for name, value in self.headers.iteritems():
+            conn.putheader(name, value)
+        conn.putheader(
+            'Content-Range', 'bytes %d-%d/%d' % (start, end - 1, self.size)
+        )
+        conn.putheader('Content-Length', '%d' % (end - start))
+        conn.endheaders()
+        if image is not None:
+            image.seek(start)
+        pos = start
+        while pos < end:
+            to_send = min(self.buf_size, end - pos)
+            chunk = image.read(to_send) if image is not None else (
+                self._zeros[:to_send]
+            )
+            if not chunk:
+                raise TransferError("Unexpected end of file at %d" % pos)
+            if feeder is not None:
+                feeder.update(chunk)
+            conn.send(chunk)
+            pos += len(chunk)
+        self._check_response(conn, 'PUT', start, end)
+        return end - start, 0
+
+    def _check_response(self, conn, method, start, end):
+        response = conn.getresponse()
+        body = response.read()
+        if response.status >= 300:
+            raise TransferError(
+                "%s of bytes %d-%d failed: %s %s %s" % (
+                    method, start, end - 1, response.status, response.reason,
+                    body
+                )
+            )
+        return body
+
+    def _is_zero(self, chunk):
+        if len(chunk) == self.buf_size:
+            return chunk == self._zeros
+        return chunk == '\0' * len(chunk)
+
+    def _zero(self, conn, image, start, end, feeder):
+        """
+        Zero hole of image, returns bytes sent and zeroed
+        """
+        if ZERO_FEATURE not in self.features and self.direction == UPLOAD:
+            # proxy can't zero, zeros are sent as data
+            return self._put(conn, None, start, end, feeder)[0], 0
+        if feeder is not None:
+            feeder.zeros(end - start)
+        if self.direction == DOWNLOAD:
+            if not self._fresh:
+                punch_hole(image, start, end - start)
+            return 0, end - start
+        self._patch(conn, {
+            'op': 'zero', 'offset': start, 'size': end - start,
+            'flush': FLUSH_FEATURE not in self.features,
+        }, start, end)
+        return 0, end - start
+
+    def _patch(self, conn, op, start, end):
+        headers = dict(
+            self.headers, **{'Content-Type': 'application/json'}
+        )
+        conn.request('PATCH', self.url_path, body=json.dumps(op),
+                     headers=headers)
+        self._check_response(conn, 'PATCH', start, end)
+
+    def _flush(self):
+        """
+        Flush zeroed ranges of upload to storage, PUT requests flush their
+        own data
+        """
+        conn = self.connect()
+        try:
+            self._patch(conn, {'op': 'flush'}, 0, self.size)
+        finally:
+            conn.close()
+
+    def _segments(self, start, end):
+        """
+        Extents of image clipped to range
+        """
+        i = bisect.bisect_right(self._starts, start) - 1
+        while i < len(self._extents) and self._extents[i][0] < end:
+            ext_start, ext_end, zero = self._extents[i]
+            yield max(start, ext_start), min(end, ext_end), zero
+            i += 1
+
+    def _transfer_range(self, conn, image, start, end):
+        """
+        Transfer range, again over new connection after connection error
+
+        Returns:
+            tuple: Connection to use for next range, bytes sent and zeroed
+        """
+        transfer = self._get if self.direction == DOWNLOAD else self._put
+        for attempt in xrange(RANGE_RETRIES + 1):
+            if conn is None:
+                conn = self.connect()
+            try:
+                wire = zeros = 0
+                feeder = self.tree.feeder(start) if self.tree else None
+                for seg_start, seg_end, zero in self._segments(start, end):
+                    sent, zeroed = (self._zero if zero else transfer)(
+                        conn, image, seg_start, seg_end, feeder
+                    )
+                    wire += sent
+                    zeros += zeroed
+                if feeder is not None:
+                    feeder.close()
+                return conn, wire, zeros
+            except (socket.error, httplib.HTTPException) as ex:
+                conn.close()
+                conn = None
+                if attempt == RANGE_RETRIES:
+                    raise
+                logger.warning(
+                    "Transfer of bytes %d-%d of %s failed, retrying: %s",
+                    start, end - 1, self.path, ex
+                )
+
+    def _worker(self):
+        conn = None
+        mode = 'r+b' if self.direction == DOWNLOAD else 'rb'
+        try:
+            with open(self.path, mode) as image:
+                while not self._stop.is_set():
+                    self._gate.wait()
+                    with self._cond:
+                        if not self._gate.is_set():
+                            continue
+                        if not self._pending or self._stop.is_set():
+                            return
+                        if self._milestone_due():
+                            # callback is run before ranges past milestone
+                            self._gate.clear()
+                            self._cond.notify_all()
+                            continue
+                        index, start, end = self._pending.popleft()
+                        self._active += 1
+                    try:
+                        conn, wire, zeros = self._transfer_range(
+                            conn, image, start, end
+                        )
+                        self.state.mark_done(index)
+                        with self._cond:
+                            self._completed += end - start
+                            self.transferred += end - start
+                            self.wire_bytes += wire
+                            self.zero_bytes += zeros
+                    finally:
+                        with self._cond:
+                            self._active -= 1
+                            self._cond.notify_all()
+        except Exception as ex:
+            self._fail(ex)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _wait_quiet(self):
+        # wait until no range is transferred, gate must be closed
+        with self._cond:
+            while self._active:
+                self._cond.wait(WAIT_POLL)
+
+    def _milestone_due(self):
+        # must be called with lock held, next milestone is due when
+        # remaining ranges start after it
+        return bool(self._milestones) and (
+            not self._pending or
+            self._pending[0][1] >= self._milestones[0][0] * self.size / 100
+        )
+
+    def _check_milestones(self):
+        while True:
+            with self._cond:
+                if not self._milestone_due():
+                    return
+                _, callback = self._milestones.pop(0)
+                self._gate.clear()
+            try:
+                self._wait_quiet()
+                if not self._stop.is_set():
+                    callback()
+            finally:
+                with self._cond:
+                    self._gate.set()
+                    self._cond.notify_all()
+
+    def _request_json(self, conn, method, url):
+        conn.request(method, url, headers=self.headers)
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            return None
+        return json.loads(body)
+
+    def _load_extents(self):
+        """
+        Load features of proxy and extents of source image, image is one data
+        extent if extents are not known
+        """
+        conn = self.connect()
+        try:
+            options = self._request_json(conn, 'OPTIONS', self.url_path)
+            self.features = set((options or {}).get('features', []))
+            if self.direction == UPLOAD:
+                self._extents = file_extents(self.path, self.size)
+            elif EXTENTS_FEATURE in self.features:
+                extents = self._request_json(
+                    conn, 'GET', self.url_path + '/extents'
+                ) or []
+                self._extents = merge_extents([(
+                    extent['start'], extent['start'] + extent['length'],
+                    extent['zero']
+                ) for extent in extents])
+                end = self._extents[-1][1] if self._extents else 0
+                if end < self.size:
+                    self._extents.append((end, self.size, False))
+        except (socket.error, httplib.HTTPException, ValueError) as ex:
+            logger.warning(
+                "Failed to get extents of %s, transferring all data: %s",
+                self.path, ex
+            )
+        finally:
+            conn.close()
+        self._starts = [start for start, _, _ in self._extents]
+
+    def run(self):
+        """
+        Transfer ranges not completed by previous run
+
+        Returns:
+            bool: True if all ranges were transferred, otherwise False and
+                error is set
+        """
+        resumed = self.state.load()
+        self._fresh = self.direction == DOWNLOAD and not (
+            resumed and os.path.exists(self.path)
+        )
+        if self._fresh:
+            with open(self.path, 'wb') as image:
+                image.truncate(self.size)
+        if self.sparse:
+            self._load_extents()
+        pending = self.state.ranges()
+        self._pending = deque(pending)
+        self._completed = self.size - sum(end - start for _, start, end in (
+            pending
+        ))
+        self.transferred = self.wire_bytes = self.zero_bytes = 0
+        self.error = self.checksum = None
+        self._stop.clear()
+        self._gate.set()
+        if resumed:
+            logger.info(
+                "Resuming %s of %s, %d bytes already transferred",
+                self.direction, self.path, self._completed
+            )
+
+        start = last_progress = last_extend = time.time()
+        workers = [
+            threading.Thread(target=self._worker)
+            for _ in xrange(min(self.connections, len(pending)))
+        ]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        try:
+            while any(worker.is_alive() for worker in workers):
+                with self._cond:
+                    if self._gate.is_set() and (self._pending or self._active):
+                        self._cond.wait(WAIT_POLL)
+                self._check_milestones()
+                now = time.time()
+                if self.extend and now - last_extend > EXTEND_INTERVAL:
+                    self.extend()
+                    last_extend = now
+                if now - last_progress > PROGRESS_INTERVAL:
+                    logger.info(
+                        "Completed %.2f%% of %s %s, %.2f MiB/s",
+                        self._completed * 100.0 / self.size, self.direction,
+                        self.path, self.transferred / float(MiB) / (
+                            now - start
+                        )
+                    )
+                    last_progress = now
+            self._check_milestones()
+        except BaseException as ex:
+            self._fail(ex)
+            raise
+        finally:
+            self._stop.set()
+            self._gate.set()
+            for worker in workers:
+                worker.join()
+            self.elapsed = time.time() - start
+
+        if self.error is not None:
+            logger.error(
+                "Failed to %s %s: %s", self.direction, self.path, self.error
+            )
+            return False
+        if self.direction == UPLOAD and self.sparse and (
+            ZERO_FEATURE in self.features and FLUSH_FEATURE in self.features
+        ):
+            try:
+                self._flush()
+            except (socket.error, httplib.HTTPException, TransferError) as ex:
+                self.error = ex
+                logger.error("Failed to flush upload of %s: %s", self.path, ex)
+                return False
+        self.state.remove()
+        if self.tree:
+            # blocks of ranges transferred by previous runs
+            self.tree.fill(self.path, self.buf_size)
+            self.checksum = self.tree.hexdigest()
+        logger.info(
+            "%s of %s completed, %.2f MiB in %.2f seconds, %.2f MiB/s "
+            "over %d connections, %.2f MiB sent, %.2f MiB of zeros skipped, "
+            "checksum %s", self.direction.capitalize(), self.path,
+            self.transferred / float(MiB), self.elapsed, self.rate,
+            len(workers), self.wire_bytes / float(MiB),
+            self.zero_bytes / float(MiB), self.checksum
+        )
+        return True
@@ -30,7 +30,9 @@ import logging
 import sys
 from time import time as _time
 
-from art.core_api.timeout import TimeoutExpiredError
+from art.core_api.timeout import (
+    TimeoutExpiredError, current_deadline, remaining_time,
+)
 
 
 class Event(object):
@@ -92,9 +94,10 @@ class QueueWithTimeout(Queue):
         """
         Works the same as Queue.join() except when given a timeout in which
         case an exception is raised if the jobs don't finish after the
-        specified timeout.
+        specified timeout. Timeout is clamped by current deadline.
         """
-        if not timeout:
+        timeout = remaining_time(timeout or None)
+        if timeout is None:
             Queue.join(self)
 
         else:
@@ -140,6 +143,8 @@ class Job(object):
         self.target = target if target else self.run
         self.args = args
         self.kwargs = kwargs
+        self.deadline = current_deadline()
+        ''' Deadline of thread creating the job, the job runs under it. '''
 
         self.running_event = Event()
         ''' Triggered when job starts. Called as running_event(). '''
@@ -164,8 +169,11 @@ class Job(object):
         '''
         self.state = 'RUNNING'
         self.running_event()
+        target = self.target
+        if self.deadline is not None:
+            target = self.deadline.wrap(target)
         try:
-            self.result = self.target(*self.args, **self.kwargs)
+            self.result = target(*self.args, **self.kwargs)
         except Exception:
             self.exception_caught(sys.exc_info())
         finally:
@@ -104,6 +104,9 @@ class GetApi(object):
                 if engine == 'rest':
                     from art.core_api.rest_utils import RestUtil
                     api = RestUtil(self._element, self._collection)
+                elif engine == 'rest_async':
+                    from art.core_api.async_rest_utils import AsyncRestUtil
+                    api = AsyncRestUtil(self._element, self._collection)
                 # adding to cache
                 self.update_util_cache(key, api)
             return getattr(api, opcode)
@@ -139,7 +139,7 @@ class XPathMatch(object):
         """
         # A hack to make the XPathMatch able to match against the tags in the
         # RHEVM entry-point url.
-        if self.api.opts['RUN']['engine'] != 'rest':
+        if self.api.opts['RUN']['engine'] not in ('rest', 'rest_async'):
             raise EngineTypeError(
                 "Engine type '%s' not supported by xpath" %
                 self.api.opts['RUN']['engine']
@@ -191,7 +191,7 @@ class XPathLinks(XPathMatch):
     def __call__(self, positive, entity, link_name, xpath,
                  rslt_eval='0. < result'):
 
-        if self.api.opts['RUN']['engine'] != 'rest':
+        if self.api.opts['RUN']['engine'] not in ('rest', 'rest_async'):
             raise EngineTypeError(
                 "Engine type '%s' not supported by xpath"
                 % self.api.opts['RUN']['engine']
@@ -24,6 +24,7 @@ These are:
       It is same as we had --log in ART - OPTIONAL
 """
 import atexit
+import sys
 import time
 import warnings
 import signal
@@ -31,6 +32,7 @@ import signal
 import pytest
 
 from art import rhevm_api
+from art.core_api import metrics
 from art.core_api.external_api import TestRunnerWrapper
 import art.test_handler.settings as settings
 from _pytest_art import ssl
@@ -42,6 +44,7 @@ __all__ = [
     "pytest_addoption",
     "pytest_configure",
     "pytest_ignore_collect",
+    "pytest_sessionfinish",
     "pytest_unconfigure",
 ]
 
@@ -75,6 +78,15 @@ def pytest_addoption(parser):
         dest="art_log_conf",
         help="Specify path to ART logger config.",
     )
+    parser.addoption(
+        '--art-metrics',
+        action="store",
+        dest="art_metrics",
+        help=(
+            "Specify path to dump REST request and sampler metrics to as "
+            "JSON."
+        ),
+    )
 
 
 # To make sure that we call all hooks after all plugins are loaded we run this
@@ -124,12 +136,29 @@ def pytest_configure(config):
     atexit.register(mon_gc.collect_gc)
 
 
+def pytest_sessionfinish(session):
+    """
+    Report latency percentiles of REST requests per endpoint
+    """
+    if not session.config.getoption('art_conf'):
+        return
+    metrics.registry.log_summary()
+    path = session.config.getoption('art_metrics')
+    if path:
+        metrics.registry.dump(path)
+
+
 def pytest_unconfigure(config):
     """
     Release resources
     """
     config.hook.pytest_art_release_resources(config=config)
 
+    # rest_utils is imported only once data structures are generated
+    rest_utils = sys.modules.get('art.core_api.rest_utils')
+    if rest_utils is not None:
+        rest_utils.RestUtil.log_stats()
+
 
 def pytest_ignore_collect(path, config):
     """
@@ -0,0 +1,90 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Compare sequential GET requests of HTTP proxy with batch of concurrent
+requests of async HTTP client against local stub engine
+"""
+
+import argparse
+import threading
+import time
+
+from art.core_api.async_http import AsyncHTTPClient, AsyncRequest
+from rest_stress_benchmark import StubHandler, StubServer, make_proxy
+
+
+def sequential(proxy, urls):
+    """
+    GET urls one by one
+    :param proxy: HTTP proxy
+    :type proxy: HTTPProxy
+    :param urls: Urls
+    :type urls: list
+    :returns: Seconds elapsed
+    :rtype: float
+    """
+    start = time.time()
+    for url in urls:
+        proxy.GET(url)
+    return time.time() - start
+
+
+def batch(client, urls):
+    """
+    GET urls concurrently
+    :param client: Async HTTP client
+    :type client: AsyncHTTPClient
+    :param urls: Urls
+    :type urls: list
+    :returns: Seconds elapsed and number of failed requests
+    :rtype: tuple
+    """
+    start = time.time()
+    requests = client.run([AsyncRequest('GET', url) for url in urls])
+    return time.time() - start, len([r for r in requests if r.error])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200, help="Requests")
+    parser.add_argument(
+        "--connections", type=int, nargs="+", default=[1, 4, 16],
+        help="Async client connection counts to measure"
+    )
+    parser.add_argument(
+        "--pipeline-depth", type=int, default=4, help="Pipeline depth"
+    )
+    parser.add_argument(
+        "--delay", type=float, default=0.01, help="Stub response delay"
+    )
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    server = StubServer(('localhost', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    port = server.server_address[1]
+    urls = ['/api/vms/%d' % i for i in range(args.requests)]
+
+    proxy = make_proxy(port, 1)
+    base = sequential(proxy, urls)
+    proxy.pool.clear()
+    print "sequential:      %8.1f req/s" % (args.requests / base)
+    for connections in args.connections:
+        client = AsyncHTTPClient(
+            'http', 'localhost', port, max_connections=connections,
+            pipeline_depth=args.pipeline_depth
+        )
+        elapsed, failed = batch(client, urls)
+        client.close()
+        print "connections: %3d %8.1f req/s  %5.2fx  failed: %d" % (
+            connections, args.requests / elapsed, base / elapsed, failed
+        )
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Measure validator.compareElements on recorded entities (e.g. VM with NICs,
+disks and NUMA nodes), every entity is compared with its own copy
+"""
+
+import argparse
+import copy
+import importlib
+import logging
+import time
+
+from lxml import etree
+
+import art.test_handler.settings as settings
+
+DS_MOD = "art.rhevm_api.data_struct.data_structures"
+
+
+def measure(validator, entities, rounds):
+    """
+    Measure time of comparing all entities
+    :param validator: Validator module
+    :type validator: module
+    :param entities: Pairs of expected and actual entity and root name
+    :type entities: list
+    :param rounds: Number of rounds
+    :type rounds: int
+    :returns: Best round time in seconds
+    :rtype: float
+    """
+    logger = logging.getLogger("compare_benchmark")
+    best = None
+    for _ in range(rounds):
+        start = time.time()
+        for expected, actual, root in entities:
+            if not validator.compareElements(expected, actual, logger, root):
+                raise AssertionError("%s: copy differs from entity" % root)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "entities", nargs="+", help="Files with recorded XML entities"
+    )
+    parser.add_argument("--module", default=DS_MOD, help="Data structures")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds")
+    args = parser.parse_args()
+
+    settings.ART_CONFIG.setdefault("RUN", {})["data_struct_mod"] = args.module
+    module = importlib.import_module(args.module)
+    validator = importlib.import_module("art.core_api.validator")
+    entities = []
+    for path in args.entities:
+        with open(path) as fh:
+            body = fh.read()
+        expected = module.parseString(body, silence=True)
+        root = etree.fromstring(body).tag
+        entities.append((expected, copy.deepcopy(expected), root))
+
+    start = time.time()
+    measure(validator, entities, 1)
+    first = time.time() - start
+    best = measure(validator, entities, args.rounds)
+    print "entities: %d, compiled plans: %d" % (
+        len(entities), len(validator._compare_plans)
+    )
+    print "first round: %.3fs (compiles plans)" % first
+    print "best round:  %.3fs (%.2f ms per entity)" % (
+        best, best * 1000 / len(entities)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Measure download and upload of image by ranges over concurrent connections
+against local stub imageio proxy, whose every connection is limited to
+given bandwidth like single TCP stream over WAN, and bytes sent with and
+without sparse transfer of sparse raw (and qcow2 if qemu-img is installed)
+images
+"""
+
+import argparse
+import functools
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from httplib import HTTPConnection
+
+from art.rhevm_api.utils import image_transfer
+
+MiB = image_transfer.MiB
+BUF_SIZE = 128 * 1024
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubProxy(BaseHTTPRequestHandler):
+    """
+    Serves ranges of image file and writes ranges put to it
+    """
+    protocol_version = 'HTTP/1.1'
+    image = None
+    stream_rate = None  # bytes per second of one connection
+
+    def _throttle(self, start, count):
+        if self.stream_rate:
+            delay = start + count / float(self.stream_rate) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _reply(self, status, body=''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self._reply(200, json.dumps({
+            'features': ['zero', 'extents', 'flush']
+        }))
+
+    def do_PATCH(self):
+        request = json.loads(
+            self.rfile.read(int(self.headers.getheader('Content-Length')))
+        )
+        with open(self.image, 'r+b') as image:
+            if request['op'] == 'zero':
+                image_transfer.punch_hole(
+                    image, request['offset'], request['size']
+                )
+            if request['op'] == 'flush' or request.get('flush', True):
+                os.fsync(image.fileno())
+        self._reply(200)
+
+    def do_GET(self):
+        size = os.path.getsize(self.image)
+        if self.path.endswith('/extents'):
+            self._reply(200, json.dumps([
+                {'start': start, 'length': end - start, 'zero': zero}
+                for start, end, zero in image_transfer.file_extents(
+                    self.image, size
+                )
+            ]))
+            return
+        match = re.match(
+            r'bytes=(\d+)-(\d+)', self.headers.getheader('Range') or ''
+        )
+        first, last = map(int, match.groups()) if match else (0, size - 1)
+        self.send_response(206 if match else 200)
+        self.send_header('Content-Length', str(last - first + 1))
+        self.end_headers()
+        start = time.time()
+        with open(self.image, 'rb') as image:
+            image.seek(first)
+            sent = 0
+            while sent < last - first + 1:
+                chunk = image.read(min(BUF_SIZE, last - first + 1 - sent))
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                self._throttle(start, sent)
+
+    def do_PUT(self):
+        first = int(re.match(
+            r'bytes (\d+)-', self.headers.getheader('Content-Range')
+        ).group(1))
+        length = int(self.headers.getheader('Content-Length'))
+        start = time.time()
+        with open(self.image, 'r+b') as image:
+            image.seek(first)
+            received = 0
+            while received < length:
+                chunk = self.rfile.read(min(BUF_SIZE, length - received))
+                image.write(chunk)
+                received += len(chunk)
+                self._throttle(start, received)
+        self._reply(200)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(port, direction, path, size, connections, sparse=True):
+    """
+    Transfer image over given number of connections
+    :param port: Port of stub proxy
+    :type port: int
+    :param direction: DOWNLOAD or UPLOAD
+    :type direction: str
+    :param path: Local image path
+    :type path: str
+    :param size: Image size in bytes
+    :type size: int
+    :param connections: Number of connections
+    :type connections: int
+    :param sparse: False to transfer holes as data
+    :type sparse: bool
+    :returns: Finished transfer
+    :rtype: ImageTransfer
+    """
+    transfer = image_transfer.ImageTransfer(
+        functools.partial(HTTPConnection, 'localhost', port), '/images/x',
+        {}, direction, path, size, connections=connections, sparse=sparse
+    )
+    assert transfer.run(), transfer.error
+    return transfer
+
+
+def make_sparse(path, size, data_percent):
+    """
+    Create sparse raw image with data in every 8 MiB block up to
+    data_percent of the block
+    :param path: Image path
+    :type path: str
+    :param size: Image size in bytes
+    :type size: int
+    :param data_percent: Percent of allocated data
+    :type data_percent: int
+    """
+    block = 8 * MiB
+    with open(path, 'wb') as image:
+        image.truncate(size)
+        for start in xrange(0, size, block):
+            image.seek(start)
+            image.write(os.urandom(
+                min(block * data_percent / 100, size - start)
+            ))
+
+
+def allocated(path):
+    """
+    :param path: File path
+    :type path: str
+    :returns: MiB allocated by file
+    :rtype: float
+    """
+    return os.stat(path).st_blocks * 512 / float(MiB)
+
+
+def sparse_images(workdir, size, data_percent):
+    """
+    Create sparse images to measure
+    :param workdir: Directory of images
+    :type workdir: str
+    :param size: Image size in bytes
+    :type size: int
+    :param data_percent: Percent of allocated data
+    :type data_percent: int
+    :returns: Names and paths of images
+    :rtype: list
+    """
+    raw = os.path.join(workdir, 'sparse.raw')
+    make_sparse(raw, size, data_percent)
+    images = [('raw', raw)]
+    qcow2 = os.path.join(workdir, 'sparse.qcow2')
+    try:
+        subprocess.check_call([
+            'qemu-img', 'convert', '-O', 'qcow2', '-o',
+            'preallocation=metadata', raw, qcow2
+        ])
+        images.append(('qcow2', qcow2))
+    except (OSError, subprocess.CalledProcessError) as ex:
+        print "qcow2 image skipped: %s" % ex
+    return images
+
+
+def measure_sparse(port, workdir, name, image, connections):
+    """
+    Upload and download sparse image with and without sparse transfer
+    :param port: Port of stub proxy
+    :type port: int
+    :param workdir: Directory of images
+    :type workdir: str
+    :param name: Image name
+    :type name: str
+    :param image: Image path
+    :type image: str
+    :param connections: Number of connections
+    :type connections: int
+    """
+    size = os.path.getsize(image)
+    checksum = image_transfer.file_checksum(image)
+    remote = os.path.join(workdir, 'sparse_remote.img')
+    local = os.path.join(workdir, 'sparse_local.img')
+    StubProxy.image = remote
+    for sparse in (False, True):
+        with open(remote, 'wb') as target:
+            target.truncate(size)
+        upload = measure(
+            port, image_transfer.UPLOAD, image, size, connections, sparse
+        )
+        download = measure(
+            port, image_transfer.DOWNLOAD, local, size, connections, sparse
+        )
+        assert upload.checksum == download.checksum == checksum, (
+            "%s transferred with sparse %s differs from source" % (
+                name, sparse
+            )
+        )
+        for transfer, path in ((upload, remote), (download, local)):
+            print (
+                "%-5s %-8s sparse: %-5s %8.1f MiB sent %6.2f s "
+                "%8.1f MiB allocated" % (
+                    name, transfer.direction, sparse,
+                    transfer.wire_bytes / float(MiB), transfer.elapsed,
+                    allocated(path)
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=256, help="Image MiB")
+    parser.add_argument(
+        "--connections", type=int, nargs="+", default=[1, 2, 4, 8],
+        help="Connection counts to measure"
+    )
+    parser.add_argument(
+        "--stream-rate", type=float, default=50,
+        help="MiB/s of one connection, 0 for no limit"
+    )
+    parser.add_argument(
+        "--data-percent", type=int, default=10,
+        help="Percent of allocated data of sparse images"
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    remote = os.path.join(workdir, 'remote.img')
+    local = os.path.join(workdir, 'local.img')
+    size = args.size * MiB
+    with open(remote, 'wb') as image:
+        for _ in xrange(args.size):
+            image.write(os.urandom(MiB))
+
+    checksum = image_transfer.file_checksum(remote)
+    StubProxy.image = remote
+    StubProxy.stream_rate = args.stream_rate * MiB
+    server = StubServer(('localhost', 0), StubProxy)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    port = server.server_address[1]
+    try:
+        for connections in args.connections:
+            for direction in (image_transfer.DOWNLOAD, image_transfer.UPLOAD):
+                transfer = measure(port, direction, local, size, connections)
+                assert transfer.checksum == checksum, (
+                    "%s differs from source" % direction
+                )
+                print "%-8s connections: %2d %8.1f MiB/s" % (
+                    direction, connections, transfer.rate
+                )
+        for name, image in sparse_images(workdir, size, args.data_percent):
+            measure_sparse(port, workdir, name, image, args.connections[-1])
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
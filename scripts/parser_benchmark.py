@@ -0,0 +1,83 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Compare generated and table driven parsers of data structures on recorded
+responses
+"""
+
+import argparse
+import importlib
+import time
+from StringIO import StringIO
+
+from art.core_api.table_parser import TableParser
+
+DS_MOD = "art.rhevm_api.data_struct.data_structures"
+
+
+def export(obj):
+    """
+    Export parsed object back to XML
+    :param obj: Parsed object
+    :type obj: object
+    :returns: Exported XML
+    :rtype: str
+    """
+    out = StringIO()
+    obj.export(out, 0)
+    return out.getvalue()
+
+
+def measure(parse, bodies, rounds):
+    """
+    Measure time of parsing all bodies
+    :param parse: Parse function
+    :type parse: callable
+    :param bodies: Recorded responses
+    :type bodies: list
+    :param rounds: Number of rounds
+    :type rounds: int
+    :returns: Best round time in seconds
+    :rtype: float
+    """
+    best = None
+    for _ in range(rounds):
+        start = time.time()
+        for body in bodies:
+            parse(body, silence=True)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "responses", nargs="+", help="Files with recorded XML responses"
+    )
+    parser.add_argument("--module", default=DS_MOD, help="Data structures")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds")
+    args = parser.parse_args()
+
+    module = importlib.import_module(args.module)
+    table_parser = TableParser(module)
+    bodies = []
+    for path in args.responses:
+        with open(path) as fh:
+            body = fh.read()
+        generated = export(module.parseString(body, silence=True))
+        tables = export(table_parser.parse(body, silence=True))
+        if generated != tables:
+            print "%s: parsers results differ" % path
+        bodies.append(body)
+
+    generated = measure(module.parseString, bodies, args.rounds)
+    tables = measure(table_parser.parse, bodies, args.rounds)
+    print "responses: %d, %d bytes" % (len(bodies), sum(map(len, bodies)))
+    print "generated: %.3fs" % generated
+    print "tables:    %.3fs (%.2fx)" % (tables, generated / tables)
+
+
+if __name__ == "__main__":
+    main()
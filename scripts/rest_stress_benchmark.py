@@ -0,0 +1,134 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Measure throughput of concurrent mutating requests against local stub
+engine, every request carries its own Correlation-Id which the stub echoes
+back and which is checked in the response
+"""
+
+import argparse
+import threading
+import time
+import uuid
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from concurrent.futures import ThreadPoolExecutor
+
+from art.core_api.http import HTTPProxy
+
+CORRELATION_ID = 'Correlation-Id'
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers every request after delay with its Correlation-Id in body
+    """
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+
+    def _respond(self):
+        length = int(self.headers.getheader('Content-Length') or 0)
+        self.rfile.read(length)
+        time.sleep(self.delay)
+        body = '<action><status>%s</status></action>' % (
+            self.headers.getheader(CORRELATION_ID)
+        )
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+def make_proxy(port, pool_size):
+    """
+    Create HTTP proxy connected to stub engine
+    :param port: Port of stub engine
+    :type port: int
+    :param pool_size: Maximum number of idle connections
+    :type pool_size: int
+    :returns: HTTP proxy
+    :rtype: HTTPProxy
+    """
+    return HTTPProxy({
+        'RUN': {'media_type': 'application/xml'},
+        'REST_CONNECTION': {
+            'scheme': 'http', 'host': 'localhost', 'port': port,
+            'user': None, 'password': None, 'max_pool_size': pool_size,
+        },
+        'HTTP_HEADERS': {},
+    })
+
+
+def run(proxy, workers, requests):
+    """
+    Send requests from workers and check correlation ids of responses
+    :param proxy: HTTP proxy
+    :type proxy: HTTPProxy
+    :param workers: Number of threads
+    :type workers: int
+    :param requests: Number of requests
+    :type requests: int
+    :returns: Seconds elapsed and number of mismatched correlation ids
+    :rtype: tuple
+    """
+    mismatched = []
+
+    def post(_):
+        correlation_id = uuid.uuid4().hex
+        ret = proxy.POST(
+            '/api/vms', '<vm/>', {CORRELATION_ID: correlation_id}
+        )
+        if correlation_id not in ret['body']:
+            mismatched.append(correlation_id)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(post, range(requests)))
+    return time.time() - start, len(mismatched)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+        help="Worker counts to measure"
+    )
+    parser.add_argument("--requests", type=int, default=200, help="Requests")
+    parser.add_argument(
+        "--delay", type=float, default=0.01, help="Stub response delay"
+    )
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    server = StubServer(('localhost', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    proxy = make_proxy(server.server_address[1], max(args.workers))
+    base = None
+    for workers in args.workers:
+        elapsed, mismatched = run(proxy, workers, args.requests)
+        rate = args.requests / elapsed
+        base = base or rate
+        print "workers: %3d  %8.1f req/s  %5.2fx  mismatched ids: %d" % (
+            workers, rate, rate / base, mismatched
+        )
+    proxy.pool.clear()
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
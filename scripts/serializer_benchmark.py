@@ -0,0 +1,116 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Compare generated export and lxml element tree serializers of data
+structures on recorded entities
+"""
+
+import argparse
+import importlib
+import time
+from StringIO import StringIO
+
+from lxml import etree
+
+DS_MOD = "art.rhevm_api.data_struct.data_structures"
+
+
+def export(obj, name):
+    """
+    Serialize object by generated export
+    :param obj: Parsed object
+    :type obj: object
+    :param name: Name of root element
+    :type name: str
+    :returns: Serialized XML
+    :rtype: str
+    """
+    out = StringIO()
+    obj.export(out, 0, name_=name)
+    return out.getvalue()
+
+
+def to_etree(obj, name):
+    """
+    Serialize object by lxml element tree
+    :param obj: Parsed object
+    :type obj: object
+    :param name: Name of root element
+    :type name: str
+    :returns: Serialized XML
+    :rtype: str
+    """
+    return etree.tostring(obj.to_etree(None, name_=name), pretty_print=True)
+
+
+def canonical(body):
+    """
+    Canonical form of XML, ignoring formatting whitespace
+    :param body: XML
+    :type body: str
+    :returns: Canonical XML
+    :rtype: str
+    """
+    parser = etree.XMLParser(remove_blank_text=True)
+    return etree.tostring(etree.fromstring(body, parser), method="c14n")
+
+
+def measure(serialize, entities, rounds):
+    """
+    Measure time of serializing all entities
+    :param serialize: Serialize function
+    :type serialize: callable
+    :param entities: Pairs of parsed object and root element name
+    :type entities: list
+    :param rounds: Number of rounds
+    :type rounds: int
+    :returns: Best round time in seconds
+    :rtype: float
+    """
+    best = None
+    for _ in range(rounds):
+        start = time.time()
+        for obj, name in entities:
+            serialize(obj, name)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "entities", nargs="+", help="Files with recorded XML entities"
+    )
+    parser.add_argument("--module", default=DS_MOD, help="Data structures")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds")
+    args = parser.parse_args()
+
+    module = importlib.import_module(args.module)
+    entities = []
+    size = 0
+    for path in args.entities:
+        with open(path) as fh:
+            body = fh.read()
+        name = etree.fromstring(body).tag
+        obj = module.parseString(body, silence=True)
+        if not hasattr(obj, "to_etree"):
+            parser.error("%s was generated without etree export" % args.module)
+        exported = export(obj, name)
+        if canonical(exported) != canonical(to_etree(obj, name)):
+            print "%s: serializers results differ" % path
+        entities.append((obj, name))
+        size += len(exported)
+
+    exported = measure(export, entities, args.rounds)
+    tree = measure(to_etree, entities, args.rounds)
+    print "entities: %d, %d bytes" % (len(entities), size)
+    print "export: %.3fs (%.1f MB/s)" % (exported, size / exported / 2 ** 20)
+    print "etree:  %.3fs (%.1f MB/s, %.2fx)" % (
+        tree, size / tree / 2 ** 20, exported / tree
+    )
+
+
+if __name__ == "__main__":
+    main()
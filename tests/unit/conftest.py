@@ -0,0 +1,11 @@
+"""
+Unit tests of ART core, they run without engine and without configuration
+loaded by ART pytest plugin, only modules loaded on import of core modules
+are configured here
+"""
+
+from art.test_handler import settings
+
+settings.ART_CONFIG.setdefault('RUN', {}).setdefault(
+    'data_struct_mod', 'art.rhevm_api.data_struct.data_structures'
+)
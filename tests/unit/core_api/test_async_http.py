@@ -0,0 +1,325 @@
+"""
+Response parsing and resends of AsyncHTTPClient
+"""
+
+import errno
+import socket
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import pytest
+
+from art.core_api import async_http
+from art.core_api.async_http import AsyncHTTPClient, AsyncRequest
+
+# responses recorded from engine and from plain HTTP servers
+CHUNKED = (
+    'HTTP/1.1 200 OK\r\n'
+    'Content-Type: application/xml\r\n'
+    'Transfer-Encoding: chunked\r\n'
+    '\r\n'
+    '5;ext=1\r\n<vms>\r\n'
+    '6\r\n</vms>\r\n'
+    '0\r\n'
+    'X-Trailer: 1\r\n'
+    '\r\n'
+)
+LENGTH = (
+    'HTTP/1.1 200 OK\r\n'
+    'Content-Length: 5\r\n'
+    'Set-Cookie: a=1\r\n'
+    'Set-Cookie: b=2\r\n'
+    '\r\n'
+    '<vm/>'
+)
+CLOSE = (
+    'HTTP/1.1 404 Not Found\r\n'
+    'Content-Length: 8\r\n'
+    'Connection: close\r\n'
+    '\r\n'
+    '<fault/>'
+)
+UNTIL_EOF = 'HTTP/1.0 200 OK\r\nContent-Type: text/plain\r\n\r\nuntil eof'
+CONTINUE = 'HTTP/1.1 100 Continue\r\n\r\n'
+HEAD = 'HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n'
+
+
+class FakeSocket(object):
+    """
+    Socket returning recorded data by given pieces
+    """
+
+    def __init__(self):
+        self.pieces = []
+        self.sent = ''
+        self.send_limit = None
+
+    def recv(self, size):
+        if not self.pieces:
+            raise socket.error(errno.EAGAIN, 'again')
+        return self.pieces.pop(0)
+
+    def send(self, data):
+        data = data[:self.send_limit]
+        self.sent += data
+        return len(data)
+
+    def close(self):
+        pass
+
+
+def connection(*requests):
+    conn = async_http._Connection(AsyncHTTPClient('http', 'localhost', 80))
+    conn.sock = FakeSocket()
+    conn.state = 'ready'
+    for request in requests:
+        conn.send(request)
+    return conn
+
+
+def feed(conn, data, piece_size=None):
+    """
+    Read data by pieces of piece_size bytes, empty data is end of stream
+    """
+    piece_size = piece_size or len(data) or 1
+    done = []
+    for start in xrange(0, len(data), piece_size):
+        conn.sock.pieces.append(data[start:start + piece_size])
+        done.extend(conn.handle_read())
+    if not data:
+        conn.sock.pieces.append('')
+        done.extend(conn.handle_read())
+    return done
+
+
+@pytest.mark.parametrize('piece_size', [1, 2, 7, 40, None])
+def test_chunked_body_read_by_pieces(piece_size):
+    request = AsyncRequest('GET', '/api/vms')
+    conn = connection(request)
+
+    assert feed(conn, CHUNKED, piece_size) == [request]
+    assert request.status == 200
+    assert request.response_body == '<vms></vms>'
+    assert request.getheader('Content-Type') == 'application/xml'
+    assert not conn.inflight and conn.inbuf == ''
+
+
+@pytest.mark.parametrize('piece_size', [1, 3, None])
+def test_pipelined_responses(piece_size):
+    requests = [AsyncRequest('GET', '/api/vms/%d' % i) for i in range(3)]
+    conn = connection(*requests)
+
+    done = feed(conn, LENGTH + CHUNKED + LENGTH, piece_size)
+
+    assert done == requests
+    assert [r.response_body for r in done] == ['<vm/>', '<vms></vms>', '<vm/>']
+    assert requests[0].getheader('set-cookie') == 'a=1, b=2'
+    assert conn.state == 'ready'
+
+
+def test_connection_close_leaves_pipelined_requests():
+    requests = [AsyncRequest('GET', '/api/vms/%d' % i) for i in range(3)]
+    conn = connection(*requests)
+
+    done = feed(conn, CLOSE + LENGTH)
+
+    assert done == requests[:1]
+    assert requests[0].status == 404
+    assert requests[0].response_body == '<fault/>'
+    assert conn.state == 'closing'
+    assert list(conn.inflight) == requests[1:]
+
+
+def test_body_until_end_of_stream():
+    request = AsyncRequest('GET', '/')
+    conn = connection(request)
+
+    assert feed(conn, UNTIL_EOF, 4) == []
+    assert feed(conn, '') == [request]
+    assert request.response_body == 'until eof'
+    assert conn.state == 'closing'
+
+
+def test_end_of_stream_before_response_closes_connection():
+    request = AsyncRequest('GET', '/')
+    conn = connection(request)
+
+    assert feed(conn, LENGTH[:20]) == []
+    assert feed(conn, '') == []
+    assert conn.state == 'closed'
+    assert list(conn.inflight) == [request]
+
+
+def test_interim_and_head_responses():
+    head = AsyncRequest('HEAD', '/api')
+    get = AsyncRequest('GET', '/api/vms/1')
+    conn = connection(head, get)
+
+    assert feed(conn, CONTINUE + HEAD + LENGTH, 5) == [head, get]
+    assert head.response_body == ''
+    assert head.getheader('content-length') == '100'
+    assert get.response_body == '<vm/>'
+
+
+def test_partially_sent_requests_are_written():
+    requests = [
+        AsyncRequest('GET', '/api/vms/1'), AsyncRequest('GET', '/api/vms/2'),
+        AsyncRequest('POST', '/api/vms', '<vm/>'),
+    ]
+    conn = connection(*requests)
+    first = len(requests[0].serialize(conn.client.host_header))
+    conn.sock.send_limit = first + 1
+
+    conn.handle_write()
+
+    assert [r.written for r in requests] == [True, True, False]
+    conn.sock.send_limit = None
+    conn.handle_write()
+    assert all(r.written for r in requests)
+    assert not conn.unwritten and not conn.out
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Answers requests according to behaviour of server, counts requests
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.command)
+        length = int(self.headers.getheader('Content-Length') or 0)
+        self.rfile.read(length)
+        if server.behaviour == 'drop':
+            # close without response
+            self.close_connection = 1
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        if server.behaviour == 'close':
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write('ok')
+        if server.behaviour == 'silent_close':
+            # close keep-alive connection without telling client
+            self.close_connection = 1
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = Server(('localhost', 0), Handler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.behaviour = None
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(server, **kwargs):
+    return AsyncHTTPClient('http', 'localhost', server.server_address[1],
+                           timeout=10, **kwargs)
+
+
+def test_server_closing_pipelined_connections(server):
+    server.behaviour = 'close'
+    http = client(server, max_connections=1, pipeline_depth=4)
+    requests = [AsyncRequest('GET', '/%d' % i) for i in range(10)]
+
+    http.run(requests)
+
+    assert [r.status for r in requests] == [200] * 10
+    assert max(r.resends for r in requests) <= 1
+    assert http.pipeline_depth == 1
+
+
+def test_unanswered_get_resends_are_capped(server):
+    server.behaviour = 'drop'
+    http = client(server)
+    request = AsyncRequest('GET', '/')
+
+    http.run([request])
+
+    assert isinstance(request.error, EOFError)
+    assert request.resends == async_http.MAX_RESENDS
+    assert server.requests == ['GET'] * (async_http.MAX_RESENDS + 1)
+
+
+def test_written_post_is_not_resent(server):
+    server.behaviour = 'drop'
+    http = client(server)
+    request = AsyncRequest('POST', '/api/vms', '<vm/>')
+
+    http.run([request])
+
+    assert isinstance(request.error, EOFError)
+    assert server.requests == ['POST']
+
+
+def test_post_over_connection_closed_while_idle(server):
+    server.behaviour = 'silent_close'
+    http = client(server, max_connections=1)
+    http.run([AsyncRequest('GET', '/')])
+    server.behaviour = None
+    # server closes the connection right after response
+    deadline = time.time() + 5
+    while not http._idle[0].is_dropped() and time.time() < deadline:
+        time.sleep(0.01)
+    request = AsyncRequest('POST', '/api/vms', '<vm/>')
+
+    http.run([request])
+
+    assert request.status == 200 and request.error is None
+    assert server.requests == ['GET', 'POST']
+    http.close()
+
+
+class SlowList(list):
+    """
+    List pausing after emptiness check, widens race of check and pop
+    """
+
+    def __len__(self):
+        length = list.__len__(self)
+        time.sleep(0.05)
+        return length
+
+
+def test_threads_share_idle_connections(server):
+    http = client(server)
+    http.run([AsyncRequest('GET', '/')])
+    http._idle = SlowList(http._idle)
+    results = []
+
+    def run():
+        requests = [AsyncRequest('GET', '/1')]
+        try:
+            http.run(requests)
+            results.append(requests[0].status)
+        except Exception as ex:
+            results.append(ex)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert results == [200] * 4
+    assert len(set(map(id, http._idle))) == len(http._idle)
+    http.close()
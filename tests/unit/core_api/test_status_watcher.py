@@ -0,0 +1,181 @@
+"""
+Requests of StatusWatcher poller per tick
+"""
+
+import threading
+
+import pytest
+
+from art.core_api import status_watcher
+from art.core_api.status_watcher import StatusWatcher
+
+COLLECTION_HREF = '/ovirt-engine/api/%s'
+
+
+class Entity(object):
+    def __init__(self, id_, name, status):
+        self.id = id_
+        self.name = name
+        self.status = status
+
+
+class FakeApi(object):
+    def __init__(self, util):
+        self.util = util
+
+    def GET(self, url):
+        self.util.requests.append(('GET', url))
+        entity = self.util.entities.get(url.rsplit('/', 1)[1])
+        if entity is None:
+            return {'status': 404, 'body': ''}
+        return {'status': 200, 'body': entity}
+
+
+class FakeUtil(object):
+    """
+    RestUtil of collection of entities keyed by id, records requests
+    """
+    element_name = 'entity'
+
+    def __init__(self, collection_name, entities):
+        self.collection_name = collection_name
+        self.links = {collection_name: COLLECTION_HREF % collection_name}
+        self.entities = dict((e.id, e) for e in entities)
+        self.api = FakeApi(self)
+        self.requests = []
+
+    @staticmethod
+    def is_top_level(href):
+        return True
+
+    def query(self, constraint, lazy=False):
+        self.requests.append(('search', constraint))
+        terms = set(constraint.split(' or '))
+        return [
+            e for e in self.entities.values()
+            if 'name=%s' % e.name in terms or 'id=%s' % e.id in terms
+        ]
+
+    def get(self, abs_link=True, lazy=None, cache=True):
+        assert not cache, "poller must bypass entity cache"
+        self.requests.append(('GET', self.links[self.collection_name]))
+        return self.entities.values()
+
+    @staticmethod
+    def parse_response(href, ret, elm):
+        return ret['body']
+
+
+def make_util(collection_name, count=10):
+    return FakeUtil(collection_name, [
+        Entity(str(i), 'vm%d' % i, 'down') for i in range(count)
+    ])
+
+
+def waiter(values, key):
+    return status_watcher.Waiter(values, ['up'], key, None, 10)
+
+
+MIXED_WAITERS = [
+    (['vm1', 'vm2'], 'name'), (['3'], 'id'), (['vm4'], 'name'),
+    (['5', '6'], 'id'),
+]
+
+
+def test_searchable_mixed_waiters_poll_by_one_search():
+    util = make_util('vms')
+    watcher = StatusWatcher(util)
+    entities = watcher._poll([waiter(v, k) for v, k in MIXED_WAITERS])
+
+    assert len(util.requests) == 1
+    kind, query = util.requests[0]
+    assert kind == 'search'
+    assert sorted(query.split(' or ')) == [
+        'id=3', 'id=5', 'id=6', 'name=vm1', 'name=vm2', 'name=vm4'
+    ]
+    assert sorted(e.id for e in entities) == ['1', '2', '3', '4', '5', '6']
+
+
+def test_not_searchable_id_waiters_poll_entities_directly():
+    util = make_util('disks')
+    watcher = StatusWatcher(util)
+    entities = watcher._poll([
+        waiter(['3'], 'id'), waiter(['5', '6'], 'id'), waiter(['42'], 'id')
+    ])
+
+    assert sorted(util.requests) == [
+        ('GET', '/ovirt-engine/api/disks/%s' % id_)
+        for id_ in ('3', '42', '5', '6')
+    ]
+    assert sorted(e.id for e in entities) == ['3', '5', '6']
+
+
+@pytest.mark.parametrize('waiters', [
+    MIXED_WAITERS,
+    [(
+        [str(i) for i in range(status_watcher.MAX_DIRECT_GETS + 1)], 'id'
+    )],
+], ids=['mixed', 'many_ids'])
+def test_not_searchable_falls_back_to_one_collection_get(waiters):
+    util = make_util('disks')
+    watcher = StatusWatcher(util)
+    watcher._poll([waiter(v, k) for v, k in waiters])
+
+    assert util.requests == [('GET', '/ovirt-engine/api/disks')]
+
+
+def test_too_many_terms_fall_back_to_one_collection_get():
+    count = status_watcher.MAX_SEARCH_TERMS + 1
+    util = make_util('vms', count)
+    watcher = StatusWatcher(util)
+    watcher._poll([
+        waiter(['vm%d' % i for i in range(count - 1)], 'name'),
+        waiter([str(count - 1)], 'id'),
+    ])
+
+    assert util.requests == [('GET', '/ovirt-engine/api/vms')]
+
+
+def test_mixed_waits_share_one_request_per_tick():
+    util = make_util('vms')
+    watcher = StatusWatcher(util, min_sleep=0.01, backoff=1)
+    results = {}
+
+    def wait(values, key):
+        results[(tuple(values), key)] = watcher.wait(
+            values, ['up'], key=key, timeout=10, max_sleep=0.01
+        )
+
+    threads = [
+        threading.Thread(target=wait, args=args) for args in MIXED_WAITERS
+    ]
+    for thread in threads:
+        thread.start()
+    for entity in util.entities.values():
+        entity.status = 'up'
+    for thread in threads:
+        thread.join(10)
+
+    assert all(results.values()) and len(results) == len(MIXED_WAITERS)
+    assert util.requests
+    assert all(kind == 'search' for kind, _ in util.requests)
+
+
+def test_check_holds_entities_in_status_and_reports_reached():
+    entities = [Entity('1', 'vm1', 'up'), Entity('2', 'vm2', 'up')]
+    entities[1].host = 'h1'
+    reached = []
+    w = status_watcher.Waiter(
+        ['vm1', 'vm2'], ['up'], 'name', None, 10,
+        check=lambda e: getattr(e, 'host', 'h2') == 'h2',
+        on_reached=lambda value, status: reached.append((value, status)),
+    )
+
+    w.update(entities)
+    assert w.pending == {'vm2': 'up'} and not w.done.is_set()
+    assert reached == [('vm1', 'up')]
+
+    entities[1].host = 'h2'
+    w.update(entities)
+    assert w.done.is_set() and w.result
+    assert reached == [('vm1', 'up'), ('vm2', 'up')]
@@ -0,0 +1,157 @@
+"""
+Transfers of ImageTransfer against local stub proxy of image transfer
+benchmark, extents of sparse files and tree checksums
+"""
+
+import distutils.spawn
+import functools
+import os
+import subprocess
+import sys
+import threading
+from httplib import HTTPConnection
+
+import pytest
+
+from art.rhevm_api.utils import image_transfer
+from art.rhevm_api.utils.image_transfer import DOWNLOAD, UPLOAD, MiB
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', '..', 'scripts'
+))
+import image_transfer_benchmark as benchmark  # noqa: E402
+
+RANGE_SIZE = image_transfer.CHECKSUM_BLOCK_SIZE
+SIZE = 5 * RANGE_SIZE + 4096  # last range and block are partial
+
+
+class Proxy(benchmark.StubProxy):
+    """
+    Stub proxy failing GET of ranges starting at offsets in fail_at once
+    """
+    fail_at = set()
+
+    def do_GET(self):
+        start = (self.headers.getheader('Range') or '=0-').split('=')[1]
+        start = int(start.split('-')[0])
+        if start in self.fail_at:
+            self.fail_at.discard(start)
+            self._reply(500, 'injected failure')
+            return
+        benchmark.StubProxy.do_GET(self)
+
+
+@pytest.fixture
+def proxy(tmpdir):
+    Proxy.image = str(tmpdir.join('remote.img'))
+    Proxy.fail_at = set()
+    server = benchmark.StubServer(('localhost', 0), Proxy)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def source(tmpdir):
+    path = str(tmpdir.join('source.img'))
+    benchmark.make_sparse(path, SIZE, 30)
+    with open(path, 'r+b') as image:
+        # block of zeros inside data extent
+        image.seek(2 * RANGE_SIZE)
+        image.write('\0' * MiB)
+    return path
+
+
+def transfer(proxy, direction, path, **kwargs):
+    return image_transfer.ImageTransfer(
+        functools.partial(HTTPConnection, 'localhost', proxy.server_port),
+        '/images/x', {}, direction, path, SIZE, range_size=RANGE_SIZE,
+        **kwargs
+    )
+
+
+def read(path):
+    with open(path, 'rb') as image:
+        return image.read()
+
+
+@pytest.mark.parametrize('sparse', [True, False])
+@pytest.mark.parametrize('connections', [1, 4])
+def test_upload_download_round_trip(proxy, source, tmpdir, sparse,
+                                    connections):
+    with open(Proxy.image, 'wb') as remote:
+        # garbage which zero requests must clear
+        remote.write('x' * SIZE)
+    local = str(tmpdir.join('local.img'))
+    checksum = image_transfer.file_checksum(source)
+
+    upload = transfer(
+        proxy, UPLOAD, source, sparse=sparse, connections=connections
+    )
+    assert upload.run(), upload.error
+    assert read(Proxy.image) == read(source)
+    assert upload.checksum == checksum
+
+    download = transfer(
+        proxy, DOWNLOAD, local, sparse=sparse, connections=connections
+    )
+    assert download.run(), download.error
+    assert read(local) == read(source)
+    assert download.checksum == checksum
+    assert not os.path.exists(local + image_transfer.STATE_SUFFIX)
+    if sparse:
+        assert upload.zero_bytes and download.zero_bytes
+
+
+def test_download_resumes_from_state_file(proxy, source, tmpdir):
+    with open(Proxy.image, 'wb') as remote:
+        remote.write(read(source))
+    local = str(tmpdir.join('local.img'))
+    Proxy.fail_at = set([3 * RANGE_SIZE])
+
+    first = transfer(proxy, DOWNLOAD, local, connections=1)
+    assert not first.run()
+    assert isinstance(first.error, image_transfer.TransferError)
+    assert os.path.exists(local + image_transfer.STATE_SUFFIX)
+
+    second = transfer(proxy, DOWNLOAD, local, connections=1)
+    assert second.run(), second.error
+    assert second.transferred == SIZE - 3 * RANGE_SIZE
+    assert read(local) == read(source)
+    assert second.checksum == image_transfer.file_checksum(source)
+    assert not os.path.exists(local + image_transfer.STATE_SUFFIX)
+
+
+def test_file_extents_of_sparse_file(tmpdir):
+    path = str(tmpdir.join('sparse.img'))
+    with open(path, 'wb') as image:
+        image.truncate(8 * MiB)
+        for start in (0, 4 * MiB):
+            image.seek(start)
+            image.write('x' * MiB)
+
+    extents = image_transfer.file_extents(path, 8 * MiB)
+
+    if extents == [(0, 8 * MiB, False)]:
+        pytest.skip("file system doesn't report holes")
+    assert extents == [
+        (0, MiB, False), (MiB, 4 * MiB, True), (4 * MiB, 5 * MiB, False),
+        (5 * MiB, 8 * MiB, True),
+    ]
+
+
+@pytest.mark.parametrize('python', [sys.executable, 'python3'])
+@pytest.mark.parametrize('algorithm', ['sha1', 'md5'])
+def test_tree_hash_matches_remote_checksum(source, python, algorithm):
+    if not distutils.spawn.find_executable(python):
+        pytest.skip("%s is not installed" % python)
+
+    remote = subprocess.check_output([
+        python, '-c', image_transfer.REMOTE_CHECKSUM, algorithm,
+        str(image_transfer.CHECKSUM_BLOCK_SIZE), source
+    ]).strip()
+
+    assert image_transfer.file_checksum(source, algorithm) == remote